@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
 from pathlib import Path
-import dj_database_url, os
+import dj_database_url, os, tempfile
 from dotenv import load_dotenv
 
 # DATABASES = {'default': dj_database_url.parse(os.getenv('DATABASE_URL'))}
@@ -51,9 +51,12 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 MIDDLEWARE = [
+    # First, so its total covers every other middleware; removes itself unless REQUEST_TIMING is on
+    'backend.utils.request_timing.RequestTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -110,6 +113,27 @@ REST_FRAMEWORK = {
     ),
 }
 
+# orjson-backed JSON renderer/parser (same output as DRF's); FAST_JSON=False
+# switches back to the stdlib JSONRenderer/JSONParser
+if os.getenv('FAST_JSON', 'True') == 'True':
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = (
+        'backend.utils.fast_json.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    )
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = (
+        'backend.utils.fast_json.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    )
+
+# Server-Timing header, timing log line and per-view totals for every request
+# (backend/utils/request_timing.py); off by default
+REQUEST_TIMING = os.getenv('REQUEST_TIMING', 'False') == 'True'
+
+# Bearer token required by /api/metrics/ when set (backend/utils/metrics.py);
+# set PROMETHEUS_MULTIPROC_DIR as well when running several worker processes
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
 # Pagination defaults so list endpoints are predictable for the frontend
 REST_FRAMEWORK.setdefault('DEFAULT_PAGINATION_CLASS', 'rest_framework.pagination.PageNumberPagination')
 REST_FRAMEWORK.setdefault('PAGE_SIZE', 25)
@@ -140,6 +164,36 @@ DATABASES = {
 }
 
 
+# Cache
+# 'default' holds the version stamps reservations.settings_cache and
+# reservations.calendar_cache publish when settings or bookings change. Every
+# gunicorn worker must read the same stamps, so it defaults to a directory on
+# this host that all workers share. Behind several hosts point it at a network
+# cache instead (memcached or Redis, via CACHE_BACKEND and CACHE_LOCATION).
+# MAX_ENTRIES leaves room for one calendar token per date.
+# reservations.calendar_cache keeps built calendar days in 'calendar' (per
+# worker is fine: the per-date version tokens it checks live in 'default')
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'booking-app-cache')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 20000))},
+    },
+    'calendar': {
+        'BACKEND': os.getenv('CALENDAR_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CALENDAR_CACHE_LOCATION', 'calendar-days'),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CALENDAR_CACHE_MAX_ENTRIES', 5000))},
+    },
+}
+# Upper bound on how long a cached calendar day is served
+CALENDAR_CACHE_TIMEOUT = int(os.getenv('CALENDAR_CACHE_TIMEOUT', 600))
+# How calendar change events reach the SSE streams (see reservations.events):
+# 'postgres' (LISTEN/NOTIFY, all worker processes) or 'local' (this process only)
+CALENDAR_EVENTS_BACKEND = os.getenv('CALENDAR_EVENTS_BACKEND', 'postgres')
+# Upper bound on how long a 304 can hide an edit to a user shown in a response (see reservations.conditional)
+CONDITIONAL_GET_MAX_AGE = int(os.getenv('CONDITIONAL_GET_MAX_AGE', 600))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -181,6 +235,14 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 # JWT Authentication Settings
 JWT_ACCESS_SECRET = os.getenv('JWT_ACCESS_SECRET')
 JWT_REFRESH_SECRET = os.getenv('JWT_REFRESH_SECRET')
+# Per-process cache of authenticated users (see users/principal_cache.py).
+# The TTL bounds how long a role change takes to reach other workers.
+JWT_PRINCIPAL_CACHE_TTL = int(os.getenv('JWT_PRINCIPAL_CACHE_TTL', 60))
+JWT_PRINCIPAL_CACHE_SIZE = int(os.getenv('JWT_PRINCIPAL_CACHE_SIZE', 1024))
+# Bloom filter in front of the refresh token blacklist (see users/revocation_filter.py)
+REFRESH_BLACKLIST_FILTER_CAPACITY = int(os.getenv('REFRESH_BLACKLIST_FILTER_CAPACITY', 100000))
+REFRESH_BLACKLIST_FILTER_ERROR_RATE = float(os.getenv('REFRESH_BLACKLIST_FILTER_ERROR_RATE', 0.01))
+REFRESH_BLACKLIST_FILTER_SYNC_SECONDS = int(os.getenv('REFRESH_BLACKLIST_FILTER_SYNC_SECONDS', 30))
 
 
 # Email (SMTP) configuration - Gmail example
@@ -192,6 +254,8 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')  # your gmail address
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')  # app password or real password (use app password)
 EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_USE_SSL = os.getenv('EMAIL_USE_SSL', 'False') == 'True'
+# Seconds before a stuck SMTP call gives up, so one bad session can't stall the outbox worker
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', 10))
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'no-reply@example.com')
 
 # Default primary key field type
@@ -19,8 +19,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from backend.utils.metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/users/", include("users.urls")),
     path("api/reservations/", include("reservations.urls")),
+    path("api/metrics/", metrics_view, name="metrics"),
 ]
\ No newline at end of file
@@ -1,4 +1,7 @@
-from django.core.mail import EmailMessage
+import re
+from functools import lru_cache
+
+from django.core.mail import EmailMultiAlternatives
 from django.template import Template, Context
 from django.utils.html import strip_tags
 
@@ -34,6 +37,97 @@ BASE_HTML_TEMPLATE = """
 """
 
 
+FOOTER_TEXT = "Sincerely,\nThe Booking Team"
+
+_LINE_BREAK_RE = re.compile(r'<br\s*/?>', re.IGNORECASE)
+
+
+@lru_cache(maxsize=None)
+def get_compiled_template():
+    """BASE_HTML_TEMPLATE parsed once per process"""
+    return Template(BASE_HTML_TEMPLATE)
+
+
+def render_text_body(subject, content, details=None, preheader=None):
+    """Plain-text part built from the same values as the HTML part.
+
+    Only ``content`` may carry markup (line breaks, emphasis), so that short
+    string is the only thing that needs tags removed.
+    """
+    if '<' in content:
+        content = strip_tags(_LINE_BREAK_RE.sub('\n', content))
+    parts = [subject]
+    if preheader:
+        parts.append(preheader)
+    parts += ['', content]
+    if details:
+        parts += ['', details.rstrip('\n')]
+    parts += ['', FOOTER_TEXT]
+    return '\n'.join(parts) + '\n'
+
+
+def render_html_emails(messages):
+    """Render (html, text) bodies for many messages in one pass.
+
+    ``messages`` is an iterable of dicts with subject, content and optional
+    details/preheader. The compiled template and one Context are shared by
+    every message.
+    """
+    template = get_compiled_template()
+    context = Context()
+    rendered = []
+    for message in messages:
+        subject = message['subject']
+        content = message['content']
+        details = message.get('details') or ''
+        preheader = message.get('preheader') or ''
+        with context.push(subject=subject, preheader=preheader, content=content, details=details):
+            html_body = template.render(context)
+        rendered.append((html_body, render_text_body(subject, content, details, preheader)))
+    return rendered
+
+
+def build_html_emails(messages, connection=None):
+    """Build ready-to-send HTML emails (with plain-text fallback) for many messages.
+
+    Each message dict takes the arguments of send_html_email: subject,
+    to_email, content and optional details, preheader and from_email. All
+    messages share the optional mail connection.
+    """
+    messages = list(messages)
+    emails = []
+    for message, (html_body, text_body) in zip(messages, render_html_emails(messages)):
+        to_email = message['to_email']
+        email = EmailMultiAlternatives(
+            subject=message['subject'],
+            body=text_body,
+            from_email=message.get('from_email'),
+            to=[to_email] if isinstance(to_email, str) else list(to_email),
+            connection=connection,
+        )
+        email.content_subtype = 'plain'
+        # Attach the html alternative
+        email.attach_alternative(html_body, "text/html")
+        emails.append(email)
+    return emails
+
+
+def build_html_email(subject, to_email, content, details=None, preheader=None, from_email=None, connection=None):
+    """Build an HTML email with a plain-text fallback, ready to send.
+
+    Takes the same arguments as send_html_email, plus an optional mail
+    connection so several messages can share one SMTP session.
+    """
+    return build_html_emails([{
+        'subject': subject,
+        'to_email': to_email,
+        'content': content,
+        'details': details,
+        'preheader': preheader,
+        'from_email': from_email,
+    }], connection=connection)[0]
+
+
 def send_html_email(subject, to_email, content, details=None, preheader=None, from_email=None, fail_silently=True):
     """Send an HTML email with a plain-text fallback.
 
@@ -44,34 +138,9 @@ def send_html_email(subject, to_email, content, details=None, preheader=None, fr
     - preheader: short subtitle under subject
     - from_email: override default
     """
-    if isinstance(to_email, str):
-        recipient_list = [to_email]
-    else:
-        recipient_list = to_email
-
-    context = Context({
-        'subject': subject,
-        'preheader': preheader or '',
-        'content': content,
-        'details': details or ''
-    })
-
-    template = Template(BASE_HTML_TEMPLATE)
-    html_body = template.render(context)
-    text_body = strip_tags(html_body)
-
-    email = EmailMessage(
-        subject=subject,
-        body=text_body,
-        from_email=from_email,
-        to=recipient_list,
-    )
-    email.content_subtype = 'plain'
-    # Attach the html alternative
-    email.attach_alternative(html_body, "text/html")
+    email = build_html_email(subject, to_email, content, details=details, preheader=preheader, from_email=from_email)
     try:
         email.send(fail_silently=fail_silently)
     except Exception:
         if not fail_silently:
             raise
- 
\ No newline at end of file
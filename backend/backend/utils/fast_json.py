@@ -0,0 +1,91 @@
+"""orjson-backed JSON renderer and parser for DRF.
+
+Both are drop-in replacements for ``rest_framework.renderers.JSONRenderer``
+and ``rest_framework.parsers.JSONParser`` and produce the same JSON for the
+same input. orjson handles str/int/float/dict/list, ``date``, ``time``,
+``datetime`` and ``UUID`` itself. Anything else (``Decimal``, lazy
+translation strings, querysets, generators...) goes through DRF's own
+``JSONEncoder.default``, so it is encoded exactly as before.
+
+They fall back to the stdlib implementation when:
+
+- orjson is not installed;
+- the client asks for indented output (``Accept: application/json; indent=4``)
+  or the browsable API renders the JSON, since orjson only has a 2-space
+  indent and different separators;
+- ``UNICODE_JSON`` is off (orjson never escapes non-ASCII);
+- orjson refuses a value the stdlib accepts: integers wider than 64 bits, or
+  dict keys that are not strings;
+- a request body is not UTF-8 or is not valid JSON (so parse errors keep their
+  usual messages).
+
+One difference remains: with ``STRICT_JSON`` the stdlib renderer raises on
+NaN and Infinity, whereas orjson writes ``null``.
+"""
+import io
+import re
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# The renderers escape these so the output stays a strict JavaScript subset
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+SEPARATOR_LEAD_BYTE = LINE_SEPARATOR[:1]
+
+# Any integer that might not fit in 64 bits has at least this many digits
+LONG_DIGIT_RUN = re.compile(rb'[0-9]{19}')
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that serializes with orjson when it can produce the same output"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Let the stdlib either encode it or raise its usual error
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Both separators start with this byte; a one-byte scan is far cheaper
+        # than searching for each of them in every response
+        if SEPARATOR_LEAD_BYTE in ret:
+            ret = ret.replace(LINE_SEPARATOR, b'\\u2028').replace(PARAGRAPH_SEPARATOR, b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser that parses UTF-8 bodies with orjson"""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if LONG_DIGIT_RUN.search(body):
+            # orjson turns integers beyond 64 bits into floats; the stdlib keeps them exact
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+        try:
+            # orjson rejects NaN/Infinity like the strict stdlib parser does
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type, parser_context)
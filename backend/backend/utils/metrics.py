@@ -0,0 +1,158 @@
+"""Prometheus metrics, served in the text format at /api/metrics/.
+
+Metrics:
+
+- ``api_request_duration_seconds{endpoint,method,status}``: histogram of the
+  time spent in the views decorated with ``@instrument``. Its ``_count`` by
+  status also gives the login, refresh and trade-response rates.
+- ``api_request_db_queries{endpoint}``: histogram of SQL queries per request
+  in those views.
+- ``calendar_cache_days_total{result="hit"|"miss"}``: calendar days served
+  from the day cache or built. The hit ratio is hit / (hit + miss).
+- ``reservation_overlap_rejections_total``: bookings refused by the overlap
+  constraint.
+- ``email_outbox_messages{status}``: outbox rows waiting or given up on, read
+  from the database at scrape time.
+- ``refresh_token_filter_*``: the refresh-token revocation filter of the
+  process answering the scrape (each worker has its own).
+
+Under gunicorn every worker process counts separately. Point
+``PROMETHEUS_MULTIPROC_DIR`` at an empty directory, cleared before the
+server starts: workers then write their samples to memory-mapped files
+there, and a scrape served by any worker adds up all of them
+(prometheus_client's multiprocess mode). Gunicorn's ``child_exit`` hook
+should call ``prometheus_client.multiprocess.mark_process_dead(worker.pid)``.
+
+Without prometheus_client installed, the metrics are no-ops and the endpoint
+answers 501.
+"""
+import functools
+import hmac
+import os
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+    )
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:
+    Counter = Histogram = None
+
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, value):
+        pass
+
+
+if Counter is not None:
+    REQUEST_DURATION = Histogram(
+        'api_request_duration_seconds', 'Time spent in instrumented API views', ['endpoint', 'method', 'status']
+    )
+    REQUEST_QUERIES = Histogram(
+        'api_request_db_queries', 'SQL queries per request in instrumented API views', ['endpoint'],
+        buckets=QUERY_BUCKETS
+    )
+    CALENDAR_CACHE_DAYS = Counter(
+        'calendar_cache_days', 'Calendar days served from the day cache (hit) or built (miss)', ['result']
+    )
+    OVERLAP_REJECTIONS = Counter(
+        'reservation_overlap_rejections', 'Bookings refused because they overlap an active reservation'
+    )
+else:
+    REQUEST_DURATION = REQUEST_QUERIES = CALENDAR_CACHE_DAYS = OVERLAP_REJECTIONS = _NoopMetric()
+
+
+def instrument(endpoint):
+    """Record duration and SQL query count of a view method under endpoint.
+
+    The duration covers the view method only; rendering the response happens
+    after it returns.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            queries = 0
+
+            def count_query(execute, sql, params, many, context):
+                nonlocal queries
+                queries += 1
+                return execute(sql, params, many, context)
+
+            started = perf_counter()
+            status = 500
+            try:
+                with connection.execute_wrapper(count_query):
+                    response = method(view, request, *args, **kwargs)
+                status = response.status_code
+                return response
+            finally:
+                REQUEST_DURATION.labels(endpoint, request.method, str(status)).observe(perf_counter() - started)
+                REQUEST_QUERIES.labels(endpoint).observe(queries)
+        return wrapper
+    return decorator
+
+
+class ScrapeTimeCollector:
+    """Values read when scraped rather than counted as they happen"""
+
+    def collect(self):
+        from reservations.models import EmailOutbox
+        from users.revocation_filter import revocation_filter
+
+        outbox = GaugeMetricFamily('email_outbox_messages', 'Email outbox rows by status', labels=['status'])
+        for status in ('PENDING', 'FAILED'):
+            outbox.add_metric([status.lower()], EmailOutbox.objects.filter(status=status).count())
+        yield outbox
+
+        stats = revocation_filter.stats()
+        for name, help_text in (
+            ('entries', 'Revoked refresh tokens held in the filter'),
+            ('size_bytes', 'Memory used by the filter bit array'),
+            ('checks', 'Refresh tokens checked against the filter'),
+            ('answered_without_query', 'Checks answered without a database query'),
+            ('false_positives', 'Checks the filter flagged that the database cleared'),
+            ('rebuilds', 'Times the filter was rebuilt from the database'),
+            ('estimated_false_positive_rate', 'False-positive rate expected at the current fill'),
+            ('observed_false_positive_rate', 'Share of unrevoked tokens the filter flagged'),
+        ):
+            yield GaugeMetricFamily(f'refresh_token_filter_{name}', help_text, value=stats[name])
+
+
+if Counter is not None:
+    _scrape_registry = CollectorRegistry()
+    _scrape_registry.register(ScrapeTimeCollector())
+
+
+def render_metrics():
+    """Every metric in the Prometheus text format"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(_scrape_registry)
+
+
+@require_GET
+def metrics_view(request):
+    """GET /api/metrics/; with METRICS_TOKEN set, requires ``Authorization: Bearer <token>``"""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+    if Counter is None:
+        return HttpResponse('prometheus_client is not installed\n', status=501, content_type='text/plain')
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
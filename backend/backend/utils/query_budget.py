@@ -0,0 +1,134 @@
+"""Query-count budgets for API endpoints, used by the apps' tests.
+
+A view that runs one query per row (an N+1) looks fine on a test dataset
+of one reservation and falls over on a real one. ``QueryBudgetMixin`` grows
+the dataset through ``DATASET_SIZES`` and calls every endpoint at each size.
+It fails when an endpoint runs a different number of queries than it did on
+the smallest dataset.
+
+A test case using it provides:
+
+- ``seed_dataset(size)``: add rows until there are ``size`` of everything
+  the endpoints list or count;
+- ``budget_endpoints()``: the ``Endpoint`` calls to measure;
+- optionally ``reset_state()``: clear caches before each call, so a cache
+  warmed by one call doesn't make the next one look cheaper.
+
+Each call runs in a savepoint that is rolled back, so an endpoint that
+creates, deletes or accepts something sees the same data at every size. The
+failure message diffs the SQL of the two runs, with literals replaced by
+``?``, so the query repeated per row stands out.
+"""
+import difflib
+import re
+from typing import Any, Callable, NamedTuple, Optional
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, get_resolver, reverse
+
+DATASET_SIZES = (1, 10, 1000)
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SELECT_LIST = re.compile(r'^SELECT .+? FROM ', re.DOTALL)
+
+
+class Endpoint(NamedTuple):
+    """One request: method on the URL named url_name, as user (None: anonymous)"""
+    method: str
+    url_name: str
+    user: Any = None
+    kwargs: Optional[dict] = None
+    data: Optional[dict] = None
+    query: str = ''
+    status: int = 200
+    # Runs before the request, inside the savepoint but not counted (e.g. logging in for a cookie)
+    prepare: Optional[Callable] = None
+
+    @property
+    def label(self):
+        role = getattr(self.user, 'role', 'anonymous')
+        return f'{self.method} {self.url_name} as {role}'
+
+
+def normalize_sql(sql):
+    """sql with its literal values replaced by ?, so runs on different rows compare
+    equal, and its select list shortened to ..., so the FROM and WHERE fit on a line"""
+    return _SELECT_LIST.sub('SELECT ... FROM ', _LITERAL.sub('?', sql))
+
+
+class QueryBudgetMixin:
+    """For APITestCase: endpoint query counts must not grow with the dataset"""
+    dataset_sizes = DATASET_SIZES
+
+    def seed_dataset(self, size):
+        raise NotImplementedError
+
+    def budget_endpoints(self):
+        raise NotImplementedError
+
+    def reset_state(self):
+        pass
+
+    def capture_endpoint_queries(self, endpoint):
+        """SQL run by one call of endpoint, whose writes are rolled back"""
+        self.reset_state()
+        path = reverse(endpoint.url_name, kwargs=endpoint.kwargs) + endpoint.query
+        with transaction.atomic():
+            # Before prepare(): forcing no user logs the client out, clearing its cookies
+            self.client.force_authenticate(user=endpoint.user)
+            if endpoint.prepare is not None:
+                endpoint.prepare(self.client)
+            call = getattr(self.client, endpoint.method.lower())
+            with CaptureQueriesContext(connection) as queries:
+                if endpoint.method == 'GET':
+                    response = call(path, endpoint.data)
+                else:
+                    response = call(path, endpoint.data, format='json')
+            transaction.set_rollback(True)
+        self.client.force_authenticate(user=None)
+        self.client.cookies.clear()
+
+        self.assertEqual(
+            response.status_code, endpoint.status,
+            f'{endpoint.label} answered {response.status_code}: {getattr(response, "data", "")}'
+        )
+        return [query['sql'] for query in queries.captured_queries]
+
+    def assertQueryBudgets(self):
+        """Call every endpoint at each dataset size; fail on any count that changed"""
+        runs = {}
+        for size in self.dataset_sizes:
+            self.seed_dataset(size)
+            for endpoint in self.budget_endpoints():
+                runs.setdefault(endpoint.label, []).append((size, self.capture_endpoint_queries(endpoint)))
+
+        failures = []
+        for label, measured in runs.items():
+            base_size, base = measured[0]
+            for size, queries in measured[1:]:
+                if len(queries) != len(base):
+                    failures.append(self._budget_failure(label, base_size, base, size, queries))
+                    break
+        if failures:
+            self.fail('Query counts changed with the dataset size:\n\n' + '\n\n'.join(failures))
+
+    def assertEndpointsCovered(self, urlconf):
+        """Every URL in urlconf has at least one budget endpoint"""
+        names = set()
+        for pattern in get_resolver(urlconf).url_patterns:
+            self.assertIsInstance(pattern, URLPattern)
+            names.add(pattern.name)
+        covered = {endpoint.url_name for endpoint in self.budget_endpoints()}
+        self.assertEqual(names - covered, set(), f'{urlconf} URLs without a query budget')
+
+    @staticmethod
+    def _budget_failure(label, base_size, base, size, queries):
+        diff = difflib.unified_diff(
+            [normalize_sql(sql) for sql in base],
+            [normalize_sql(sql) for sql in queries],
+            fromfile=f'{base_size} rows: {len(base)} queries',
+            tofile=f'{size} rows: {len(queries)} queries',
+            lineterm='',
+        )
+        return f'{label}\n' + '\n'.join(diff)
@@ -0,0 +1,222 @@
+"""Per-request timing: Server-Timing header, a log line and per-view totals.
+
+With ``REQUEST_TIMING`` on, ``RequestTimingMiddleware`` records for every
+request:
+
+- the wall time through the middleware stack and view;
+- the number and total time of SQL queries (a wrapper on every database
+  connection, see ``connection.execute_wrapper``);
+- serialization time, i.e. building ``serializer.data`` (DRF serializers, and
+  anything else wrapped in ``timed('serialize')``);
+- render time, i.e. turning the response data into bytes.
+
+It sends them back as::
+
+    Server-Timing: total;dur=12.4, db;dur=3.1;desc="4 queries", serialize;dur=2.0, render;dur=0.6
+
+It also logs one JSON line on the ``backend.request_timing`` logger and
+adds the request to its view's totals in ``view_stats()``.
+
+With ``REQUEST_TIMING`` off, the middleware removes itself at startup
+(``MiddlewareNotUsed``) and nothing is patched or wrapped. What is left is
+``timed()`` checking a context variable.
+
+The current request's timing lives in a context variable. It therefore
+follows the request into ``sync_to_async`` threads under ASGI, where sync
+views and their queries run on a different connection than the middleware.
+"""
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('backend.request_timing')
+
+_current = ContextVar('request_timing', default=None)
+
+_stats = {}
+_stats_lock = threading.Lock()
+_installed = False
+
+
+class RequestTiming:
+    """Timings of one request, in seconds"""
+    __slots__ = ('queries', 'db', 'serialize', 'render', 'depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.render = 0.0
+        # Nesting of timed('serialize') blocks; only the outermost one counts
+        self.depth = 0
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to the current request's phase ('serialize' or 'render')"""
+    timing = _current.get()
+    if timing is None or timing.depth:
+        yield
+        return
+    timing.depth += 1
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        setattr(timing, phase, getattr(timing, phase) + perf_counter() - started)
+        timing.depth -= 1
+
+
+def view_stats():
+    """Per-view totals since startup: {view: {'requests', 'total_ms', 'max_ms', 'queries', 'db_ms', 'serialize_ms', 'render_ms'}}"""
+    with _stats_lock:
+        return {view: dict(totals) for view, totals in _stats.items()}
+
+
+def reset_view_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+class RequestTimingMiddleware:
+    """Time every request; enabled with the REQUEST_TIMING setting"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_TIMING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        _install()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timing = RequestTiming()
+        token = _current.set(timing)
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, timing, perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        timing = RequestTiming()
+        token = _current.set(timing)
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, timing, perf_counter() - started)
+        return response
+
+    def process_template_response(self, request, response):
+        # Called right before a DRF Response is rendered; the callback runs right after
+        timing = _current.get()
+        if timing is not None:
+            started = perf_counter()
+
+            def rendered(response):
+                timing.render += perf_counter() - started
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, timing, total):
+        view = _view_name(request)
+        record = {
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'queries': timing.queries,
+            'db_ms': round(timing.db * 1000, 2),
+            'serialize_ms': round(timing.serialize * 1000, 2),
+            'render_ms': round(timing.render * 1000, 2),
+        }
+        response['Server-Timing'] = (
+            f'total;dur={record["total_ms"]}, '
+            f'db;dur={record["db_ms"]};desc="{timing.queries} queries", '
+            f'serialize;dur={record["serialize_ms"]}, '
+            f'render;dur={record["render_ms"]}'
+        )
+        logger.info(json.dumps(record))
+
+        with _stats_lock:
+            totals = _stats.get(view)
+            if totals is None:
+                totals = _stats[view] = {
+                    'requests': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'queries': 0,
+                    'db_ms': 0.0, 'serialize_ms': 0.0, 'render_ms': 0.0,
+                }
+            totals['requests'] += 1
+            totals['total_ms'] += record['total_ms']
+            totals['max_ms'] = max(totals['max_ms'], record['total_ms'])
+            totals['queries'] += timing.queries
+            totals['db_ms'] += record['db_ms']
+            totals['serialize_ms'] += record['serialize_ms']
+            totals['render_ms'] += record['render_ms']
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    view = getattr(match.func, 'view_class', match.func)
+    return f'{view.__module__}.{view.__qualname__}'
+
+
+def _record_query(execute, sql, params, many, context):
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.queries += 1
+        timing.db += perf_counter() - started
+
+
+def _add_query_wrapper(connection, **kwargs):
+    # execute_wrappers outlives reconnects, so only add the wrapper once. Go
+    # first in the list: execute_wrapper() blocks pop the last entry on exit
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+def _install():
+    """Wrap queries on every connection and time DRF serializer.data (once per process)"""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    # Connections opened from now on, in any thread, plus this thread's open ones
+    connection_created.connect(_add_query_wrapper, dispatch_uid='request_timing')
+    for connection in connections.all(initialized_only=True):
+        _add_query_wrapper(connection)
+
+    from rest_framework.serializers import BaseSerializer
+
+    data = BaseSerializer.data
+
+    def timed_data(self):
+        with timed('serialize'):
+            return data.fget(self)
+    BaseSerializer.data = property(timed_data)
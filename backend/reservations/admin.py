@@ -4,7 +4,8 @@ from .models import (
     PrimeTimeSettings, 
     TradeRequest, 
     CalendarSettings,
-    ReservationAuditLog
+    ReservationAuditLog,
+    EmailOutbox
 )
 
 @admin.register(Reservation)
@@ -43,3 +44,11 @@ class ReservationAuditLogAdmin(admin.ModelAdmin):
     search_fields = ['reservation__user__email', 'performed_by__email']
     ordering = ['-timestamp']
     readonly_fields = ['reservation', 'action', 'performed_by', 'details', 'timestamp']
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['subject', 'to']
+    ordering = ['-created_at']
+    readonly_fields = ['created_at', 'sent_at', 'last_error']
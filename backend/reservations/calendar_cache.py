@@ -0,0 +1,155 @@
+# reservations/calendar_cache.py
+"""Per-day cache of calendar payloads.
+
+A calendar range is served day by day from the ``calendar`` cache (see
+``CACHES`` in settings). Each day's entry is keyed by:
+
+- the date;
+- that date's version token;
+- the settings snapshot version;
+- today's date.
+
+Only the days that miss are built, with one reservation query covering them.
+A week view and a month view therefore share the days they overlap, and
+polling an unchanged range costs no database queries.
+
+Version tokens live in the default cache, which every worker on the host
+shares (a directory unless ``CACHE_BACKEND`` says otherwise). Saving
+or deleting a reservation publishes a new token for its date, and for its
+previous date when it moved, once the transaction commits (see
+``reservations.signals``). Trade swaps and approvals save reservations, so
+they are covered the same way. Bulk paths that bypass ``save()`` call
+``bump_calendar_dates`` themselves. PrimeTimeSettings and CalendarSettings
+changes move the settings version, which is part of every key. Tokens are
+random rather than incrementing, so a token evicted from the cache can never
+come back and match an old entry.
+
+While the current transaction holds an unpublished change, the affected dates
+(or, for a settings change, every date) skip the cache in both directions.
+Day entries also expire after ``CALENDAR_CACHE_TIMEOUT`` seconds. This
+bounds how long a change to a booking user's name or role can show up stale.
+"""
+import threading
+import time
+import uuid
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache import cache as version_cache
+from django.db import transaction
+
+from backend.utils.metrics import CALENDAR_CACHE_DAYS
+
+from .calendar_engine import build_days, date_range
+from .settings_cache import get_settings_snapshot, has_uncommitted_settings_change
+
+CALENDAR_CACHE_ALIAS = 'calendar'
+DATE_VERSION_KEY = 'reservations:calendar-version:{}'
+DAY_KEY = 'reservations:calendar-day:{}:{}:{}:{}'
+
+# Dates changed by this thread's transaction that have not been published yet
+_local = threading.local()
+
+
+def get_calendar(start_date, end_date):
+    """Cached equivalent of calendar_engine.build_calendar(start_date, end_date)"""
+    dates = date_range(start_date, end_date)
+    if not dates:
+        return []
+
+    settings_snapshot = get_settings_snapshot()
+    pending = _pending_dates()
+    if has_uncommitted_settings_change():
+        cacheable = []
+    else:
+        cacheable = [current_date for current_date in dates if current_date not in pending]
+
+    day_cache = caches[CALENDAR_CACHE_ALIAS]
+    keys = {}
+    cached = {}
+    if cacheable:
+        versions = _date_versions(cacheable)
+        today = date.today().isoformat()
+        keys = {
+            current_date: DAY_KEY.format(current_date.isoformat(), versions[current_date], settings_snapshot.version, today)
+            for current_date in cacheable
+        }
+        cached = day_cache.get_many(keys.values())
+
+    days = {}
+    missing = []
+    for current_date in dates:
+        key = keys.get(current_date)
+        if key is not None and key in cached:
+            days[current_date] = cached[key]
+        else:
+            missing.append(current_date)
+
+    CALENDAR_CACHE_DAYS.labels('hit').inc(len(dates) - len(missing))
+    CALENDAR_CACHE_DAYS.labels('miss').inc(len(missing))
+    if missing:
+        built = build_days(missing, settings_snapshot)
+        days.update(built)
+        day_cache.set_many(
+            {keys[current_date]: built[current_date] for current_date in missing if current_date in keys},
+            timeout=getattr(settings, 'CALENDAR_CACHE_TIMEOUT', 600)
+        )
+
+    return [days[current_date] for current_date in dates]
+
+
+def calendar_version(start_date, end_date):
+    """Validator for the calendar of [start_date, end_date]; None while this
+    transaction has unpublished changes the tokens don't reflect yet"""
+    dates = date_range(start_date, end_date)
+    if has_uncommitted_settings_change() or _pending_dates().intersection(dates):
+        return None
+    versions = _date_versions(dates)
+    timeout = getattr(settings, 'CALENDAR_CACHE_TIMEOUT', 600)
+    return (
+        get_settings_snapshot().version,
+        tuple(versions[current_date] for current_date in dates),
+        date.today().isoformat(),
+        # Rotates with the cache timeout, so clients see changes that don't
+        # move a token (a user's name) as soon as the cached days do
+        int(time.time() // timeout) if timeout else None,
+    )
+
+
+def bump_calendar_dates(*dates):
+    """Invalidate the cached days for dates once the current transaction commits"""
+    dates = {value for value in dates if value is not None}
+    if not dates:
+        return
+    if transaction.get_connection().in_atomic_block:
+        _pending_dates().update(dates)
+
+    def publish():
+        version_cache.set_many({DATE_VERSION_KEY.format(value.isoformat()): uuid.uuid4().hex for value in dates}, None)
+        _pending_dates().difference_update(dates)
+
+    transaction.on_commit(publish)
+
+
+def _pending_dates():
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        pending = _local.pending = set()
+    elif pending and not transaction.get_connection().in_atomic_block:
+        # The transaction that made the change has ended without committing
+        pending.clear()
+    return pending
+
+
+def _date_versions(dates):
+    keys = {current_date: DATE_VERSION_KEY.format(current_date.isoformat()) for current_date in dates}
+    found = version_cache.get_many(keys.values())
+    missing = [key for key in keys.values() if key not in found]
+    if missing:
+        # First use of a date (or its token was evicted): start it at a fresh
+        # token; add() keeps whichever token another worker stored first
+        for key in missing:
+            version_cache.add(key, uuid.uuid4().hex, None)
+        found.update(version_cache.get_many(missing))
+    return {current_date: found.get(key) for current_date, key in keys.items()}
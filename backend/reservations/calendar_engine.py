@@ -0,0 +1,151 @@
+# reservations/calendar_engine.py
+"""Range-level calendar engine.
+
+Everything a calendar range needs is loaded up front: calendar settings and
+the active primetime rows come from the shared settings snapshot, and every
+CONFIRMED/PENDING reservation between ``start_date`` and ``end_date`` is read in
+one ordered ``values_list`` query. Each day is then built in memory, so the
+number of queries does not depend on the length of the range.
+"""
+from collections import defaultdict
+from datetime import time, timedelta
+
+from .models import Reservation, ACTIVE_STATUSES
+from .serializers import ReservationReadSerializer
+from .settings_cache import get_settings_snapshot
+
+DEFAULT_BUSINESS_START = time(7, 0)
+DEFAULT_BUSINESS_END = time(19, 0)
+DEFAULT_SLOT_DURATION = 60
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def build_calendar(start_date, end_date):
+    """Return the list of day payloads for every date in [start_date, end_date]"""
+    dates = date_range(start_date, end_date)
+    days = build_days(dates, get_settings_snapshot())
+    return [days[current_date] for current_date in dates]
+
+
+def build_days(dates, settings_snapshot):
+    """Return {date: day payload} for the given ascending dates, loading reservations in one query"""
+    calendar_settings = settings_snapshot.calendar
+    business_start = calendar_settings.business_start_time if calendar_settings else DEFAULT_BUSINESS_START
+    business_end = calendar_settings.business_end_time if calendar_settings else DEFAULT_BUSINESS_END
+    slot_duration = calendar_settings.slot_duration_minutes if calendar_settings else DEFAULT_SLOT_DURATION
+
+    reservations_by_date = defaultdict(list)
+    if dates:
+        reservations = ReservationReadSerializer.rows(Reservation.objects.filter(
+            date__range=(dates[0], dates[-1]),
+            status__in=ACTIVE_STATUSES
+        ).order_by('date', 'start_time'))
+        for reservation in reservations:
+            reservations_by_date[reservation.date].append(reservation)
+
+    return {
+        current_date: build_day(
+            current_date,
+            business_start,
+            business_end,
+            slot_duration,
+            settings_snapshot.primetime_for(current_date),
+            reservations_by_date.get(current_date, []),
+        )
+        for current_date in dates
+    }
+
+
+def date_range(start_date, end_date):
+    dates = []
+    current_date = start_date
+    while current_date <= end_date:
+        dates.append(current_date)
+        current_date += timedelta(days=1)
+    return dates
+
+
+def build_day(target_date, business_start, business_end, slot_duration, primetime, reservations):
+    """Build the payload for a single day from already-loaded data"""
+    available_slots = generate_available_slots(
+        target_date, business_start, business_end, slot_duration, reservations, primetime
+    )
+
+    return {
+        'date': target_date.isoformat(),
+        'is_primetime': primetime is not None,
+        'primetime_hours': {
+            'start_time': primetime.start_time.isoformat(),
+            'end_time': primetime.end_time.isoformat()
+        } if primetime else None,
+        'business_hours': {
+            'start_time': business_start.isoformat(),
+            'end_time': business_end.isoformat()
+        },
+        'available_slots': available_slots,
+        'reserved_slots': ReservationReadSerializer(reservations, many=True).data
+    }
+
+
+def generate_available_slots(target_date, start_time, end_time, duration_minutes, existing_reservations, primetime=None):
+    """Generate available time slots for a day.
+
+    Single sweep over the slot grid and the reservations sorted by start time,
+    on integer second offsets from midnight. ``max_end`` is the latest end of
+    every reservation starting before the current slot's end; since slot
+    starts only move forward, the slot is free exactly when ``max_end`` does
+    not reach past its start.
+    """
+    if duration_minutes <= 0:
+        return []
+
+    business_start = _to_seconds(start_time)
+    business_end = _to_seconds(end_time)
+    step = duration_minutes * 60
+    primetime_start = _to_seconds(primetime.start_time) if primetime else None
+    primetime_end = _to_seconds(primetime.end_time) if primetime else None
+
+    intervals = sorted(
+        (_to_seconds(reservation.start_time), _to_seconds(reservation.end_time))
+        for reservation in existing_reservations
+    )
+    interval_count = len(intervals)
+    next_interval = 0
+    max_end = -1
+
+    slots = []
+    slot_start = business_start
+    while slot_start < business_end:
+        slot_end = slot_start + step
+        # Wall-clock end, wrapped like datetime.time() past midnight
+        slot_end_clock = slot_end % SECONDS_PER_DAY
+
+        if slot_end_clock <= business_end:
+            while next_interval < interval_count and intervals[next_interval][0] < slot_end:
+                if intervals[next_interval][1] > max_end:
+                    max_end = intervals[next_interval][1]
+                next_interval += 1
+
+            if max_end <= slot_start:
+                is_primetime = (primetime is not None and
+                                slot_start >= primetime_start and
+                                slot_end_clock <= primetime_end)
+                slots.append({
+                    'start_time': _to_isoformat(slot_start),
+                    'end_time': _to_isoformat(slot_end_clock),
+                    'type': 'PRIMETIME' if is_primetime else 'FREE_FOR_ALL',
+                    'available': True
+                })
+
+        slot_start = slot_end
+
+    return slots
+
+
+def _to_seconds(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def _to_isoformat(seconds):
+    return f'{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
@@ -0,0 +1,73 @@
+# reservations/changes.py
+"""Delta sync over Reservation.change_seq.
+
+Every write stamps the row with the id of the transaction making it (see
+``ChangeSequenceField``). Transaction ids grow, but transactions don't commit
+in id order: a reader could see transaction 101's rows while 100 is still
+open, and a client that moved past 101 would never get 100's rows. So a read
+only returns rows below the *horizon*: the oldest transaction still running
+when the read started (``pg_snapshot_xmin``). Everything below the horizon has
+already committed or rolled back, and the rows read afterwards reflect it.
+Rows at or above the horizon wait for a later poll.
+
+A position is ``(change_seq, id)``. Rows are returned in that order, at most
+``CHANGES_PAGE_SIZE`` per call, so one transaction that touched many rows can
+span pages. When a page is not full the next position is ``(horizon, 0)``.
+That way, an idle client polls a range holding only the changes made since.
+"""
+import base64
+
+from django.db import connection
+from django.db.models import Q
+
+CHANGES_PAGE_SIZE = 500
+
+HORIZON_SQL = 'SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint'
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def current_horizon():
+    """Transaction ids below this have all finished"""
+    with connection.cursor() as cursor:
+        cursor.execute(HORIZON_SQL)
+        return cursor.fetchone()[0]
+
+
+def changes_since(queryset, position, page_size=None):
+    """Rows of queryset changed after position: (rows, next_position, has_more).
+
+    queryset yields named rows (``values_list(..., named=True)``) that
+    include ``id`` and ``change_seq``; position None starts from the beginning.
+    """
+    page_size = page_size or CHANGES_PAGE_SIZE
+    # Read the horizon first: rows below it are final by the time the page query runs
+    horizon = current_horizon()
+    queryset = queryset.filter(change_seq__lt=horizon)
+    if position is not None:
+        change_seq, pk = position
+        queryset = queryset.filter(Q(change_seq__gt=change_seq) | Q(change_seq=change_seq, id__gt=pk))
+
+    rows = list(queryset.order_by('change_seq', 'id')[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if has_more:
+        last = rows[-1]
+        return rows, (last.change_seq, last.id), True
+    # Resume at the horizon; never move back behind where this client already is
+    return rows, max((horizon, 0), position or (0, 0)), False
+
+
+def encode_token(position):
+    raw = '{}|{}'.format(*position)
+    return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+
+def decode_token(token):
+    try:
+        change_seq, pk = base64.urlsafe_b64decode(token.encode('ascii')).decode('ascii').split('|')
+        return int(change_seq), int(pk)
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidToken(token)
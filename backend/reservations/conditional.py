@@ -0,0 +1,66 @@
+# reservations/conditional.py
+"""Conditional GET support for endpoints that clients poll.
+
+A view computes a cheap validator first, using indexes it would hit anyway:
+``max(updated_at)`` and a count over the rows it shows, the keys and
+``updated_at`` of a list page, or, for the calendar, the per-date version
+tokens. It then hands ``conditional_get`` a callable that builds the
+full response. When the request's ``If-None-Match`` already names that
+validator, the callable is never run and a bodyless 304 goes back, so no rows
+are fetched and nothing is serialized. Every response carries the ETag, the
+view's ``Cache-Control`` policy and ``Vary: Authorization, Cookie``, because
+the payloads depend on who is asking.
+
+Aggregates over reservations don't see edits to the users embedded in the
+rows (names, roles), so those validators also carry ``validator_epoch()``,
+which rolls over every ``CONDITIONAL_GET_MAX_AGE`` seconds; the calendar uses
+its cache timeout the same way.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+# Per-user data that changes at any time: always revalidate, which is cheap with the ETag
+REVALIDATE = 'private, no-cache'
+
+
+def validator_epoch():
+    """Time bucket bounding how long a user profile edit can hide behind a 304"""
+    max_age = getattr(settings, 'CONDITIONAL_GET_MAX_AGE', 600)
+    return int(time.time() // max_age) if max_age else None
+
+
+def make_etag(*parts):
+    """Strong ETag from the validator parts (anything with a stable repr)"""
+    return quote_etag(hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest())
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    # If-None-Match uses the weak comparison: W/ prefixes are ignored
+    candidates = {candidate.removeprefix('W/') for candidate in parse_etags(header)}
+    return '*' in candidates or etag in candidates
+
+
+def conditional_get(request, etag, build_response, cache_control):
+    """Return 304 when the client holds etag, else build_response(); both with validators.
+
+    Pass etag=None to skip validation, e.g. while the validator can't be trusted.
+    """
+    if etag is not None and etag_matches(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = build_response()
+
+    if etag is not None and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+        response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    patch_vary_headers(response, ('Authorization', 'Cookie'))
+    return response
@@ -0,0 +1,212 @@
+# reservations/events.py
+"""Calendar change notifications for the server-sent events stream.
+
+Whenever a reservation is written, the dates it is (or was) on are published
+as ``{"dates": [...]}``. Each ASGI worker process keeps one ``BroadcastHub``.
+Every open ``/api/reservations/events/`` stream is an asyncio queue
+registered with that hub, so an idle subscriber costs a coroutine and a queue,
+not a thread.
+
+Two backends carry events to the hubs (``CALENDAR_EVENTS_BACKEND``):
+
+- ``postgres``: the writer runs ``pg_notify`` inside its own transaction.
+  Postgres delivers the notification on commit and drops it on rollback. Each
+  process holds one ``LISTEN`` connection, read from the event loop, that
+  feeds its hub. Every worker therefore sees every change. If the listener
+  has to reconnect, subscribers receive ``{"resync": true}``, because
+  notifications sent in the meantime are lost.
+- ``local``: publishes straight to this process's hub when the transaction
+  commits. Used by tests and single-process development.
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'reservations_calendar'
+# Comment lines sent on idle streams so proxies don't time them out
+KEEPALIVE_SECONDS = 15
+# NOTIFY payloads are limited to 8000 bytes; a date costs 13
+MAX_DATES_PER_EVENT = 500
+RESYNC_EVENT = {'resync': True}
+
+
+class BroadcastHub:
+    """Fans events out to the asyncio queues subscribed in this process.
+
+    ``publish`` may be called from any thread (sync views run in a thread
+    pool); each event is handed to the subscriber's own event loop. A
+    subscriber that falls ``queue_size`` events behind loses the oldest ones.
+    That is safe here, because clients re-read the dates they are told
+    about, so a later event covers them.
+    """
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self):
+        queue = asyncio.Queue(self.queue_size)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # The subscriber's loop has closed
+                self.unsubscribe(queue)
+
+
+def _offer(queue, event):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+hub = BroadcastHub()
+
+
+def publish_calendar_change(*dates):
+    """Announce that the calendar changed on dates once the current transaction commits"""
+    dates = sorted({value.isoformat() for value in dates if value is not None})
+    if not dates:
+        return
+    backend = get_backend()
+    for start in range(0, len(dates), MAX_DATES_PER_EVENT):
+        backend.publish({'dates': dates[start:start + MAX_DATES_PER_EVENT]})
+
+
+async def start_listening():
+    """Make sure this process receives events (idempotent, call from the event loop)"""
+    await get_backend().start()
+
+
+async def calendar_event_stream(start_date=None, end_date=None):
+    """SSE body: one ``calendar`` event per change, limited to dates within the range"""
+    start_date = start_date.isoformat() if start_date else None
+    end_date = end_date.isoformat() if end_date else None
+    queue = hub.subscribe()
+    try:
+        # Tell EventSource to reconnect after 5s, and get the headers out now
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            if 'dates' in event and (start_date or end_date):
+                dates = [
+                    value for value in event['dates']
+                    if (start_date is None or value >= start_date) and (end_date is None or value <= end_date)
+                ]
+                if not dates:
+                    continue
+                event = {'dates': dates}
+            yield f'event: calendar\ndata: {json.dumps(event)}\n\n'
+    finally:
+        hub.unsubscribe(queue)
+
+
+def get_backend():
+    return _BACKENDS[getattr(settings, 'CALENDAR_EVENTS_BACKEND', 'postgres')]
+
+
+class LocalBackend:
+    """Events stay in this process"""
+
+    def publish(self, event):
+        transaction.on_commit(lambda: hub.publish(event))
+
+    async def start(self):
+        pass
+
+
+class PostgresBackend:
+    """NOTIFY from writers, one LISTEN connection per process"""
+    RECONNECT_DELAY_MAX = 30
+
+    def __init__(self):
+        self._listeners = {}
+
+    def publish(self, event):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, json.dumps(event)])
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        task = self._listeners.get(loop)
+        if task is None or task.done():
+            self._listeners[loop] = loop.create_task(self._listen())
+
+    async def _listen(self):
+        delay = 1
+        reconnecting = False
+        while True:
+            try:
+                listener = await asyncio.to_thread(self._connect)
+            except Exception:
+                logger.exception('Calendar event listener could not connect; retrying in %ss', delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.RECONNECT_DELAY_MAX)
+                continue
+
+            delay = 1
+            if reconnecting:
+                hub.publish(RESYNC_EVENT)
+            try:
+                await self._receive(listener)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Calendar event listener lost its connection; reconnecting')
+            finally:
+                listener.close()
+            reconnecting = True
+
+    def _connect(self):
+        database = connections['default']
+        listener = database.get_new_connection(database.get_connection_params())
+        listener.autocommit = True
+        with listener.cursor() as cursor:
+            cursor.execute(f'LISTEN {CHANNEL}')
+        return listener
+
+    async def _receive(self, listener):
+        loop = asyncio.get_running_loop()
+        readable = asyncio.Event()
+        fileno = listener.fileno()
+        loop.add_reader(fileno, readable.set)
+        try:
+            while True:
+                await readable.wait()
+                readable.clear()
+                listener.poll()
+                while listener.notifies:
+                    notify = listener.notifies.pop(0)
+                    hub.publish(json.loads(notify.payload))
+        finally:
+            loop.remove_reader(fileno)
+
+
+_BACKENDS = {
+    'local': LocalBackend(),
+    'postgres': PostgresBackend(),
+}
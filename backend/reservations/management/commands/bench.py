@@ -0,0 +1,413 @@
+import json
+import math
+import random
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
+from time import perf_counter
+
+import jwt
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from reservations.calendar_cache import CALENDAR_CACHE_ALIAS
+from reservations.calendar_engine import DEFAULT_BUSINESS_END, DEFAULT_BUSINESS_START, DEFAULT_SLOT_DURATION
+from reservations.management.commands.seed_load_data import _slots
+from reservations.models import ACTIVE_STATUSES, EmailOutbox, Reservation, TradeRequest
+from reservations.settings_cache import get_settings_snapshot
+
+User = get_user_model()
+
+SCENARIOS = (
+    'calendar_month',
+    'calendar_month_cached',
+    'reservation_list',
+    'reservation_create_contention',
+    'login',
+    'refresh',
+    'trade_accept',
+)
+# Metric: whether a higher value is better
+METRICS = {
+    'p50_ms': False,
+    'p95_ms': False,
+    'p99_ms': False,
+    'throughput_rps': True,
+    'queries_per_request': False,
+}
+
+
+class _Recorder:
+    """Latency, query count and status of every timed request in one scenario"""
+
+    def __init__(self):
+        self.latencies = []
+        self.queries = []
+        self.statuses = Counter()
+        # Time spent in timed requests (wall time of the rounds for concurrent ones)
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, queries, status, concurrent=False):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.queries.append(queries)
+            self.statuses[str(status)] += 1
+            if not concurrent:
+                self.elapsed += seconds
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        return {
+            'requests': len(latencies),
+            'p50_ms': round(_percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(_percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(_percentile(latencies, 99) * 1000, 3),
+            'throughput_rps': round(len(latencies) / self.elapsed, 2) if self.elapsed else 0.0,
+            'queries_per_request': round(sum(self.queries) / len(self.queries), 2) if self.queries else 0.0,
+            'statuses': dict(sorted(self.statuses.items())),
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the API through its real URL routes with the in-process test client, '
+        'against the configured database (fill it with seed_load_data first). Reports '
+        'p50/p95/p99 latency, throughput and queries per request per scenario, and with '
+        '--baseline fails when a metric is worse than the baseline by more than --threshold '
+        'percent. Scenarios that write run in a transaction that is rolled back, except '
+        'reservation_create_contention, which commits from concurrent connections and '
+        'deletes what it created afterwards. calendar_month clears the calendar cache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                            help='Scenario to run; repeat for several (default: all)')
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per scenario')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per scenario before timing')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Clients racing for the same date in reservation_create_contention')
+        parser.add_argument('--user', help='Email of the regular user to run as (default: first seeded user)')
+        parser.add_argument('--admin', help='Email of the admin to run as (default: first admin)')
+        parser.add_argument('--password', default='loadtest123', help="The user's password, for login and refresh")
+        parser.add_argument('--host', default='testserver', help='Host header; must be in ALLOWED_HOSTS')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for dates and slots')
+        parser.add_argument('--output', help='Write the results as JSON to this file (usable as a later baseline)')
+        parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+        parser.add_argument('--threshold', type=float, default=20.0,
+                            help='Percent a metric may be worse than the baseline before the run fails')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['warmup'] < 0 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be at least 1, --warmup at least 0')
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as fh:
+                    baseline = json.load(fh)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Cannot read baseline {options["baseline"]}: {exc}')
+
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.today = date.today()
+        self.user = self._get_user(options['user'], 'user')
+        self.admin = self._get_user(options['admin'], 'admin')
+
+        results = {}
+        for name in options['scenario'] or SCENARIOS:
+            scenario = getattr(self, f'bench_{name}')
+            if options['warmup']:
+                scenario(_Recorder(), options['warmup'])
+            recorder = _Recorder()
+            scenario(recorder, options['requests'])
+            results[name] = recorder.summary()
+            self._write_row(name, results[name])
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump({
+                    'created_at': timezone.now().isoformat(),
+                    'requests': options['requests'],
+                    'concurrency': options['concurrency'],
+                    'scenarios': results,
+                }, fh, indent=2)
+                fh.write('\n')
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        if baseline is not None:
+            regressions = self._compare(results, baseline.get('scenarios', {}), options['threshold'])
+            if regressions:
+                raise CommandError(f'{regressions} metric(s) regressed by more than {options["threshold"]}%')
+            self.stdout.write(self.style.SUCCESS(f'No regressions beyond {options["threshold"]}%'))
+
+    # ===================== SCENARIOS =====================
+
+    def bench_calendar_month(self, recorder, count):
+        """GET a month of calendar, built from the database every time"""
+        client = self._client(self.user)
+        for index in range(count):
+            start, end = self._month(index)
+            caches[CALENDAR_CACHE_ALIAS].clear()
+            self._request(recorder, client, 'get', reverse('calendar-view'), {'start_date': start, 'end_date': end})
+
+    def bench_calendar_month_cached(self, recorder, count):
+        """GET last, this or next month of calendar, whose days are all in the calendar cache"""
+        client = self._client(self.user)
+        # Few enough dates that their version tokens stay in a default-sized locmem cache
+        months = [self._month(index) for index in (5, 6, 7)]
+        for start, end in months:
+            client.get(reverse('calendar-view'), {'start_date': start, 'end_date': end})
+        for index in range(count):
+            start, end = months[index % len(months)]
+            self._request(recorder, client, 'get', reverse('calendar-view'), {'start_date': start, 'end_date': end})
+
+    def bench_reservation_list(self, recorder, count):
+        """Page through every reservation as the admin, following next links"""
+        client = self._client(self.admin)
+        url = reverse('reservation-list')
+        for _ in range(count):
+            response = self._request(recorder, client, 'get', url)
+            url = response.data.get('next') or reverse('reservation-list')
+
+    def bench_reservation_create_contention(self, recorder, count):
+        """Clients book slots on the same date at the same moment; most collide"""
+        concurrency = self.options['concurrency']
+        free = self._free_slots()
+        outbox_before = EmailOutbox.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        created = []
+        try:
+            remaining = count
+            while remaining > 0:
+                dates = [day for day, slots in free.items() if slots]
+                if not dates:
+                    raise CommandError('No free slots left in the booking window for reservation_create_contention')
+                day = self.rng.choice(dates)
+                slots = [self.rng.choice(free[day]) for _ in range(min(concurrency, remaining))]
+                winners = self._race(recorder, [
+                    {'booking_name': 'Bench', 'date': day.isoformat(),
+                     'start_time': start.isoformat(), 'end_time': end.isoformat()}
+                    for start, end in slots
+                ])
+                created.extend(winners.values())
+                taken = {slots[index] for index in winners}
+                free[day] = [slot for slot in free[day] if slot not in taken]
+                remaining -= len(slots)
+        finally:
+            # The bookings were committed; leave the database as it was
+            Reservation.objects.filter(id__in=created).delete()
+            EmailOutbox.objects.filter(id__gt=outbox_before).delete()
+
+    def bench_login(self, recorder, count):
+        """POST email and password"""
+        client = self._client()
+        data = {'email': self.user.email, 'password': self.options['password']}
+        with _RolledBack():
+            for _ in range(count):
+                response = self._request(recorder, client, 'post', reverse('user-login'), data)
+                if response.status_code != 200:
+                    raise CommandError(f'Login as {self.user.email} failed; pass the seeded --password')
+
+    def bench_refresh(self, recorder, count):
+        """Rotate the refresh token of one session, as a long-lived browser tab does"""
+        client = self._client()
+        with _RolledBack():
+            response = client.post(reverse('user-login'), {'email': self.user.email, 'password': self.options['password']})
+            if response.status_code != 200:
+                raise CommandError(f'Login as {self.user.email} failed; pass the seeded --password')
+            for _ in range(count):
+                self._request(recorder, client, 'post', reverse('token-refresh'))
+
+    def bench_trade_accept(self, recorder, count):
+        """Target users accept trade requests, swapping the two bookings"""
+        candidates = list(
+            Reservation.objects.filter(
+                status='CONFIRMED', date__gte=self.today, user__role='user'
+            ).order_by('date', 'start_time').values_list('id', 'user_id', 'user__email')[:max(4 * count, 100)]
+        )
+        self.rng.shuffle(candidates)
+        pairs, used = [], set()
+        for offered in candidates:
+            if offered[0] in used:
+                continue
+            wanted = next((row for row in candidates if row[0] not in used and row[1] != offered[1]), None)
+            if wanted is None:
+                continue
+            used.update((offered[0], wanted[0]))
+            pairs.append((offered, wanted))
+            if len(pairs) == count:
+                break
+        if len(pairs) < count:
+            raise CommandError('Not enough upcoming confirmed reservations to trade; seed data with seed_load_data')
+
+        with _RolledBack():
+            for (offered_id, requester_id, _), (wanted_id, target_id, target_email) in pairs:
+                trade = TradeRequest.objects.create(
+                    requester_id=requester_id, target_user_id=target_id,
+                    requester_reservation_id=offered_id, target_reservation_id=wanted_id,
+                )
+                client = self._client(User(id=target_id, email=target_email))
+                self._request(recorder, client, 'post', reverse('trade-detail', args=[trade.pk]), {'action': 'accept'})
+
+    # ===================== HELPERS =====================
+
+    def _request(self, recorder, client, method, path, data=None, concurrent=False):
+        with CaptureQueriesContext(connection) as queries:
+            started = perf_counter()
+            if method == 'get':
+                response = client.get(path, data)
+            else:
+                response = getattr(client, method)(path, data, format='json')
+            elapsed = perf_counter() - started
+        recorder.record(elapsed, len(queries), response.status_code, concurrent)
+        return response
+
+    def _race(self, recorder, payloads):
+        """POST every payload at once, each from its own thread and connection;
+        {payload index: reservation id} of the ones that were created"""
+        barrier = threading.Barrier(len(payloads) + 1)
+        created = {}
+        lock = threading.Lock()
+        url = reverse('reservation-list')
+
+        def contend(index, payload):
+            try:
+                client = self._client(self.user)
+                connection.ensure_connection()
+                barrier.wait()
+                response = self._request(recorder, client, 'post', url, payload, concurrent=True)
+                if response.status_code == 201:
+                    with lock:
+                        created[index] = response.data['id']
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=contend, args=item) for item in enumerate(payloads)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        started = perf_counter()
+        for thread in threads:
+            thread.join()
+        recorder.elapsed += perf_counter() - started
+        return created
+
+    def _free_slots(self):
+        """{date: [(start, end)]} of unbooked slots from tomorrow to the end of the booking window"""
+        calendar = get_settings_snapshot().calendar
+        slots = _slots(
+            calendar.business_start_time if calendar else DEFAULT_BUSINESS_START,
+            calendar.business_end_time if calendar else DEFAULT_BUSINESS_END,
+            calendar.slot_duration_minutes if calendar else DEFAULT_SLOT_DURATION,
+        )
+        window = min(calendar.max_advance_booking_days if calendar and calendar.max_advance_booking_days else 30, 30)
+        dates = [self.today + timedelta(days=offset) for offset in range(1, window + 1)]
+        booked = {}
+        for day, start, end in Reservation.objects.filter(
+            date__range=(dates[0], dates[-1]), status__in=ACTIVE_STATUSES
+        ).values_list('date', 'start_time', 'end_time'):
+            booked.setdefault(day, []).append((start, end))
+        return {
+            day: [
+                (start, end) for start, end in slots
+                if not any(start < taken_end and taken_start < end for taken_start, taken_end in booked.get(day, ()))
+            ]
+            for day in dates
+        }
+
+    def _month(self, index):
+        """First and last day of one of the 12 months around today"""
+        month = self.today.month - 6 + index % 12
+        year = self.today.year + (month - 1) // 12
+        month = (month - 1) % 12 + 1
+        start = date(year, month, 1)
+        end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return start.isoformat(), end.isoformat()
+
+    def _client(self, user=None):
+        client = APIClient(SERVER_NAME=self.options['host'])
+        if user is not None:
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {_access_token(user)}')
+        return client
+
+    def _get_user(self, email, role):
+        if email:
+            try:
+                return User.objects.get(email=email)
+            except User.DoesNotExist:
+                raise CommandError(f'No user with email {email}')
+        users = User.objects.filter(role=role).order_by('id')
+        found = users.filter(email__startswith='loadtest-').first() or users.first()
+        if found is None:
+            raise CommandError(f'No {role} user found; run seed_load_data or pass --{role}')
+        return found
+
+    def _write_row(self, name, summary):
+        if not hasattr(self, '_header_written'):
+            self._header_written = True
+            self.stdout.write(
+                f'{"scenario":<32}{"reqs":>6}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"req/s":>10}{"queries":>9}  statuses'
+            )
+        self.stdout.write(
+            f'{name:<32}{summary["requests"]:>6}{summary["p50_ms"]:>10.2f}{summary["p95_ms"]:>10.2f}'
+            f'{summary["p99_ms"]:>10.2f}{summary["throughput_rps"]:>10.1f}{summary["queries_per_request"]:>9.1f}'
+            f'  {" ".join(f"{status}x{count}" for status, count in summary["statuses"].items())}'
+        )
+
+    def _compare(self, results, baseline, threshold):
+        """Print every metric against the baseline; the number that got worse by more than threshold percent"""
+        regressions = 0
+        self.stdout.write(f'\nAgainst baseline (worse by more than {threshold}% fails):')
+        for name, summary in results.items():
+            before = baseline.get(name)
+            if before is None:
+                self.stdout.write(f'  {name}: not in baseline')
+                continue
+            for metric, higher_is_better in METRICS.items():
+                old, new = before.get(metric), summary[metric]
+                if not old:
+                    continue
+                change = (new - old) / old * 100
+                worse_by = -change if higher_is_better else change
+                line = f'  {name} {metric}: {old} -> {new} ({change:+.1f}%)'
+                if worse_by > threshold:
+                    regressions += 1
+                    self.stdout.write(self.style.ERROR(line + '  REGRESSION'))
+                else:
+                    self.stdout.write(line)
+        return regressions
+
+
+class _RolledBack:
+    """A transaction that is always rolled back, for scenarios that write"""
+
+    def __enter__(self):
+        self.atomic = transaction.atomic()
+        self.atomic.__enter__()
+
+    def __exit__(self, *exc_info):
+        transaction.set_rollback(True)
+        return self.atomic.__exit__(*exc_info)
+
+
+def _access_token(user):
+    """An access token with the claims LoginUser issues"""
+    now = datetime.utcnow()
+    return jwt.encode(
+        {'user_id': user.id, 'email': user.email, 'exp': now + timedelta(hours=1), 'iat': now, 'type': 'access'},
+        settings.JWT_ACCESS_SECRET, algorithm='HS256'
+    )
+
+
+def _percentile(values, percent):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
@@ -0,0 +1,101 @@
+import random
+import timeit
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reservations.calendar_engine import generate_available_slots
+
+
+def generate_available_slots_nested(target_date, start_time, end_time, duration_minutes, existing_reservations, primetime=None):
+    """Previous implementation: every slot checked against every reservation"""
+    slots = []
+    current_time = datetime.combine(target_date, start_time)
+    end_datetime = datetime.combine(target_date, end_time)
+
+    while current_time < end_datetime:
+        slot_end = current_time + timedelta(minutes=duration_minutes)
+
+        if slot_end.time() <= end_time:
+            is_available = True
+            slot_type = 'FREE_FOR_ALL'
+
+            if (primetime and
+                    current_time.time() >= primetime.start_time and
+                    slot_end.time() <= primetime.end_time):
+                slot_type = 'PRIMETIME'
+
+            for reservation in existing_reservations:
+                res_start = datetime.combine(target_date, reservation.start_time)
+                res_end = datetime.combine(target_date, reservation.end_time)
+
+                if (current_time < res_end and slot_end > res_start):
+                    is_available = False
+                    break
+
+            if is_available:
+                slots.append({
+                    'start_time': current_time.time().isoformat(),
+                    'end_time': slot_end.time().isoformat(),
+                    'type': slot_type,
+                    'available': True
+                })
+
+        current_time += timedelta(minutes=duration_minutes)
+
+    return slots
+
+
+def build_day_fixture(reservation_count, seed=0, start_hour=0, end_hour=24):
+    """Non-overlapping reservations with random gaps, sorted by start time"""
+    rng = random.Random(seed)
+    day_minutes = (end_hour - start_hour) * 60
+    length = max(1, day_minutes // max(1, reservation_count * 2))
+    reservations = []
+    minute = start_hour * 60
+    limit = end_hour * 60 - 1
+    while len(reservations) < reservation_count and minute + length <= limit:
+        minute += rng.randint(0, length)
+        end = min(minute + rng.randint(1, length), limit)
+        if end <= minute:
+            break
+        reservations.append(SimpleNamespace(
+            start_time=time(minute // 60, minute % 60),
+            end_time=time(end // 60, end % 60),
+        ))
+        minute = end
+    return reservations
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark the sweep slot generator against the previous nested-loop implementation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservations', type=int, default=200, help='Reservations on the benchmarked day')
+        parser.add_argument('--slot-minutes', type=int, default=5, help='Slot duration in minutes')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per implementation')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        target_date = date.today()
+        business_start, business_end = time(0, 0), time(23, 59)
+        primetime = SimpleNamespace(start_time=time(12, 0), end_time=time(14, 0))
+        reservations = build_day_fixture(options['reservations'], seed=options['seed'])
+        call_args = (target_date, business_start, business_end, options['slot_minutes'], reservations, primetime)
+
+        expected = generate_available_slots_nested(*call_args)
+        if generate_available_slots(*call_args) != expected:
+            raise CommandError('Sweep output differs from the nested-loop implementation')
+
+        repeat = options['repeat']
+        nested = min(timeit.repeat(lambda: generate_available_slots_nested(*call_args), number=1, repeat=repeat))
+        sweep = min(timeit.repeat(lambda: generate_available_slots(*call_args), number=1, repeat=repeat))
+
+        self.stdout.write(
+            f'{len(reservations)} reservations, {options["slot_minutes"]}-minute slots, '
+            f'{len(expected)} available slots'
+        )
+        self.stdout.write(f'nested loop: {nested * 1000:.3f} ms')
+        self.stdout.write(f'sweep:       {sweep * 1000:.3f} ms')
+        self.stdout.write(self.style.SUCCESS(f'speed-up:    {nested / sweep:.1f}x'))
@@ -0,0 +1,72 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.template import Context, Template
+from django.utils.html import strip_tags
+
+from backend.utils.email import BASE_HTML_TEMPLATE, get_compiled_template, render_html_emails
+
+
+def render_html_email_uncached(subject, content, details=None, preheader=None):
+    """Previous rendering: template parsed per message, text part stripped from the full HTML"""
+    context = Context({
+        'subject': subject,
+        'preheader': preheader or '',
+        'content': content,
+        'details': details or ''
+    })
+    html_body = Template(BASE_HTML_TEMPLATE).render(context)
+    return html_body, strip_tags(html_body)
+
+
+def build_messages(count):
+    """Confirmation emails shaped like the ones ReservationListView queues"""
+    start = date.today()
+    return [{
+        'subject': 'Reservation Confirmed',
+        'preheader': 'Thank you for choosing our service.',
+        'content': (
+            f"Dear user{i}@example.com,<br/><br/>"
+            "Your reservation has been <strong>confirmed</strong>.<br/><br/>"
+            "Please find the reservation details below. If you have any questions, reply to this email."
+        ),
+        'details': (
+            f"Date: {start + timedelta(days=i % 30)}\n"
+            f"Time: {7 + i % 12:02d}:00:00 - {8 + i % 12:02d}:00:00\n"
+            "Type: Free for All\n"
+            "Status: Confirmed\n"
+        ),
+    } for i in range(count)]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-message email rendering: uncached template + strip_tags versus the compiled template and bulk render'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=10000, help='Messages rendered per implementation')
+
+    def handle(self, *args, **options):
+        messages = build_messages(options['messages'])
+        count = len(messages)
+
+        started = time.perf_counter()
+        for message in messages:
+            render_html_email_uncached(message['subject'], message['content'], message['details'], message['preheader'])
+        uncached = time.perf_counter() - started
+
+        get_compiled_template()
+        started = time.perf_counter()
+        for message in messages:
+            render_html_emails([message])
+        cached = time.perf_counter() - started
+
+        started = time.perf_counter()
+        render_html_emails(messages)
+        bulk = time.perf_counter() - started
+
+        self.stdout.write(f'{count} messages')
+        self.stdout.write(f'uncached:        {uncached / count * 1e6:8.1f} us/message')
+        self.stdout.write(f'compiled:        {cached / count * 1e6:8.1f} us/message')
+        self.stdout.write(f'compiled (bulk): {bulk / count * 1e6:8.1f} us/message')
+        self.stdout.write(self.style.SUCCESS(f'speed-up:        {uncached / bulk:.1f}x'))
@@ -0,0 +1,89 @@
+import random
+import time
+from collections import namedtuple
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from reservations.models import Reservation
+from reservations.serializers import ReservationReadSerializer, ReservationSerializer
+
+User = get_user_model()
+
+Row = namedtuple('Row', ReservationReadSerializer.FIELDS)
+
+
+def build_reservation_fixture(count, seed=0):
+    """Unsaved reservations with their users attached, plus the equivalent values_list rows"""
+    rng = random.Random(seed)
+    users = [
+        User(id=i + 1, email=f'user{i}@example.com', first_name=f'First{i}', last_name=f'Last{i}',
+             role='admin' if i % 10 == 0 else 'user')
+        for i in range(50)
+    ]
+    admin = users[0]
+    today = date.today()
+    created = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+    instances, rows = [], []
+    for i in range(count):
+        user = rng.choice(users)
+        status = rng.choice(['PENDING', 'CONFIRMED', 'CONFIRMED', 'CANCELLED', 'COMPLETED'])
+        approved = status == 'CONFIRMED' and i % 3 == 0
+        reservation = Reservation(
+            id=i + 1,
+            user=user,
+            booking_name=f'Booking {i}',
+            date=today + timedelta(days=rng.randint(-30, 30)),
+            start_time=dt_time(7 + i % 12, 0),
+            end_time=dt_time(8 + i % 12, 0),
+            status=status,
+            reservation_type=rng.choice(['FREE_FOR_ALL', 'PRIMETIME']),
+            notes='Team meeting' if i % 2 else '',
+            approved_by=admin if approved else None,
+            approved_at=created + timedelta(hours=i) if approved else None,
+            rejection_reason='',
+            created_at=created + timedelta(minutes=i),
+            updated_at=created + timedelta(minutes=i, seconds=30),
+        )
+        instances.append(reservation)
+
+        values = {name: getattr(reservation, name) for name in ReservationReadSerializer.FIELDS if '__' not in name}
+        for name in ReservationReadSerializer.USER_FIELDS:
+            values[f'user__{name}'] = getattr(user, name)
+            values[f'approved_by__{name}'] = getattr(admin, name) if approved else None
+        rows.append(Row(**values))
+    return instances, rows
+
+
+class Command(BaseCommand):
+    help = 'Benchmark list serialization: ReservationSerializer on model instances versus ReservationReadSerializer on values_list rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Reservations serialized per implementation')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per implementation; the best is reported')
+
+    def handle(self, *args, **options):
+        instances, rows = build_reservation_fixture(options['rows'])
+        count = len(instances)
+
+        if ReservationSerializer(instances, many=True).data != ReservationReadSerializer(rows, many=True).data:
+            self.stderr.write(self.style.ERROR('Outputs differ'))
+            return
+
+        def best(func):
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - started)
+            return min(timings)
+
+        model = best(lambda: ReservationSerializer(instances, many=True).data)
+        lean = best(lambda: ReservationReadSerializer(rows, many=True).data)
+
+        self.stdout.write(f'{count} rows (serialization only; the model path also needs user/approved_by loaded)')
+        self.stdout.write(f'ReservationSerializer:     {model / count * 1e6:8.1f} us/row')
+        self.stdout.write(f'ReservationReadSerializer: {lean / count * 1e6:8.1f} us/row')
+        self.stdout.write(self.style.SUCCESS(f'speed-up:                  {model / lean:.1f}x'))
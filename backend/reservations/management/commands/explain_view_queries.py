@@ -0,0 +1,116 @@
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from reservations.views import (
+    AdminDashboardView,
+    CalendarView,
+    ReservationListView,
+    UserDashboardView,
+)
+
+User = get_user_model()
+
+# Tables whose hot queries are expected to be served by an index
+INDEXED_TABLES = ('reservations_reservation', 'reservations_reservationauditlog')
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the reservation views and EXPLAIN ANALYZE every SELECT they issue, '
+        'flagging sequential scans on the reservation tables. Run it against a '
+        'database with realistic volume: on a near-empty table Postgres prefers '
+        'a seq scan regardless of the indexes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Email of the regular user to run the views as (default: first user)')
+        parser.add_argument('--admin', help='Email of the admin to run the admin views as (default: first admin)')
+        parser.add_argument('--date', help='Date used for filters, YYYY-MM-DD (default: today)')
+        parser.add_argument('--buffers', action='store_true', help='Include buffer usage in the plans')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('EXPLAIN ANALYZE output is only supported on PostgreSQL')
+
+        user = self._get_user(options['user'], role='user')
+        admin = self._get_user(options['admin'], role='admin')
+        day = options['date'] or date.today().isoformat()
+        explain = 'EXPLAIN (ANALYZE, BUFFERS) ' if options['buffers'] else 'EXPLAIN ANALYZE '
+
+        cases = [
+            ('reservation list (user)', ReservationListView, reverse('reservation-list'), {}, user),
+            ('reservation list (admin, filtered)', ReservationListView, reverse('reservation-list'),
+             {'date': day, 'status': 'CONFIRMED'}, admin),
+            ('calendar', CalendarView, reverse('calendar-view'), {'start_date': day}, user),
+            ('user dashboard', UserDashboardView, reverse('user-dashboard'), {}, user),
+            ('admin dashboard', AdminDashboardView, reverse('admin-dashboard'), {}, admin),
+        ]
+
+        factory = APIRequestFactory()
+        seq_scans = 0
+
+        # EXPLAIN ANALYZE executes the statements and the views may create
+        # default rows, so everything runs in a transaction that is rolled back
+        try:
+            with transaction.atomic():
+                for label, view, path, params, as_user in cases:
+                    request = factory.get(path, params)
+                    force_authenticate(request, user=as_user)
+
+                    with CaptureQueriesContext(connection) as captured:
+                        response = view.as_view()(request)
+                    if response.status_code != 200:
+                        raise CommandError(f'{label}: {path} returned {response.status_code}')
+
+                    self.stdout.write(self.style.MIGRATE_HEADING(f'== {label}: GET {path}'))
+                    for query in captured.captured_queries:
+                        sql = query['sql']
+                        if not sql.lstrip().upper().startswith('SELECT'):
+                            continue
+                        seq_scans += self._explain(explain, sql)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        if seq_scans:
+            self.stdout.write(self.style.WARNING(f'{seq_scans} sequential scan(s) on reservation tables'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No sequential scans on reservation tables'))
+
+    def _explain(self, explain, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(explain + sql)
+            plan = [row[0] for row in cursor.fetchall()]
+
+        self.stdout.write(sql)
+        seq_scans = 0
+        for line in plan:
+            if 'Seq Scan' in line and any(f' on {table}' in line for table in INDEXED_TABLES):
+                seq_scans += 1
+                self.stdout.write(self.style.WARNING(f'  {line}'))
+            else:
+                self.stdout.write(f'  {line}')
+        self.stdout.write('')
+        return seq_scans
+
+    def _get_user(self, email, role):
+        if email:
+            try:
+                return User.objects.get(email=email)
+            except User.DoesNotExist:
+                raise CommandError(f'No user with email {email}')
+
+        found = User.objects.filter(role=role).order_by('id').first()
+        if found is None:
+            raise CommandError(f'No {role} user found; pass --{role} or create one')
+        return found
@@ -1,35 +1,85 @@
-from django.core.management.base import BaseCommand
-from django.utils import timezone
+import time
 from datetime import date
-from backend.reservations.models import Reservation, ReservationAuditLog
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from reservations.calendar_cache import bump_calendar_dates
+from reservations.events import publish_calendar_change
+from reservations.models import ACTIVE_STATUSES, Reservation, ReservationAuditLog
+
+# One batch: lock the next rows in id order, flip them to COMPLETED and return
+# what the audit log needs (including the status each row had before) and the
+# dates whose cached calendar days are now stale. change_seq is stamped like
+# Reservation.save() does, so delta-sync clients see the rows
+MARK_BATCH_SQL = """
+    WITH batch AS (
+        SELECT id, status
+        FROM {table}
+        WHERE date < %s AND status IN %s AND id > %s
+        ORDER BY id
+        LIMIT %s
+        FOR UPDATE
+    )
+    UPDATE {table} AS reservation
+    SET status = 'COMPLETED', updated_at = %s, change_seq = pg_current_xact_id()::text::bigint
+    FROM batch
+    WHERE reservation.id = batch.id
+    RETURNING reservation.id, reservation.user_id, batch.status, reservation.date
+"""
+
 
 class Command(BaseCommand):
     help = 'Mark reservations in the past as COMPLETED and write audit logs (idempotent)'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Reservations updated per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Report how many reservations would be marked without changing anything')
+
     def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
         today = date.today()
         # Select reservations strictly before today and still pending/confirmed
-        qs = Reservation.objects.filter(date__lt=today, status__in=['PENDING', 'CONFIRMED'])
-        total = qs.count()
+        total = Reservation.objects.filter(date__lt=today, status__in=ACTIVE_STATUSES).count()
+
+        if options['dry_run']:
+            batches = -(-total // batch_size)
+            self.stdout.write(f'Dry run: {total} past reservations would be marked COMPLETED in {batches} batch(es)')
+            return
+
+        sql = MARK_BATCH_SQL.format(table=connection.ops.quote_name(Reservation._meta.db_table))
+        started = time.monotonic()
         updated = 0
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, [today, tuple(ACTIVE_STATUSES), last_id, batch_size, timezone.now()])
+                    rows = cursor.fetchall()
+                if not rows:
+                    break
+
+                ReservationAuditLog.objects.bulk_create([
+                    ReservationAuditLog(
+                        reservation_id=reservation_id,
+                        action='UPDATED',
+                        performed_by_id=user_id,
+                        details={'change': f'status {old_status} -> COMPLETED by management command'}
+                    )
+                    for reservation_id, user_id, old_status, _ in rows
+                ])
+                # The raw UPDATE skips the post_save signal that invalidates
+                # and announces calendar days
+                dates = {row[3] for row in rows}
+                bump_calendar_dates(*dates)
+                publish_calendar_change(*dates)
 
-        for r in qs:
-            old_status = r.status
-            r.status = 'COMPLETED'
-            r.save(update_fields=['status', 'updated_at'])
-
-            # Create an audit log entry
-            try:
-                ReservationAuditLog.objects.create(
-                    reservation=r,
-                    action='UPDATED',
-                    performed_by=r.user,
-                    details={'change': f'status {old_status} -> COMPLETED by management command'}
-                )
-            except Exception:
-                # Don't stop the command for audit failures
-                pass
-
-            updated += 1
+            updated += len(rows)
+            last_id = max(row[0] for row in rows)
+            self.stdout.write(f'  {updated}/{total} marked ({time.monotonic() - started:.1f}s)')
 
         self.stdout.write(self.style.SUCCESS(f'Marked {updated} of {total} past reservations as COMPLETED'))
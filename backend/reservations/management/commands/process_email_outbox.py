@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reservations.outbox import DEFAULT_BATCH_SIZE, DEFAULT_MAX_ATTEMPTS, process_outbox_batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Deliver queued emails from the EmailOutbox table. Safe to run several '
+        'copies at once: batches are claimed with FOR UPDATE SKIP LOCKED.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Messages claimed and sent per SMTP connection')
+        parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS, help='Attempts before a message is marked FAILED')
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting once the queue is drained')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to wait between polls of an empty queue (with --loop)')
+
+    def handle(self, *args, **options):
+        totals = {'sent': 0, 'retrying': 0, 'failed': 0}
+        try:
+            while True:
+                result = process_outbox_batch(batch_size=options['batch_size'], max_attempts=options['max_attempts'])
+                for key in totals:
+                    totals[key] += getattr(result, key)
+                if result.claimed:
+                    self.stdout.write(
+                        f'Claimed {result.claimed}: {result.sent} sent, {result.retrying} to retry, {result.failed} failed'
+                    )
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Sent {totals["sent"]} email(s); {totals["retrying"]} scheduled for retry, {totals["failed"]} failed permanently'
+        ))
@@ -0,0 +1,114 @@
+import heapq
+import logging
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# (job name, default interval in seconds, extra command options)
+JOBS = [
+    ('mark_past_reservations_completed', 3600, {}),
+    ('prune_blacklist', 6 * 3600, {'sleep': 0.05}),
+]
+
+
+class Scheduler:
+    """Runs callables at fixed intervals, earliest due first, in the calling thread"""
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep):
+        self._clock = clock
+        self._sleep = sleep
+        self._queue = []
+        self._seq = 0
+
+    def add(self, name, interval, func, run_now=True):
+        first_run = self._clock() + (0 if run_now else interval)
+        heapq.heappush(self._queue, (first_run, self._seq, name, interval, func))
+        self._seq += 1
+
+    def run_pending(self):
+        """Run every job that is due; returns the names that ran"""
+        ran = []
+        now = self._clock()
+        while self._queue and self._queue[0][0] <= now:
+            due, seq, name, interval, func = heapq.heappop(self._queue)
+            try:
+                func()
+            except Exception:
+                # One failing job must not stop the others
+                logger.exception('Scheduled job %s failed', name)
+            # Schedule from the due time so runs don't drift; skip missed runs
+            next_run = due + interval
+            if next_run <= self._clock():
+                next_run = self._clock() + interval
+            heapq.heappush(self._queue, (next_run, seq, name, interval, func))
+            ran.append(name)
+        return ran
+
+    def seconds_until_next(self):
+        if not self._queue:
+            return None
+        return max(0.0, self._queue[0][0] - self._clock())
+
+    def run_forever(self, max_sleep=60.0):
+        while True:
+            self.run_pending()
+            wait = self.seconds_until_next()
+            self._sleep(max_sleep if wait is None else min(wait, max_sleep))
+
+
+class Command(BaseCommand):
+    help = (
+        'Run periodic maintenance jobs (mark_past_reservations_completed, prune_blacklist) '
+        'on fixed intervals in one long-running process, without cron.'
+    )
+
+    def add_arguments(self, parser):
+        for name, interval, _ in JOBS:
+            parser.add_argument(
+                f'--{name.replace("_", "-")}-interval', type=float, default=interval,
+                help=f'Seconds between {name} runs (default {interval}; 0 disables it)'
+            )
+        parser.add_argument('--once', action='store_true', help='Run every enabled job once and exit')
+
+    def handle(self, *args, **options):
+        scheduler = Scheduler()
+        enabled = []
+        for name, _, job_options in JOBS:
+            interval = options[f'{name}_interval']
+            if interval < 0:
+                raise CommandError(f'--{name.replace("_", "-")}-interval must not be negative')
+            if interval == 0:
+                continue
+            scheduler.add(name, interval, self.job(name, job_options, reconnect=not options['once']))
+            enabled.append(f'{name} every {interval:g}s')
+
+        if not enabled:
+            raise CommandError('Every job is disabled')
+
+        if options['once']:
+            scheduler.run_pending()
+            return
+
+        self.stdout.write(f'Scheduler started: {", ".join(enabled)}')
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write('Scheduler stopped')
+
+    def job(self, name, job_options, reconnect=True):
+        def run():
+            # Between runs the database may have restarted or dropped idle
+            # connections; start each job from a usable one
+            if reconnect:
+                close_old_connections()
+            out = StringIO()
+            started = time.monotonic()
+            call_command(name, stdout=out, **job_options)
+            last_line = out.getvalue().strip().splitlines()[-1:] or ['']
+            self.stdout.write(f'[{name}] {last_line[0]} ({time.monotonic() - started:.1f}s)')
+        return run
@@ -0,0 +1,402 @@
+import io
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from reservations.calendar_cache import bump_calendar_dates
+from reservations.calendar_engine import DEFAULT_BUSINESS_END, DEFAULT_BUSINESS_START, DEFAULT_SLOT_DURATION
+from reservations.events import publish_calendar_change
+from reservations.models import Reservation, ReservationAuditLog, TradeRequest
+from reservations.settings_cache import get_settings_snapshot
+
+User = get_user_model()
+
+RESERVATION_FIELDS = (
+    'id', 'user', 'booking_name', 'date', 'start_time', 'end_time', 'status', 'reservation_type', 'notes',
+    'approved_by', 'approved_at', 'rejection_reason', 'created_at', 'updated_at', 'change_seq',
+)
+TRADE_FIELDS = (
+    'id', 'requester', 'target_user', 'requester_reservation', 'target_reservation', 'status', 'message',
+    'response_message', 'created_at', 'updated_at', 'responded_at',
+)
+AUDIT_LOG_FIELDS = ('reservation', 'action', 'performed_by', 'details', 'timestamp')
+
+BOOKING_NAMES = ('Team meeting', 'Practice', 'Workshop', 'Training', 'Birthday party', 'Rehearsal', 'Interview')
+FIRST_NAMES = ('Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Drew', 'Avery')
+LAST_NAMES = ('Reyes', 'Santos', 'Cruz', 'Garcia', 'Lopez', 'Bautista', 'Tan', 'Lim', 'Ramos', 'Flores')
+
+# (status, weight) by whether the date has passed and whether the slot is primetime
+STATUS_WEIGHTS = {
+    (False, False): (('CONFIRMED', 90), ('CANCELLED', 10)),
+    (False, True): (('PENDING', 40), ('CONFIRMED', 45), ('REJECTED', 10), ('CANCELLED', 5)),
+    (True, False): (('COMPLETED', 85), ('CANCELLED', 15)),
+    (True, True): (('COMPLETED', 70), ('REJECTED', 20), ('CANCELLED', 10)),
+}
+TRADE_STATUS_WEIGHTS = (('PENDING', 60), ('ACCEPTED', 15), ('REJECTED', 15), ('CANCELLED', 10))
+# Share of bookings that take two consecutive slots
+DOUBLE_SLOT_RATE = 0.2
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk-insert synthetic users, reservations, trade requests and audit logs for '
+        'load and capacity testing. Output is deterministic for a given --seed. '
+        'Users are inserted with bulk_create, everything else with COPY. The calendar '
+        'is one shared resource, so there are at most (slots per day) active bookings '
+        'per date: 10M reservations takes --days around 900000 at --density 1. Each row '
+        'is checked against the overlap constraint, so on a multi-core server use --workers. '
+        'Run it against a database nothing else is writing to; ids are assigned by the command.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Users to create')
+        parser.add_argument('--days', type=int, default=365, help='Days of reservations')
+        parser.add_argument('--density', type=float, default=0.6, help='Share of calendar slots booked, 0-1')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed produces the same data')
+        parser.add_argument('--start-date', help='First day, YYYY-MM-DD (default: --days/2 days before today)')
+        parser.add_argument('--admins', type=int, help='How many of the users are admins (default: 1 per 100 users)')
+        parser.add_argument('--trade-rate', type=float, default=0.05,
+                            help='Share of upcoming confirmed bookings offered in a trade request')
+        parser.add_argument('--batch-size', type=int, default=100000, help='Reservations written per transaction')
+        parser.add_argument('--password', default='loadtest123', help='Password of every generated user')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Connections writing batches in parallel; the overlap check makes COPY CPU-bound in Postgres')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('seed_load_data uses COPY and only supports PostgreSQL')
+
+        users, days, density, seed = options['users'], options['days'], options['density'], options['seed']
+        admins = options['admins'] if options['admins'] is not None else max(1, users // 100)
+        if users < 2 or days < 1 or options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--users must be at least 2, --days, --batch-size and --workers at least 1')
+        if not 0 <= density <= 1 or not 0 <= options['trade_rate'] <= 1:
+            raise CommandError('--density and --trade-rate must be between 0 and 1')
+        if not 1 <= admins < users:
+            raise CommandError('--admins must be at least 1 and leave at least one regular user')
+
+        today = date.today()
+        try:
+            if options['start_date']:
+                start_date = date.fromisoformat(options['start_date'])
+            else:
+                start_date = today - timedelta(days=days // 2)
+            end_date = start_date + timedelta(days=days - 1)
+        except (ValueError, OverflowError):
+            raise CommandError('The date range does not fit in years 1-9999; use fewer --days or another --start-date')
+
+        if Reservation.objects.filter(date__range=(start_date, end_date)).exists():
+            raise CommandError(f'There are already reservations between {start_date} and {end_date}')
+        email_prefix = f'loadtest-{seed}-'
+        if User.objects.filter(email__startswith=email_prefix).exists():
+            raise CommandError(f'Users for --seed {seed} already exist; use another seed')
+
+        snapshot = get_settings_snapshot()
+        calendar = snapshot.calendar
+        slots = _slots(
+            calendar.business_start_time if calendar else DEFAULT_BUSINESS_START,
+            calendar.business_end_time if calendar else DEFAULT_BUSINESS_END,
+            calendar.slot_duration_minutes if calendar else DEFAULT_SLOT_DURATION,
+        )
+        self.stdout.write(
+            f'{start_date} to {end_date}: about {int(days * len(slots) * density * (1 - DOUBLE_SLOT_RATE / 2))} '
+            f'reservations ({len(slots)} slots per day)'
+        )
+
+        rng = random.Random(seed)
+        started = time.monotonic()
+        admin_ids, user_ids = self._create_users(rng, users, admins, email_prefix, options['password'])
+        self.stdout.write(f'  {users} users ({admins} admins) ({time.monotonic() - started:.1f}s)')
+
+        generator = _LoadGenerator(
+            rng, snapshot, slots, today, density, options['trade_rate'], admin_ids, user_ids,
+            next_reservation_id=_max_id(Reservation) + 1, next_trade_id=_max_id(TradeRequest) + 1,
+        )
+        totals = {'reservations': 0, 'trades': 0, 'audit logs': 0}
+
+        def written(batch):
+            totals['reservations'] += len(batch.reservations)
+            totals['trades'] += len(batch.trades)
+            totals['audit logs'] += len(batch.audit_logs)
+            self.stdout.write(
+                f'  up to {batch.dates[-1]}: {totals["reservations"]} reservations '
+                f'({time.monotonic() - started:.1f}s)'
+            )
+
+        # Batches cover separate dates and only reference their own rows and the
+        # users, so they can be written in any order. Generating stays in this
+        # thread, so the data doesn't depend on --workers
+        workers = options['workers']
+        pool = ThreadPoolExecutor(workers) if workers > 1 else None
+        in_flight = deque()
+        try:
+            batch_start = start_date
+            while batch_start <= end_date:
+                batch = generator.generate(batch_start, end_date, options['batch_size'])
+                batch_start = batch.dates[-1] + timedelta(days=1)
+                if pool is None:
+                    _write_batch(batch)
+                    written(batch)
+                    continue
+                in_flight.append((batch, pool.submit(_write_batch, batch, close_connection=True)))
+                while len(in_flight) >= 2 * workers:
+                    done, future = in_flight.popleft()
+                    future.result()
+                    written(done)
+            while in_flight:
+                done, future = in_flight.popleft()
+                future.result()
+                written(done)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        # The ids were assigned here, so move the sequences past them
+        for model in (Reservation, TradeRequest):
+            _reset_sequence(model)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Inserted {users} users, ' + ', '.join(f'{count} {name}' for name, count in totals.items())
+            + f' in {time.monotonic() - started:.1f}s'
+        ))
+
+    def _create_users(self, rng, count, admins, email_prefix, password):
+        password = make_password(password)
+        joined = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        created = User.objects.bulk_create(
+            (
+                User(
+                    username=f'{email_prefix}{index}',
+                    email=f'{email_prefix}{index}@example.com',
+                    password=password,
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=rng.choice(LAST_NAMES),
+                    role='admin' if index < admins else 'user',
+                    date_joined=joined + timedelta(minutes=index),
+                )
+                for index in range(count)
+            ),
+            batch_size=5000,
+        )
+        return [user.id for user in created[:admins]], [user.id for user in created[admins:]]
+
+
+class _Batch:
+    def __init__(self):
+        self.dates = []
+        self.reservations = []
+        self.trades = []
+        self.audit_logs = []
+
+
+class _LoadGenerator:
+    """Rows for consecutive days, drawn from one random stream so a seed always gives the same data"""
+
+    def __init__(self, rng, snapshot, slots, today, density, trade_rate, admin_ids, user_ids,
+                 next_reservation_id, next_trade_id):
+        self.rng = rng
+        self.snapshot = snapshot
+        self.slots = slots
+        self.today = today
+        self.density = density
+        self.trade_rate = trade_rate
+        self.admin_ids = admin_ids
+        self.user_ids = user_ids
+        self.next_reservation_id = next_reservation_id
+        self.next_trade_id = next_trade_id
+        # Latest plausible creation time: bookings are never made in the future
+        self.latest_created = datetime.combine(today - timedelta(days=1), dt_time(20, 0), tzinfo=dt_timezone.utc)
+
+    def generate(self, start_date, end_date, batch_size):
+        """Whole days from start_date until batch_size reservations or end_date is reached"""
+        batch = _Batch()
+        current_date = start_date
+        while current_date <= end_date and len(batch.reservations) < batch_size:
+            batch.dates.append(current_date)
+            self._day(batch, current_date)
+            current_date += timedelta(days=1)
+        self._trades(batch)
+        return batch
+
+    def _day(self, batch, current_date):
+        rng = self.rng
+        slots = self.slots
+        primetime = self.snapshot.primetime_for(current_date)
+        past = current_date < self.today
+
+        index = 0
+        while index < len(slots):
+            if rng.random() >= self.density:
+                index += 1
+                continue
+            start_time, end_time = slots[index]
+            # Some bookings take the next slot too; it is then skipped, so nothing overlaps
+            if index + 1 < len(slots) and rng.random() < DOUBLE_SLOT_RATE:
+                index += 1
+                end_time = slots[index][1]
+            index += 1
+
+            is_primetime = bool(primetime and start_time >= primetime.start_time and end_time <= primetime.end_time)
+            self._reservation(batch, current_date, start_time, end_time, is_primetime, past)
+
+    def _reservation(self, batch, current_date, start_time, end_time, is_primetime, past):
+        rng = self.rng
+        reservation_id = self.next_reservation_id
+        self.next_reservation_id += 1
+        user_id = rng.choice(self.user_ids)
+        status = _weighted(rng, STATUS_WEIGHTS[past, is_primetime])
+
+        created_at = min(
+            datetime.combine(current_date - timedelta(days=rng.randint(0, 30)), dt_time(8, 0), tzinfo=dt_timezone.utc)
+            + timedelta(seconds=rng.randint(0, 12 * 3600)),
+            self.latest_created,
+        )
+        updated_at = created_at
+        approved_by = approved_at = None
+        rejection_reason = ''
+        audit_logs = [(reservation_id, 'CREATED', user_id, '{}', created_at)]
+
+        # Primetime bookings that left PENDING were decided by an admin
+        if is_primetime and status != 'PENDING':
+            admin_id = rng.choice(self.admin_ids)
+            decided_at = created_at + timedelta(hours=rng.randint(1, 48))
+            if status == 'REJECTED':
+                rejection_reason = 'Slot reserved for another event'
+                audit_logs.append((reservation_id, 'REJECTED', admin_id, '{}', decided_at))
+            else:
+                approved_by, approved_at = admin_id, decided_at
+                audit_logs.append((reservation_id, 'APPROVED', admin_id, '{}', decided_at))
+            updated_at = decided_at
+        if status == 'CANCELLED':
+            updated_at += timedelta(hours=rng.randint(1, 72))
+            audit_logs.append((reservation_id, 'CANCELLED', user_id, '{}', updated_at))
+        elif status == 'COMPLETED':
+            # As written by mark_past_reservations_completed
+            updated_at = datetime.combine(current_date + timedelta(days=1), dt_time(0, 5), tzinfo=dt_timezone.utc)
+            audit_logs.append((
+                reservation_id, 'UPDATED', user_id,
+                '{"change": "status CONFIRMED -> COMPLETED by management command"}', updated_at,
+            ))
+
+        batch.reservations.append((
+            reservation_id, user_id, rng.choice(BOOKING_NAMES), current_date, start_time, end_time, status,
+            'PRIMETIME' if is_primetime else 'FREE_FOR_ALL', '', approved_by, approved_at, rejection_reason,
+            created_at, updated_at,
+        ))
+        batch.audit_logs.extend(audit_logs)
+
+    def _trades(self, batch):
+        """Trade requests between upcoming confirmed free-for-all bookings of different users"""
+        rng = self.rng
+        tradeable = [
+            row for row in batch.reservations
+            if row[6] == 'CONFIRMED' and row[7] == 'FREE_FOR_ALL' and row[3] >= self.today
+        ]
+        if len(tradeable) < 2:
+            return
+
+        for offered in tradeable:
+            if rng.random() >= self.trade_rate:
+                continue
+            wanted = rng.choice(tradeable)
+            if wanted[1] == offered[1]:
+                continue
+
+            trade_id = self.next_trade_id
+            self.next_trade_id += 1
+            status = _weighted(rng, TRADE_STATUS_WEIGHTS)
+            created_at = min(max(offered[12], wanted[12]) + timedelta(hours=rng.randint(1, 24)), self.latest_created)
+            responded_at = created_at + timedelta(hours=rng.randint(1, 24)) if status in ('ACCEPTED', 'REJECTED') else None
+            requester, target_user = offered[1], wanted[1]
+            if status == 'ACCEPTED':
+                # The swap already happened: each side holds the other's original
+                # slot, and the target user is the one who accepted
+                requester, target_user = target_user, requester
+                for reservation in (offered, wanted):
+                    batch.audit_logs.append(
+                        (reservation[0], 'TRADED', target_user, f'{{"trade_id": {trade_id}}}', responded_at)
+                    )
+            batch.trades.append((
+                trade_id, requester, target_user, offered[0], wanted[0], status,
+                'Would you swap slots?', 'Sorry, I need this slot' if status == 'REJECTED' else '',
+                created_at, responded_at or created_at, responded_at,
+            ))
+
+
+def _write_batch(batch, close_connection=False):
+    """COPY one batch in its own transaction; close_connection when running in a worker thread"""
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_current_xact_id()::text::bigint')
+                change_seq = cursor.fetchone()[0]
+                _copy(cursor, Reservation, RESERVATION_FIELDS, [row + (change_seq,) for row in batch.reservations])
+                _copy(cursor, TradeRequest, TRADE_FIELDS, batch.trades)
+                _copy(cursor, ReservationAuditLog, AUDIT_LOG_FIELDS, batch.audit_logs)
+            # COPY skips the post_save signal that invalidates and announces calendar days
+            bump_calendar_dates(*batch.dates)
+            publish_calendar_change(*batch.dates)
+    finally:
+        if close_connection:
+            connection.close()
+
+
+def _slots(business_start, business_end, slot_duration):
+    """(start, end) of every slot in a business day"""
+    slots = []
+    current = datetime.combine(date.min, business_start)
+    end = datetime.combine(date.min, business_end)
+    step = timedelta(minutes=slot_duration)
+    while current + step <= end:
+        slots.append((current.time(), (current + step).time()))
+        current += step
+    return slots
+
+
+def _weighted(rng, choices):
+    total = sum(weight for _, weight in choices)
+    point = rng.random() * total
+    for value, weight in choices:
+        point -= weight
+        if point < 0:
+            return value
+    return choices[-1][0]
+
+
+def _max_id(model):
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {connection.ops.quote_name(model._meta.db_table)}')
+        return cursor.fetchone()[0]
+
+
+def _reset_sequence(model):
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) "
+            f'FROM {connection.ops.quote_name(table)}',
+            [table],
+        )
+
+
+def _copy(cursor, model, fields, rows):
+    """COPY rows (tuples in the order of fields) into model's table"""
+    if not rows:
+        return
+    columns = ', '.join(connection.ops.quote_name(model._meta.get_field(name).column) for name in fields)
+    buffer = io.StringIO()
+    for row in rows:
+        # Generated values hold no tabs, newlines or backslashes, so only NULL needs encoding
+        buffer.write('\t'.join(r'\N' if value is None else str(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor.copy_expert(
+        f'COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) FROM STDIN', buffer
+    )
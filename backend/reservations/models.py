@@ -1,10 +1,20 @@
 from django.db import models
+from django.db.models import ExpressionWrapper, F, Func, Q
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from datetime import datetime, time, date
 
 User = get_user_model()
 
+# Statuses that hold a slot on the calendar
+ACTIVE_STATUSES = ['CONFIRMED', 'PENDING']
+
+OVERLAP_CONSTRAINT = 'reservation_no_overlap'
+OVERLAP_ERROR = "This time slot overlaps with an existing reservation"
+
 class PrimeTimeSettings(models.Model):
     """Admin-configurable primetime hours for each day of the week"""
     WEEKDAY_CHOICES = [
@@ -34,6 +44,45 @@ class PrimeTimeSettings(models.Model):
         if self.start_time >= self.end_time:
             raise ValidationError("Start time must be before end time")
 
+class TsRange(Func):
+    """tsrange(start, end) with the default [) bounds, so back-to-back bookings don't overlap"""
+    function = 'TSRANGE'
+    output_field = DateTimeRangeField()
+
+
+class CurrentTransactionId(Func):
+    """The writing transaction's 64-bit id, pg_current_xact_id() (Postgres 13+), as a bigint"""
+    template = 'pg_current_xact_id()::text::bigint'
+    output_field = models.BigIntegerField()
+
+
+class ChangeSequenceField(models.BigIntegerField):
+    """Stamped with CurrentTransactionId() in the database on every save, like auto_now.
+
+    Transaction ids only ever grow, so rows changed after a point sort after
+    it. See reservations.changes for how reads stay safe against transactions
+    that commit out of order.
+    """
+    # Inserts read the stamped value back; updates leave the attribute stale
+    db_returning = True
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('default', 0)
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+
+    def pre_save(self, model_instance, add):
+        return CurrentTransactionId()
+
+
+def reservation_period():
+    """The booking as a tsrange built from its date and start/end times"""
+    return TsRange(
+        ExpressionWrapper(F('date') + F('start_time'), output_field=models.DateTimeField()),
+        ExpressionWrapper(F('date') + F('end_time'), output_field=models.DateTimeField()),
+    )
+
+
 class Reservation(models.Model):
     """Main reservation model"""
     STATUS_CHOICES = [
@@ -66,13 +115,53 @@ class Reservation(models.Model):
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Id of the last transaction that wrote this row (the delta-sync position)
+    change_seq = ChangeSequenceField()
     
     class Meta:
         ordering = ['-created_at']
         unique_together = ['date', 'start_time', 'end_time']
+        constraints = [
+            # Active bookings may not overlap; enforced by a GiST index in Postgres
+            ExclusionConstraint(
+                name=OVERLAP_CONSTRAINT,
+                expressions=[(reservation_period(), RangeOperators.OVERLAPS)],
+                condition=Q(status__in=ACTIVE_STATUSES),
+                violation_error_message=OVERLAP_ERROR,
+            ),
+        ]
+        indexes = [
+            # Calendar and overlap lookups only ever look at active bookings
+            models.Index(
+                fields=['date', 'start_time'],
+                name='reservation_active_date_idx',
+                condition=Q(status__in=ACTIVE_STATUSES),
+            ),
+            # User dashboard: a user's upcoming active bookings in date order
+            models.Index(
+                fields=['user', 'date', 'start_time'],
+                name='reservation_user_upcoming_idx',
+                condition=Q(status__in=ACTIVE_STATUSES),
+            ),
+            # List filters and today's confirmed count on the admin dashboard
+            models.Index(fields=['date', 'status'], name='reservation_date_status_idx'),
+            # Pending primetime approvals
+            models.Index(fields=['status', 'reservation_type'], name='reservation_status_type_idx'),
+            # Keyset pagination of the reservation list
+            models.Index(fields=['-created_at', 'id'], name='reservation_created_idx'),
+            # Delta sync: reservations changed since a position
+            models.Index(fields=['change_seq', 'id'], name='reservation_change_seq_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.date} {self.start_time}-{self.end_time}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored date so moving a booking invalidates both days
+        instance._loaded_date = instance.__dict__.get('date')
+        return instance
     
     def clean(self):
         # Validate time range
@@ -86,16 +175,8 @@ class Reservation(models.Model):
         if self.start_time < business_start or self.end_time > business_end:
             raise ValidationError("Reservations must be between 7 AM and 7 PM")
         
-        # Check for overlapping reservations
-        overlapping = Reservation.objects.filter(
-            date=self.date,
-            status__in=['CONFIRMED', 'PENDING']
-        ).exclude(pk=self.pk)
-        
-        for reservation in overlapping:
-            if (self.start_time < reservation.end_time and 
-                self.end_time > reservation.start_time):
-                raise ValidationError("This time slot overlaps with an existing reservation")
+        # Overlaps are checked by the reservation_no_overlap constraint
+        # (validate_constraints() during full_clean, the database on save)
     
     def save(self, *args, **kwargs):
         # Auto-determine reservation type and status
@@ -112,15 +193,13 @@ class Reservation(models.Model):
     
     def get_reservation_type(self):
         """Determine if this reservation is in primetime hours"""
-        try:
-            weekday = self.date.weekday()
-            primetime = PrimeTimeSettings.objects.get(weekday=weekday, is_active=True)
-            
-            if (self.start_time >= primetime.start_time and 
-                self.end_time <= primetime.end_time):
-                return 'PRIMETIME'
-        except PrimeTimeSettings.DoesNotExist:
-            pass
+        from .settings_cache import get_settings_snapshot
+
+        primetime = get_settings_snapshot().primetime_for(self.date)
+        if (primetime and
+            self.start_time >= primetime.start_time and 
+            self.end_time <= primetime.end_time):
+            return 'PRIMETIME'
         
         return 'FREE_FOR_ALL'
     
@@ -232,6 +311,52 @@ class ReservationAuditLog(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Recent activity on the admin dashboard
+            models.Index(fields=['-timestamp'], name='auditlog_timestamp_idx'),
+            # Recent activity for one user's reservations
+            models.Index(fields=['reservation', '-timestamp'], name='auditlog_reservation_ts_idx'),
+        ]
     
     def __str__(self):
         return f"{self.action} - {self.reservation} by {self.performed_by.email}"
+
+class EmailOutbox(models.Model):
+    """Outgoing email queued by request handlers and delivered by process_email_outbox"""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    to = models.JSONField(default=list, help_text="Recipient addresses")
+    from_email = models.CharField(max_length=255, blank=True)
+    # Template inputs for backend.utils.email; rendered when the message is sent
+    content = models.TextField()
+    details = models.TextField(blank=True)
+    preheader = models.CharField(max_length=255, blank=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = "Email Outbox"
+        verbose_name_plural = "Email Outbox"
+        indexes = [
+            # Only pending rows are ever claimed by the worker
+            models.Index(
+                fields=['next_attempt_at'],
+                name='emailoutbox_due_idx',
+                condition=Q(status='PENDING'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
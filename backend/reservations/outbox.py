@@ -0,0 +1,153 @@
+# reservations/outbox.py
+"""Transactional email outbox.
+
+Request handlers queue notifications with ``queue_html_email``. The row is
+written when the surrounding transaction commits, so a rolled-back booking
+never sends mail, and the request never waits on SMTP. The
+``process_email_outbox`` command delivers the queue in batches, in three steps:
+
+1. Claim: a short transaction picks due rows with ``SELECT ... FOR UPDATE
+   SKIP LOCKED`` (so several workers can run side by side), counts the
+   attempt and leases the rows by moving ``next_attempt_at`` past ``lease``.
+   It then commits.
+2. Send: the batch is rendered and sent over a single SMTP connection with no
+   transaction open, so slow SMTP neither holds row locks nor keeps a
+   snapshot that would hold back ``changes.current_horizon``.
+   ``EMAIL_TIMEOUT`` bounds each SMTP call.
+3. Record: each row is marked sent, or scheduled for retry with exponential
+   backoff, or failed after ``max_attempts``.
+
+A message that cannot be rendered counts as a failed attempt, like one SMTP
+rejects. Delivery is at-least-once: if a worker dies mid-batch, its rows are
+claimed again when the lease runs out. The attempt already counted stops a
+message that kills the worker every time from being retried forever.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.core.mail import get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from backend.utils.email import build_html_emails
+
+from .models import EmailOutbox
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=1)
+# Long enough to send a whole batch even when every SMTP call runs into EMAIL_TIMEOUT
+DEFAULT_LEASE = timedelta(minutes=15)
+
+BatchResult = namedtuple('BatchResult', ['claimed', 'sent', 'retrying', 'failed'])
+
+
+def queue_html_email(subject, to_email, content, details=None, preheader=None, from_email=None):
+    """Queue an email for the outbox worker once the current transaction commits"""
+    to = [to_email] if isinstance(to_email, str) else list(to_email)
+
+    def enqueue():
+        EmailOutbox.objects.create(
+            subject=subject,
+            to=to,
+            content=content,
+            details=details or '',
+            preheader=preheader or '',
+            from_email=from_email or '',
+        )
+
+    transaction.on_commit(enqueue)
+
+
+def backoff_delay(attempts):
+    """Delay before retry number ``attempts`` (1-based): 30s, 1m, 2m, ... capped at 1h"""
+    return min(BACKOFF_BASE * (2 ** (attempts - 1)), BACKOFF_MAX)
+
+
+def process_outbox_batch(batch_size=DEFAULT_BATCH_SIZE, max_attempts=DEFAULT_MAX_ATTEMPTS, connection=None, lease=DEFAULT_LEASE):
+    """Claim up to batch_size due messages, send them and record the outcome"""
+    batch, abandoned = _claim(batch_size, max_attempts, lease)
+    if not batch:
+        return BatchResult(abandoned, 0, 0, abandoned)
+
+    connection = connection or get_connection(fail_silently=False)
+    sent = retrying = failed = 0
+    try:
+        for row, email in _render(batch, connection):
+            try:
+                if isinstance(email, Exception):
+                    raise email
+                # No-op while the SMTP session from the previous message is still open
+                connection.open()
+                email.send()
+            except Exception as exc:
+                # Drop a possibly broken session; the next message reconnects
+                connection.close()
+                row.last_error = f'{type(exc).__name__}: {exc}'
+                if row.attempts >= max_attempts:
+                    row.status = 'FAILED'
+                    failed += 1
+                else:
+                    row.next_attempt_at = timezone.now() + backoff_delay(row.attempts)
+                    retrying += 1
+            else:
+                row.status = 'SENT'
+                row.sent_at = timezone.now()
+                row.last_error = ''
+                sent += 1
+    finally:
+        connection.close()
+
+    EmailOutbox.objects.bulk_update(batch, ['status', 'next_attempt_at', 'last_error', 'sent_at'])
+    return BatchResult(len(batch) + abandoned, sent, retrying, failed + abandoned)
+
+
+def _claim(batch_size, max_attempts, lease):
+    """Lease up to batch_size due rows to this worker; (rows to send, number given up on)"""
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        batch = []
+        abandoned = 0
+        for row in rows:
+            if row.attempts >= max_attempts:
+                # Every attempt was claimed by a worker that never recorded the outcome
+                row.status = 'FAILED'
+                row.last_error = f'No outcome recorded after {row.attempts} attempt(s); the worker stopped while sending'
+                abandoned += 1
+            else:
+                row.attempts += 1
+                row.next_attempt_at = now + lease
+                batch.append(row)
+        if rows:
+            EmailOutbox.objects.bulk_update(rows, ['status', 'attempts', 'next_attempt_at', 'last_error'])
+    return batch, abandoned
+
+
+def _render(batch, connection):
+    """(row, email) for every row; the email is the exception raised when a row could not be rendered"""
+    messages = [{
+        'subject': row.subject,
+        'to_email': row.to,
+        'content': row.content,
+        'details': row.details,
+        'preheader': row.preheader,
+        'from_email': row.from_email or None,
+    } for row in batch]
+    try:
+        # The whole batch in one pass over the compiled template
+        return list(zip(batch, build_html_emails(messages, connection=connection)))
+    except Exception:
+        # Render one at a time so only the broken rows fail
+        rendered = []
+        for row, message in zip(batch, messages):
+            try:
+                rendered.append((row, build_html_emails([message], connection=connection)[0]))
+            except Exception as exc:
+                rendered.append((row, exc))
+        return rendered
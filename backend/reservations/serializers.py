@@ -1,13 +1,21 @@
 # reservations/serializers.py
-from rest_framework import serializers
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from backend.utils.metrics import OVERLAP_REJECTIONS
+from backend.utils.request_timing import timed
 from .models import (
     Reservation, 
     PrimeTimeSettings, 
     TradeRequest, 
     CalendarSettings,
-    ReservationAuditLog
+    ReservationAuditLog,
+    OVERLAP_CONSTRAINT,
+    OVERLAP_ERROR
 )
+from .locks import lock_reservation_dates
+from .settings_cache import get_settings_snapshot
 from datetime import date, datetime, timedelta
 
 User = get_user_model()
@@ -55,35 +63,102 @@ class ReservationSerializer(serializers.ModelSerializer):
         return value
 
     def validate(self, data):
-        """Ensure the requested slot doesn't overlap with existing reservations
-        that are CONFIRMED or PENDING for the same date.
-        """
-        # Ensure required fields are present for overlap checking
-        date_val = data.get('date')
-        start_time = data.get('start_time')
-        end_time = data.get('end_time')
-
-        if date_val and start_time and end_time:
-            overlapping = Reservation.objects.filter(
-                date=date_val,
-                status__in=['CONFIRMED', 'PENDING']
-            )
+        # Additional validation can be added here
+        return data
 
-            # If serializer is used for update, exclude the instance
-            instance = getattr(self, 'instance', None)
-            if instance:
-                overlapping = overlapping.exclude(pk=instance.pk)
+class ReservationReadSerializer:
+    """Read-only ReservationSerializer output for list endpoints.
 
-            for res in overlapping:
-                # overlapping if start < existing_end and end > existing_start
-                if (start_time < res.end_time and end_time > res.start_time):
-                    raise serializers.ValidationError("This time slot overlaps with an existing reservation")
+    Works on the named tuples from ``rows(queryset)`` (one ``values_list``
+    query with both users joined) instead of model instances. Display labels
+    come from the choice dicts, and ``is_editable``/``can_be_traded`` use one
+    ``date.today()`` per call to ``data``, so rows cost no extra queries and no
+    per-field serializer dispatch. The output is the same as
+    ``ReservationSerializer(..., many=True).data``.
+    """
+    USER_FIELDS = ['id', 'email', 'first_name', 'last_name', 'role']
+    FIELDS = [
+        'id', 'booking_name', 'date', 'start_time', 'end_time', 'status', 'reservation_type',
+        'notes', 'approved_at', 'rejection_reason', 'created_at', 'updated_at',
+        *(f'user__{name}' for name in USER_FIELDS),
+        *(f'approved_by__{name}' for name in USER_FIELDS),
+    ]
+    STATUS_DISPLAY = dict(Reservation.STATUS_CHOICES)
+    RESERVATION_TYPE_DISPLAY = dict(Reservation.RESERVATION_TYPE_CHOICES)
+    # Same rules as Reservation.is_editable() and Reservation.can_be_traded()
+    EDITABLE_STATUSES = frozenset(['PENDING', 'CONFIRMED'])
 
-        return data
-    
-    def validate(self, data):
-        # Additional validation can be added here
-        return data
+    def __init__(self, rows, many=False):
+        self.rows = rows if many else [rows]
+        self.many = many
+
+    @classmethod
+    def rows(cls, queryset):
+        return queryset.values_list(*cls.FIELDS, named=True)
+
+    @property
+    @timed('serialize')
+    def data(self):
+        today = date.today()
+        to_datetime = _datetime_representation()
+        status_display = self.STATUS_DISPLAY
+        type_display = self.RESERVATION_TYPE_DISPLAY
+        editable_statuses = self.EDITABLE_STATUSES
+
+        data = []
+        for row in self.rows:
+            upcoming = row.date >= today
+            data.append({
+                'id': row.id,
+                'user': {
+                    'id': row.user__id,
+                    'email': row.user__email,
+                    'first_name': row.user__first_name,
+                    'last_name': row.user__last_name,
+                    'role': row.user__role,
+                },
+                'booking_name': row.booking_name,
+                'date': row.date.isoformat(),
+                'start_time': row.start_time.isoformat(),
+                'end_time': row.end_time.isoformat(),
+                'status': row.status,
+                'status_display': status_display.get(row.status, row.status),
+                'reservation_type': row.reservation_type,
+                'reservation_type_display': type_display.get(row.reservation_type, row.reservation_type),
+                'notes': row.notes,
+                'approved_by': {
+                    'id': row.approved_by__id,
+                    'email': row.approved_by__email,
+                    'first_name': row.approved_by__first_name,
+                    'last_name': row.approved_by__last_name,
+                    'role': row.approved_by__role,
+                } if row.approved_by__id is not None else None,
+                'approved_at': to_datetime(row.approved_at),
+                'rejection_reason': row.rejection_reason,
+                'is_editable': upcoming and row.status in editable_statuses,
+                'can_be_traded': upcoming and row.status == 'CONFIRMED' and row.user__role == 'user',
+                'created_at': to_datetime(row.created_at),
+                'updated_at': to_datetime(row.updated_at),
+            })
+        return data if self.many else data[0]
+
+def _datetime_representation():
+    """DateTimeField().to_representation, inlined for the default ISO 8601 output"""
+    field = serializers.DateTimeField()
+    if (api_settings.DATETIME_FORMAT or '').lower() != ISO_8601:
+        return field.to_representation
+    field_timezone = field.default_timezone()
+
+    def to_representation(value):
+        if not value:
+            return None
+        if field_timezone is not None:
+            value = value.astimezone(field_timezone)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return to_representation
 
 class ReservationCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating reservations"""
@@ -97,7 +172,7 @@ class ReservationCreateSerializer(serializers.ModelSerializer):
         
         # Check max advance booking
         try:
-            settings = CalendarSettings.objects.first()
+            settings = get_settings_snapshot().calendar
             if settings and settings.max_advance_booking_days:
                 max_date = date.today() + timedelta(days=settings.max_advance_booking_days)
                 if value > max_date:
@@ -110,33 +185,33 @@ class ReservationCreateSerializer(serializers.ModelSerializer):
         return value
     
     def create(self, validated_data):
-        from django.db import transaction
-
         request = self.context.get('request')
         user = request.user if request else None
         validated_data['user'] = user
 
-        # Protect against race conditions by running overlap check and create inside
-        # a database transaction with a row-level lock on existing reservations
-        # for the same date. This uses select_for_update to serialize concurrent
-        # attempts that target the same date window.
-        date_val = validated_data.get('date')
-        start_time = validated_data.get('start_time')
-        end_time = validated_data.get('end_time')
-
-        with transaction.atomic():
-            if date_val and start_time and end_time:
-                overlapping_qs = Reservation.objects.select_for_update().filter(
-                    date=date_val,
-                    status__in=['CONFIRMED', 'PENDING']
-                )
-
-                # No need to exclude instance because this is creation
-                for res in overlapping_qs:
-                    if (start_time < res.end_time and end_time > res.start_time):
-                        raise serializers.ValidationError("This time slot overlaps with an existing reservation")
-
-            return super().create(validated_data)
+        # Overlaps are rejected by the reservation_no_overlap exclusion
+        # constraint; writers on the same date queue on one advisory lock
+        return self._save_without_overlap(
+            [validated_data.get('date')], super().create, validated_data
+        )
+
+    def update(self, instance, validated_data):
+        # Lock both days when the booking moves to another date
+        return self._save_without_overlap(
+            [instance.date, validated_data.get('date')], super().update, instance, validated_data
+        )
+
+    def _save_without_overlap(self, dates, save, *args):
+        """Run save under the per-date locks and report an overlap as a validation error"""
+        try:
+            with transaction.atomic():
+                lock_reservation_dates(*dates)
+                return save(*args)
+        except IntegrityError as exc:
+            if getattr(getattr(exc.__cause__, 'diag', None), 'constraint_name', None) == OVERLAP_CONSTRAINT:
+                OVERLAP_REJECTIONS.inc()
+                raise serializers.ValidationError(OVERLAP_ERROR)
+            raise
 
 class TradeRequestSerializer(serializers.ModelSerializer):
     requester = UserBasicSerializer(read_only=True)
@@ -0,0 +1,117 @@
+# reservations/settings_cache.py
+"""Process-local, immutable snapshot of CalendarSettings and PrimeTimeSettings.
+
+Both tables change rarely but are read on every booking and calendar request.
+The snapshot is built once per process and shared across requests; saving or
+deleting either model (see ``reservations.signals``) drops the local copy and,
+once the transaction commits, publishes a new version stamp in the default
+cache. Other workers compare that stamp on each read and rebuild when it moved.
+The default cache is a directory every gunicorn worker on the host shares
+(see ``CACHES`` in settings), so invalidation reaches all of them.
+"""
+import threading
+import uuid
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db import transaction
+
+SETTINGS_VERSION_KEY = 'reservations:settings-version'
+
+
+@dataclass(frozen=True)
+class CalendarSettingsSnapshot:
+    business_start_time: object
+    business_end_time: object
+    slot_duration_minutes: int
+    max_advance_booking_days: int
+    allow_same_day_booking: bool
+    admin_email: str
+    send_confirmation_emails: bool
+
+
+@dataclass(frozen=True)
+class PrimeTimeWindow:
+    start_time: object
+    end_time: object
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    version: object
+    calendar: CalendarSettingsSnapshot = None
+    # One entry per weekday (0 = Monday); None when that day has no active primetime
+    primetime: tuple = (None,) * 7
+
+    def primetime_for(self, target_date):
+        return self.primetime[target_date.weekday()]
+
+
+_snapshot = None
+# Set while this thread's connection holds an uncommitted settings change, so a
+# snapshot that includes it is never shared with other requests
+_local = threading.local()
+
+
+def get_settings_snapshot():
+    """Return the current settings snapshot, rebuilding it when stale"""
+    global _snapshot
+
+    # The transaction that made a change may have ended without committing
+    dirty = has_uncommitted_settings_change()
+
+    version = cache.get(SETTINGS_VERSION_KEY)
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    snapshot = _build_snapshot(version)
+    if not dirty:
+        _snapshot = snapshot
+    return snapshot
+
+
+def has_uncommitted_settings_change():
+    """True while this thread's transaction holds a settings change not yet published"""
+    if getattr(_local, 'dirty', False) and not transaction.get_connection().in_atomic_block:
+        _local.dirty = False
+    return getattr(_local, 'dirty', False)
+
+
+def invalidate_settings_snapshot():
+    """Drop this process's snapshot and publish a new version once committed"""
+    global _snapshot
+    _snapshot = None
+    if transaction.get_connection().in_atomic_block:
+        _local.dirty = True
+    transaction.on_commit(_publish_version)
+
+
+def _publish_version():
+    global _snapshot
+    _local.dirty = False
+    _snapshot = None
+    cache.set(SETTINGS_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def _build_snapshot(version):
+    from .models import CalendarSettings, PrimeTimeSettings
+
+    calendar = None
+    calendar_settings = CalendarSettings.objects.first()
+    if calendar_settings:
+        calendar = CalendarSettingsSnapshot(
+            business_start_time=calendar_settings.business_start_time,
+            business_end_time=calendar_settings.business_end_time,
+            slot_duration_minutes=calendar_settings.slot_duration_minutes,
+            max_advance_booking_days=calendar_settings.max_advance_booking_days,
+            allow_same_day_booking=calendar_settings.allow_same_day_booking,
+            admin_email=calendar_settings.admin_email,
+            send_confirmation_emails=calendar_settings.send_confirmation_emails,
+        )
+
+    primetime = [None] * 7
+    for row in PrimeTimeSettings.objects.filter(is_active=True):
+        primetime[row.weekday] = PrimeTimeWindow(start_time=row.start_time, end_time=row.end_time)
+
+    return SettingsSnapshot(version=version, calendar=calendar, primetime=tuple(primetime))
@@ -0,0 +1,24 @@
+# reservations/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .calendar_cache import bump_calendar_dates
+from .events import publish_calendar_change
+from .models import CalendarSettings, PrimeTimeSettings, Reservation
+from .settings_cache import invalidate_settings_snapshot
+
+
+@receiver([post_save, post_delete], sender=CalendarSettings)
+@receiver([post_save, post_delete], sender=PrimeTimeSettings)
+def settings_changed(sender, **kwargs):
+    """Rebuild the shared settings snapshot after any settings write"""
+    invalidate_settings_snapshot()
+
+
+@receiver([post_save, post_delete], sender=Reservation)
+def reservation_changed(sender, instance, **kwargs):
+    """Invalidate, and announce, the calendar days this booking is (or was) on"""
+    dates = (instance.date, getattr(instance, '_loaded_date', None))
+    bump_calendar_dates(*dates)
+    publish_calendar_change(*dates)
+    instance._loaded_date = instance.date
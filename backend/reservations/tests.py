@@ -2,22 +2,70 @@
 # Comprehensive unit and API tests for the reservation system
 # Each test includes a comment describing the scenario and how to test it via Postman or SvelteKit frontend
 
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
-from rest_framework.test import APITestCase
-from rest_framework import status
-from datetime import date, time, timedelta
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.conf import settings as django_settings
+from django.core.cache import cache as default_cache, caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.db.transaction import TransactionManagementError
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, get_resolver
+from asgiref.sync import sync_to_async
+from rest_framework.test import APIRequestFactory, APITestCase, APITransactionTestCase
+from rest_framework import serializers, status
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
 from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from io import BytesIO, StringIO
+from smtplib import SMTPException
+from types import SimpleNamespace
+import asyncio
+import json
+import jwt
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import uuid
+from unittest import mock
 
 from .models import (
     Reservation, 
     PrimeTimeSettings, 
     TradeRequest, 
     CalendarSettings,
-    ReservationAuditLog
+    ReservationAuditLog,
+    EmailOutbox
 )
+from . import calendar_cache, changes, events, settings_cache
+from .calendar_cache import get_calendar
+from .calendar_engine import build_calendar, generate_available_slots
+from .locks import lock_reservation_dates
+from .outbox import backoff_delay, process_outbox_batch, queue_html_email
+from .pagination import ReservationCursorPagination
+from .serializers import ReservationCreateSerializer, ReservationReadSerializer, ReservationSerializer
+from .settings_cache import get_settings_snapshot, invalidate_settings_snapshot
+from .management.commands import bench
+from .management.commands.bench_calendar_slots import build_day_fixture, generate_available_slots_nested
+from .management.commands.bench_email_render import build_messages, render_html_email_uncached
+from .management.commands.bench_read_serializer import build_reservation_fixture
+from .management.commands.run_scheduler import Scheduler
+from backend.utils.email import build_html_email, build_html_emails, get_compiled_template, render_html_emails
+from backend.utils.fast_json import FastJSONParser, FastJSONRenderer
+from backend.utils import metrics, request_timing
+from backend.utils.query_budget import Endpoint, QueryBudgetMixin
 
 User = get_user_model()
 
@@ -320,6 +368,285 @@ class CalendarSettingsModelTests(TestCase):
         with self.assertRaises(ValidationError):
             CalendarSettings.objects.create()
 
+# --- SETTINGS SNAPSHOT TESTS ---
+
+class SettingsSnapshotTests(TestCase):
+    """
+    Settings snapshot scenarios:
+    - Hot paths make no settings queries once settings are committed
+    - Saving or deleting settings rebuilds the snapshot
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.tomorrow = date.today() + timedelta(days=1)
+        # Run the on_commit publish so the snapshot is shared as in production
+        with self.captureOnCommitCallbacks(execute=True):
+            CalendarSettings.objects.create(slot_duration_minutes=30)
+            self.primetime = PrimeTimeSettings.objects.create(
+                weekday=self.tomorrow.weekday(),
+                start_time=time(12, 0),
+                end_time=time(14, 0)
+            )
+        # The rows are rolled back after each test; keep the snapshot from leaking
+        self.addCleanup(invalidate_settings_snapshot)
+
+    def test_hot_paths_skip_settings_queries(self):
+        """
+        Scenario: Reservation type lookup and the calendar read settings from memory
+        Postman/SvelteKit: POST /api/reservations/ then GET /api/reservations/calendar/
+        """
+        snapshot = get_settings_snapshot()
+        self.assertEqual(snapshot.calendar.slot_duration_minutes, 30)
+        self.assertEqual(snapshot.primetime_for(self.tomorrow).start_time, time(12, 0))
+
+        reservation = Reservation(user=self.user, date=self.tomorrow, start_time=time(12, 0), end_time=time(13, 0))
+        with self.assertNumQueries(0):
+            self.assertEqual(reservation.get_reservation_type(), 'PRIMETIME')
+        with self.assertNumQueries(1):
+            build_calendar(self.tomorrow, self.tomorrow + timedelta(days=30))
+
+    def test_settings_change_rebuilds_snapshot(self):
+        """
+        Scenario: Admin edits primetime; the next booking sees the new hours
+        Postman/SvelteKit: PUT /api/reservations/admin/primetime/{id}/
+        """
+        self.assertIsNotNone(get_settings_snapshot().primetime_for(self.tomorrow))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.primetime.is_active = False
+            self.primetime.save()
+        self.assertIsNone(get_settings_snapshot().primetime_for(self.tomorrow))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.primetime.delete()
+            CalendarSettings.objects.all().delete()
+        self.assertIsNone(get_settings_snapshot().calendar)
+
+    def test_uncommitted_change_is_not_shared(self):
+        """
+        Scenario: A settings write inside an open transaction is visible to it but not cached
+        Postman/SvelteKit: n/a (internal)
+        """
+        get_settings_snapshot()
+        self.primetime.start_time = time(9, 0)
+        self.primetime.save()
+        self.assertEqual(get_settings_snapshot().primetime_for(self.tomorrow).start_time, time(9, 0))
+        self.assertIsNone(settings_cache._snapshot)
+
+    def test_versions_reach_other_worker_processes(self):
+        """
+        Scenario: Admin edits primetime and a booking changes a day while gunicorn runs several workers
+        Postman/SvelteKit: PUT /api/reservations/admin/primetime/{id}/ then GET /api/reservations/calendar/ on another worker
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.primetime.start_time = time(11, 0)
+            self.primetime.save()
+            Reservation.objects.create(user=self.user, date=self.tomorrow, start_time=time(8, 0), end_time=time(9, 0))
+        keys = [settings_cache.SETTINGS_VERSION_KEY, calendar_cache.DATE_VERSION_KEY.format(self.tomorrow.isoformat())]
+        published = [default_cache.get(key) for key in keys]
+        self.assertNotIn(None, published)
+
+        # A new process, as another worker is, reads the same stamps
+        worker = subprocess.run(
+            [sys.executable, '-c', (
+                'import django, json, sys; django.setup(); from django.core.cache import cache; '
+                'print(json.dumps([cache.get(key) for key in sys.argv[1:]]))'
+            ), *keys],
+            cwd=django_settings.BASE_DIR, capture_output=True, text=True, timeout=60, check=True,
+        )
+        self.assertEqual(json.loads(worker.stdout.splitlines()[-1]), published)
+
+class CalendarCacheTests(TestCase):
+    """
+    Calendar cache scenarios:
+    - Repeated and overlapping ranges are served from cached days
+    - Saving, moving or completing a booking rebuilds only its days
+    - Settings changes rebuild every day
+    - Uncommitted changes are never cached
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.tomorrow = date.today() + timedelta(days=1)
+        self.week_end = self.tomorrow + timedelta(days=6)
+        self.month_end = self.tomorrow + timedelta(days=30)
+        # Start from published settings, an empty day cache and no dates left
+        # pending by earlier tests' uncommitted writes
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_settings_snapshot()
+        caches[calendar_cache.CALENDAR_CACHE_ALIAS].clear()
+        calendar_cache._pending_dates().clear()
+        self.addCleanup(calendar_cache._pending_dates().clear)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reservation = Reservation.objects.create(
+                user=self.user, date=self.tomorrow, start_time=time(10, 0), end_time=time(11, 0)
+            )
+
+    def booked(self, calendar, target_date):
+        day = next(day for day in calendar if day['date'] == target_date.isoformat())
+        return [(slot['start_time'], slot['user']['email']) for slot in day['reserved_slots']]
+
+    def test_repeated_and_overlapping_ranges_hit_cache(self):
+        """
+        Scenario: Frontend polls the week view, then opens the month view
+        Postman/SvelteKit: GET /api/reservations/calendar/ repeatedly with overlapping ranges
+        """
+        with self.assertNumQueries(1):
+            month = get_calendar(self.tomorrow, self.month_end)
+        self.assertEqual(month, build_calendar(self.tomorrow, self.month_end))
+        with self.assertNumQueries(0):
+            week = get_calendar(self.tomorrow, self.week_end)
+        self.assertEqual(week, month[:7])
+
+        # Days after the month view are built; the cached ones are not
+        with CaptureQueriesContext(connection) as queries:
+            get_calendar(self.week_end, self.month_end + timedelta(days=3))
+        self.assertEqual(len(queries), 1)
+        self.assertIn((self.month_end + timedelta(days=1)).isoformat(), queries[0]['sql'])
+        self.assertNotIn(self.week_end.isoformat(), queries[0]['sql'])
+
+    def test_committed_save_rebuilds_its_days_only(self):
+        """
+        Scenario: A booking is made, then moved to another day
+        Postman/SvelteKit: POST /api/reservations/ then PUT /api/reservations/{id}/ with a new date
+        """
+        get_calendar(self.tomorrow, self.week_end)
+        other_day = self.tomorrow + timedelta(days=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.create(user=self.user, date=other_day, start_time=time(14, 0), end_time=time(15, 0))
+        with self.assertNumQueries(1):
+            week = get_calendar(self.tomorrow, self.week_end)
+        self.assertEqual(self.booked(week, other_day), [('14:00:00', 'test@example.com')])
+
+        moved = Reservation.objects.get(pk=self.reservation.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            moved.date = self.week_end
+            moved.save()
+        week = get_calendar(self.tomorrow, self.week_end)
+        self.assertEqual(self.booked(week, self.tomorrow), [])
+        self.assertEqual(self.booked(week, self.week_end), [('10:00:00', 'test@example.com')])
+        self.assertEqual(week, build_calendar(self.tomorrow, self.week_end))
+
+    def test_settings_change_rebuilds_every_day(self):
+        """
+        Scenario: Admin adds primetime hours for a weekday
+        Postman/SvelteKit: POST /api/reservations/admin/primetime/ then GET /api/reservations/calendar/
+        """
+        week = get_calendar(self.tomorrow, self.week_end)
+        self.assertFalse(any(day['is_primetime'] for day in week))
+        with self.captureOnCommitCallbacks(execute=True):
+            PrimeTimeSettings.objects.create(weekday=self.tomorrow.weekday(), start_time=time(12, 0), end_time=time(14, 0))
+        week = get_calendar(self.tomorrow, self.week_end)
+        self.assertTrue(week[0]['is_primetime'])
+        self.addCleanup(invalidate_settings_snapshot)
+
+    def test_uncommitted_change_is_not_cached(self):
+        """
+        Scenario: A booking written inside an open transaction is visible to it but not cached
+        Postman/SvelteKit: n/a (internal)
+        """
+        get_calendar(self.tomorrow, self.week_end)
+        Reservation.objects.create(user=self.user, date=self.tomorrow, start_time=time(15, 0), end_time=time(16, 0))
+        week = get_calendar(self.tomorrow, self.week_end)
+        self.assertEqual(len(self.booked(week, self.tomorrow)), 2)
+        key_prefix = f'reservations:calendar-day:{self.tomorrow.isoformat()}:'
+        cached_days = [key for key in caches[calendar_cache.CALENDAR_CACHE_ALIAS]._cache if key_prefix in key]
+        # Only the entry cached before the write; the uncommitted view was not stored
+        self.assertEqual(len(cached_days), 1)
+
+    def test_completing_past_bookings_rebuilds_their_days(self):
+        """
+        Scenario: The nightly job completes yesterday's bookings, which drop off the calendar
+        Postman/SvelteKit: python manage.py mark_past_reservations_completed, then GET /api/reservations/calendar/
+        """
+        yesterday = date.today() - timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.create(user=self.user, date=yesterday, start_time=time(9, 0), end_time=time(10, 0))
+        self.assertEqual(len(self.booked(get_calendar(yesterday, yesterday), yesterday)), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('mark_past_reservations_completed', stdout=StringIO())
+        self.assertEqual(self.booked(get_calendar(yesterday, yesterday), yesterday), [])
+
+# --- CONCURRENCY TESTS ---
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """
+    Concurrency scenarios:
+    - Many writers booking overlapping slots on an empty date never double-book
+    - The date lock refuses to run outside a transaction
+    """
+    WRITERS = 60
+
+    def test_no_double_booking_under_concurrent_writers(self):
+        """
+        Scenario: 60 users submit overlapping bookings for the same day at once
+        Postman/SvelteKit: many simultaneous POST /api/reservations/ for one date
+        """
+        users = [
+            User.objects.create_user(username=f'writer{i}', email=f'writer{i}@example.com', password='pass123')
+            for i in range(self.WRITERS)
+        ]
+        target_date = date.today() + timedelta(days=2)
+        barrier = threading.Barrier(self.WRITERS, timeout=30)
+        outcomes = []
+
+        def book(index, user):
+            # 60-minute windows starting every 30 minutes, so neighbours overlap
+            start_minutes = 8 * 60 + (index % 12) * 30
+            data = {
+                'booking_name': f'Writer {index}',
+                'date': target_date.isoformat(),
+                'start_time': f'{start_minutes // 60:02d}:{start_minutes % 60:02d}',
+                'end_time': f'{start_minutes // 60 + 1:02d}:{start_minutes % 60:02d}',
+            }
+            try:
+                barrier.wait()
+                serializer = ReservationCreateSerializer(data=data, context={'request': SimpleNamespace(user=user)})
+                # Identical slots already committed fail unique_together validation
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+                outcomes.append('created')
+            except serializers.ValidationError:
+                outcomes.append('rejected')
+            except Exception as exc:
+                outcomes.append(repr(exc))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(i, user)) for i, user in enumerate(users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(outcomes), self.WRITERS)
+        self.assertEqual(set(outcomes) - {'created', 'rejected'}, set())
+        booked = list(Reservation.objects.filter(
+            date=target_date,
+            status__in=['CONFIRMED', 'PENDING']
+        ).order_by('start_time'))
+        self.assertEqual(len(booked), outcomes.count('created'))
+        self.assertGreater(len(booked), 0)
+        for earlier, later in zip(booked, booked[1:]):
+            self.assertLessEqual(earlier.end_time, later.start_time)
+
+    def test_lock_requires_transaction(self):
+        """
+        Scenario: Advisory locks are transaction-scoped, so autocommit use is a bug
+        Postman/SvelteKit: n/a (internal)
+        """
+        with self.assertRaises(TransactionManagementError):
+            lock_reservation_dates(date.today())
+        with transaction.atomic():
+            lock_reservation_dates(date.today(), date.today(), None)
+
 # --- API TESTS ---
 
 class ReservationAPITests(APITestCase):
@@ -395,7 +722,7 @@ class ReservationAPITests(APITestCase):
         )
         response = self.client.get('/api/reservations/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_admin_list_all_reservations(self):
         """
@@ -417,7 +744,78 @@ class ReservationAPITests(APITestCase):
         )
         response = self.client.get('/api/reservations/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_list_reservations_cursor_pagination(self):
+        """
+        Scenario: Admin pages through reservations with next/previous cursors
+        Postman/SvelteKit: GET /api/reservations/?page_size=4 then follow `next` / `previous`
+        """
+        self.client.force_authenticate(user=self.admin_user)
+        for hour in range(7, 17):
+            Reservation.objects.create(
+                user=self.user if hour % 2 else self.admin_user,
+                date=self.tomorrow,
+                start_time=time(hour, 0),
+                end_time=time(hour, 30)
+            )
+        # Ties on created_at are broken by id
+        Reservation.objects.filter(start_time__lt=time(11, 0)).update(created_at=timezone.now())
+        expected = list(Reservation.objects.order_by('-created_at', 'id').values_list('id', flat=True))
+
+        pages = []
+        url = '/api/reservations/?page_size=4'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([row['id'] for row in response.data['results']])
+            url = response.data['next']
+        self.assertEqual([len(page) for page in pages], [4, 4, 2])
+        self.assertEqual(sum(pages, []), expected)
+        self.assertIsNone(self.client.get('/api/reservations/?page_size=4').data['previous'])
+
+        # Walk back from the last page
+        previous = response.data['previous']
+        response = self.client.get(previous)
+        self.assertEqual([row['id'] for row in response.data['results']], pages[1])
+        self.assertIsNotNone(response.data['next'])
+
+        # Filters still apply
+        response = self.client.get('/api/reservations/?page_size=4&user=test@')
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertEqual({row['user']['email'] for row in response.data['results']}, {'test@example.com'})
+        self.assertEqual(self.client.get('/api/reservations/?cursor=bogus').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_deep_cursor_page_seeks_through_the_index(self):
+        """
+        Scenario: A page far down the list starts its index scan at the cursor
+        Postman/SvelteKit: n/a (EXPLAIN of GET /api/reservations/?cursor=...)
+        """
+        start = timezone.now() - timedelta(days=1)
+        for minute in range(40):
+            reservation = Reservation.objects.create(
+                user=self.user, date=self.tomorrow + timedelta(days=minute), start_time=time(8, 0), end_time=time(8, 30)
+            )
+            Reservation.objects.filter(pk=reservation.pk).update(created_at=start + timedelta(minutes=minute))
+        deep = Reservation.objects.order_by('-created_at', 'id')[30]
+
+        factory = APIRequestFactory()
+        paginator = ReservationCursorPagination()
+        paginator.request = Request(factory.get('/api/reservations/'))
+        url = paginator.encode_cursor(False, deep.created_at, deep.id)
+        with CaptureQueriesContext(connection) as queries:
+            page = ReservationCursorPagination().paginate_queryset(Reservation.objects.all(), Request(factory.get(url)))
+        self.assertEqual(len(page), 9)
+
+        with connection.cursor() as cursor:
+            # The table is tiny, so keep the planner off the sequential scan it would otherwise pick
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN ANALYZE ' + queries.captured_queries[-1]['sql'])
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertIn('reservation_created_idx', plan)
+        self.assertRegex(plan, r'Index Cond: \(created_at <= ')
+        # Only the cursor row itself is read and thrown away, not the 30 rows above it
+        self.assertRegex(plan, r'Rows Removed by Filter: 1\n')
 
     def test_approve_reservation(self):
         """
@@ -466,6 +864,85 @@ class ReservationAPITests(APITestCase):
         self.assertEqual(reservation.status, 'REJECTED')
         self.assertEqual(reservation.rejection_reason, 'Not available')
 
+    def test_create_overlapping_reservation_rejected(self):
+        """
+        Scenario: Booking a slot that overlaps an active reservation returns 400
+        Postman/SvelteKit: POST /api/reservations/ for a slot overlapping an existing one
+        """
+        Reservation.objects.create(
+            user=self.admin_user,
+            date=self.tomorrow,
+            start_time=time(10, 0),
+            end_time=time(11, 0)
+        )
+        self.client.force_authenticate(user=self.user)
+        data = {
+            'booking_name': 'Overlap',
+            'date': self.tomorrow.isoformat(),
+            'start_time': '10:30:00',
+            'end_time': '11:30:00'
+        }
+        response = self.client.post('/api/reservations/', data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, ['This time slot overlaps with an existing reservation'])
+        self.assertEqual(Reservation.objects.count(), 1)
+
+        # Back-to-back bookings do not overlap
+        data.update({'start_time': '11:00:00', 'end_time': '12:00:00'})
+        response = self.client.post('/api/reservations/', data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_update_into_overlap_rejected(self):
+        """
+        Scenario: Moving a reservation onto another booking returns 400
+        Postman/SvelteKit: PUT /api/reservations/{id}/ with overlapping times
+        """
+        Reservation.objects.create(
+            user=self.admin_user,
+            date=self.tomorrow,
+            start_time=time(10, 0),
+            end_time=time(11, 0)
+        )
+        reservation = Reservation.objects.create(
+            user=self.user,
+            date=self.tomorrow,
+            start_time=time(14, 0),
+            end_time=time(15, 0)
+        )
+        self.client.force_authenticate(user=self.user)
+        response = self.client.put(f'/api/reservations/{reservation.id}/', {'start_time': '10:45:00'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.start_time, time(14, 0))
+
+    def test_cancelled_reservation_frees_slot(self):
+        """
+        Scenario: Only CONFIRMED/PENDING reservations block a slot
+        Postman/SvelteKit: DELETE /api/reservations/{id}/ then POST an overlapping slot
+        """
+        cancelled = Reservation.objects.create(
+            user=self.admin_user,
+            date=self.tomorrow,
+            start_time=time(10, 0),
+            end_time=time(11, 0)
+        )
+        cancelled.status = 'CANCELLED'
+        cancelled.save()
+        Reservation.objects.create(
+            user=self.user,
+            date=self.tomorrow,
+            start_time=time(10, 30),
+            end_time=time(11, 30)
+        )
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Reservation.objects.create(
+                    user=self.admin_user,
+                    date=self.tomorrow,
+                    start_time=time(9, 0),
+                    end_time=time(10, 45)
+                )
+
 # --- CALENDAR API TESTS ---
 
 class CalendarAPITests(APITestCase):
@@ -517,6 +994,335 @@ class CalendarAPITests(APITestCase):
         self.assertIn('available_slots', day_data)
         self.assertIn('reserved_slots', day_data)
 
+    def test_calendar_query_count_independent_of_range(self):
+        """
+        Scenario: A month view costs the same number of queries as a single day
+        Postman/SvelteKit: GET /api/reservations/calendar/?start_date=...&end_date=... (31 days)
+        """
+        self.client.force_authenticate(user=self.user)
+        for offset in range(0, 30, 3):
+            Reservation.objects.create(
+                user=self.user,
+                date=self.tomorrow + timedelta(days=offset),
+                start_time=time(10, 0),
+                end_time=time(11, 0)
+            )
+        end_of_month = self.tomorrow + timedelta(days=30)
+
+        # Settings, primetime rows and the reservations in range
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/reservations/calendar/?start_date={self.tomorrow}&end_date={self.tomorrow}')
+        self.assertEqual(len(response.data['calendar']), 1)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/reservations/calendar/?start_date={self.tomorrow}&end_date={end_of_month}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['calendar']), 31)
+        booked_days = [day for day in response.data['calendar'] if day['reserved_slots']]
+        self.assertEqual(len(booked_days), 10)
+        first_day = response.data['calendar'][0]
+        self.assertTrue(first_day['is_primetime'])
+        self.assertNotIn('10:00:00', [slot['start_time'] for slot in first_day['available_slots']])
+        self.assertIn(
+            {'start_time': '12:00:00', 'end_time': '13:00:00', 'type': 'PRIMETIME', 'available': True},
+            first_day['available_slots']
+        )
+
+
+class SlotGenerationTests(SimpleTestCase):
+    """
+    Slot generation scenarios:
+    - Sweep output matches the previous nested-loop implementation
+    """
+    def test_sweep_matches_nested_loop(self):
+        """
+        Scenario: Random days, slot lengths and primetime windows produce identical slots
+        Postman/SvelteKit: compare available_slots of GET /api/reservations/calendar/ before/after
+        """
+        rng = random.Random(42)
+        target_date = date.today()
+        for seed in range(200):
+            reservations = build_day_fixture(rng.randint(0, 40), seed=seed)
+            # Overlapping rows and second-level boundaries must not change the result
+            if reservations and seed % 3 == 0:
+                reservations.append(SimpleNamespace(start_time=time(9, 15, 30), end_time=time(11, 0)))
+            start_time = time(rng.randint(0, 12), rng.choice([0, 15, 30]))
+            end_time = time(rng.randint(13, 23), rng.choice([0, 20, 45]))
+            primetime = rng.choice([None, SimpleNamespace(start_time=time(12, 0), end_time=time(14, 0))])
+            args = (target_date, start_time, end_time, rng.choice([5, 15, 25, 60, 90]), reservations, primetime)
+            self.assertEqual(generate_available_slots(*args), generate_available_slots_nested(*args))
+
+    def test_slot_wrapping_past_midnight(self):
+        """
+        Scenario: A slot running past midnight is reported like the old datetime-based loop
+        Postman/SvelteKit: calendar settings with business_end_time 23:30 and 60-minute slots
+        """
+        args = (date.today(), time(22, 0), time(23, 30), 60, [], None)
+        self.assertEqual(generate_available_slots(*args), generate_available_slots_nested(*args))
+
+
+class ReservationReadSerializerTests(APITestCase):
+    """
+    Read serializer scenarios:
+    - values_list rows serialize exactly like ReservationSerializer on model instances
+    - List and dashboard reads don't query per row
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            first_name='Test'
+        )
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123',
+            role='admin'
+        )
+        tomorrow = date.today() + timedelta(days=1)
+        yesterday = date.today() - timedelta(days=1)
+        Reservation.objects.create(user=self.user, booking_name='Sync', date=tomorrow,
+                                   start_time=time(9, 0), end_time=time(10, 0))
+        Reservation.objects.create(user=self.user, booking_name='Review', date=tomorrow,
+                                   start_time=time(10, 0), end_time=time(11, 0), notes='Bring slides',
+                                   approved_by=self.admin_user, approved_at=timezone.now())
+        Reservation.objects.create(user=self.admin_user, booking_name='Admin', date=tomorrow,
+                                   start_time=time(11, 0), end_time=time(12, 0))
+        Reservation.objects.create(user=self.user, booking_name='Old', date=yesterday,
+                                   start_time=time(9, 0), end_time=time(10, 0))
+        Reservation.objects.create(user=self.user, booking_name='Dropped', date=tomorrow,
+                                   start_time=time(13, 0), end_time=time(14, 0), status='CANCELLED',
+                                   rejection_reason='Changed plans')
+
+    def test_matches_model_serializer(self):
+        """
+        Scenario: List endpoints switch serializers without changing the payload
+        Postman/SvelteKit: GET /api/reservations/ returns the same fields and values as before
+        """
+        queryset = Reservation.objects.order_by('id')
+        expected = ReservationSerializer(queryset.select_related('user', 'approved_by'), many=True).data
+        self.assertEqual(ReservationReadSerializer(ReservationReadSerializer.rows(queryset), many=True).data, expected)
+
+        single = ReservationReadSerializer.rows(queryset).get(booking_name='Review')
+        self.assertEqual(ReservationReadSerializer(single).data, expected[1])
+
+    def test_fixture_matches_model_serializer(self):
+        """
+        Scenario: The benchmark compares two serializers that agree on every row
+        Postman/SvelteKit: n/a (python manage.py bench_read_serializer)
+        """
+        instances, rows = build_reservation_fixture(300, seed=3)
+        self.assertEqual(
+            ReservationReadSerializer(rows, many=True).data,
+            ReservationSerializer(instances, many=True).data
+        )
+
+    def test_list_and_dashboard_query_counts(self):
+        """
+        Scenario: Serializing more rows does not add queries
+        Postman/SvelteKit: GET /api/reservations/ and GET /api/reservations/dashboard/user/
+        """
+        self.client.force_authenticate(user=self.admin_user)
+        # The page keys (also the ETag validator), then the rows on that page
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/reservations/')
+        self.assertEqual(len(response.data['results']), 5)
+
+        self.client.force_authenticate(user=self.user)
+        # The ETag validator, upcoming reservations, two trade counts and the audit log with its users
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/reservations/dashboard/user/')
+        self.assertEqual([r['booking_name'] for r in response.data['upcoming_reservations']], ['Sync', 'Review'])
+
+# --- CALENDAR EVENTS TESTS ---
+
+class BroadcastHubTests(SimpleTestCase):
+    """
+    Broadcast hub scenarios:
+    - Events published from a worker thread reach every subscriber
+    - A subscriber that falls behind keeps the newest events
+    - A closed stream leaves the hub
+    """
+    async def test_publish_from_thread_reaches_subscribers(self):
+        """
+        Scenario: A booking saved in a sync view notifies two open calendar tabs
+        Postman/SvelteKit: n/a (in-process fan-out behind GET /api/reservations/events/)
+        """
+        hub = events.BroadcastHub()
+        first, second = hub.subscribe(), hub.subscribe()
+        await asyncio.to_thread(hub.publish, {'dates': ['2030-01-01']})
+        self.assertEqual(await asyncio.wait_for(first.get(), 1), {'dates': ['2030-01-01']})
+        self.assertEqual(await asyncio.wait_for(second.get(), 1), {'dates': ['2030-01-01']})
+
+        hub.unsubscribe(first)
+        self.assertEqual(len(hub), 1)
+
+    async def test_slow_subscriber_keeps_newest(self):
+        """
+        Scenario: A stalled tab misses more changes than its queue holds
+        Postman/SvelteKit: n/a (in-process fan-out behind GET /api/reservations/events/)
+        """
+        hub = events.BroadcastHub(queue_size=2)
+        queue = hub.subscribe()
+        for day in (1, 2, 3):
+            hub.publish({'dates': [f'2030-01-0{day}']})
+        await asyncio.sleep(0)
+        self.assertEqual([queue.get_nowait()['dates'][0] for _ in range(2)], ['2030-01-02', '2030-01-03'])
+
+    async def test_closed_stream_unsubscribes(self):
+        """
+        Scenario: The browser closes the calendar page
+        Postman/SvelteKit: EventSource.close() on GET /api/reservations/events/
+        """
+        subscribers = len(events.hub)
+        stream = events.calendar_event_stream()
+        await anext(stream)
+        self.assertEqual(len(events.hub), subscribers + 1)
+        await stream.aclose()
+        self.assertEqual(len(events.hub), subscribers)
+
+
+@override_settings(CALENDAR_EVENTS_BACKEND='local', JWT_ACCESS_SECRET='test-secret')
+class CalendarEventsAPITests(TestCase):
+    """
+    Calendar events scenarios:
+    - The stream requires authentication
+    - Booking, cancelling and completing reservations announce their dates after commit
+    - A date range filters the announced dates
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.tomorrow = date.today() + timedelta(days=1)
+        now = datetime.utcnow()
+        self.token = jwt.encode(
+            {'user_id': self.user.id, 'exp': now + timedelta(hours=1), 'iat': now, 'type': 'access'},
+            'test-secret', algorithm='HS256'
+        )
+
+    async def open_stream(self, **params):
+        response = await self.async_client.get(
+            '/api/reservations/events/', params, headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        # The first chunk is sent once the stream is subscribed
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+        return stream
+
+    async def next_event(self, stream):
+        return await asyncio.wait_for(anext(stream), 1)
+
+    def book(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Reservation.objects.create(user=self.user, **kwargs)
+
+    async def test_requires_authentication(self):
+        """
+        Scenario: EventSource opened without a token
+        Postman/SvelteKit: GET /api/reservations/events/ without Authorization
+        """
+        response = await self.async_client.get('/api/reservations/events/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refused_under_wsgi(self):
+        """
+        Scenario: Backend served by a WSGI server, where a stream that never ends would hold the worker
+        Postman/SvelteKit: GET /api/reservations/events/ against gunicorn's sync workers
+        """
+        response = self.client.get('/api/reservations/events/', headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+        self.assertFalse(response.streaming)
+        self.assertIn('ASGI', response.json()['error'])
+
+    async def test_booking_and_cancelling_announce_dates(self):
+        """
+        Scenario: Calendar page listens while someone books and then cancels
+        Postman/SvelteKit: GET /api/reservations/events/ then POST and DELETE /api/reservations/
+        """
+        stream = await self.open_stream()
+        reservation = await sync_to_async(self.book)(
+            date=self.tomorrow, start_time=time(10, 0), end_time=time(11, 0)
+        )
+        expected = f'event: calendar\ndata: {{"dates": ["{self.tomorrow.isoformat()}"]}}\n\n'.encode()
+        self.assertEqual(await self.next_event(stream), expected)
+
+        def cancel():
+            with self.captureOnCommitCallbacks(execute=True):
+                reservation.status = 'CANCELLED'
+                reservation.save()
+        await sync_to_async(cancel)()
+        self.assertEqual(await self.next_event(stream), expected)
+        await stream.aclose()
+
+    async def test_uncommitted_changes_are_not_announced(self):
+        """
+        Scenario: A booking rolls back
+        Postman/SvelteKit: n/a (server-side transaction)
+        """
+        stream = await self.open_stream()
+
+        def book_and_roll_back():
+            with self.captureOnCommitCallbacks(execute=False):
+                Reservation.objects.create(user=self.user, date=self.tomorrow, start_time=time(10, 0), end_time=time(11, 0))
+        await sync_to_async(book_and_roll_back)()
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(anext(stream), 0.2)
+        await stream.aclose()
+
+    async def test_range_filters_dates(self):
+        """
+        Scenario: Week view only listens for its own dates
+        Postman/SvelteKit: GET /api/reservations/events/?start_date=...&end_date=...
+        """
+        later = self.tomorrow + timedelta(days=10)
+        stream = await self.open_stream(start_date=self.tomorrow.isoformat(), end_date=(self.tomorrow + timedelta(days=6)).isoformat())
+        await sync_to_async(self.book)(date=later, start_time=time(10, 0), end_time=time(11, 0))
+        await sync_to_async(self.book)(date=self.tomorrow, start_time=time(10, 0), end_time=time(11, 0))
+        self.assertIn(self.tomorrow.isoformat().encode(), await self.next_event(stream))
+        await stream.aclose()
+
+
+@override_settings(CALENDAR_EVENTS_BACKEND='postgres')
+class PostgresCalendarEventsTests(TransactionTestCase):
+    """
+    LISTEN/NOTIFY scenarios:
+    - A committed booking reaches the hub through the listener connection
+    """
+    async def test_notify_reaches_hub(self):
+        user = await sync_to_async(User.objects.create_user)(
+            username='testuser', email='test@example.com', password='testpass123'
+        )
+        queue = events.hub.subscribe()
+        await events.start_listening()
+        listener = events.get_backend()._listeners.pop(asyncio.get_running_loop())
+        try:
+            # The listener connects in a worker thread; wait until it is listening
+            for _ in range(50):
+                await asyncio.sleep(0.1)
+                listening = await sync_to_async(self.listening)()
+                if listening:
+                    break
+            tomorrow = date.today() + timedelta(days=1)
+            await sync_to_async(Reservation.objects.create)(
+                user=user, date=tomorrow, start_time=time(10, 0), end_time=time(11, 0)
+            )
+            self.assertEqual(await asyncio.wait_for(queue.get(), 5), {'dates': [tomorrow.isoformat()]})
+        finally:
+            events.hub.unsubscribe(queue)
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+
+    def listening(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM pg_stat_activity WHERE query = %s', [f'LISTEN {events.CHANNEL}'])
+            return cursor.fetchone()[0] > 0
+
 # --- TRADE API TESTS ---
 
 class TradeAPITests(APITestCase):
@@ -609,23 +1415,188 @@ class TradeAPITests(APITestCase):
         trade.refresh_from_db()
         self.assertEqual(trade.status, 'REJECTED')
 
-# --- PRIMETIME API TESTS ---
+# --- DELTA SYNC TESTS ---
 
-class PrimeTimeAPITests(APITestCase):
+class ReservationChangesAPITests(APITransactionTestCase):
     """
-    Primetime API scenarios:
-    - Admin creates primetime settings
-    - Regular user cannot create primetime
-    - Admin lists primetime settings
+    Delta sync scenarios:
+    - A full sync returns every visible reservation, then polls return nothing
+    - Edits, cancellations and bulk completions show up once, in the next poll
+    - Trades report the incoming reservation and the one traded away
+    - Rows from a transaction that commits late are not skipped
+    - Large change sets are paged
     """
     def setUp(self):
-        self.admin_user = User.objects.create_user(
-            username='admin',
-            email='admin@example.com',
-            password='adminpass123',
-            role='admin'
+        self.user1 = User.objects.create_user(username='user1', email='user1@example.com', password='pass123')
+        self.user2 = User.objects.create_user(username='user2', email='user2@example.com', password='pass123')
+        self.tomorrow = date.today() + timedelta(days=1)
+        self.reservation1 = Reservation.objects.create(
+            user=self.user1, date=self.tomorrow, start_time=time(10, 0), end_time=time(11, 0)
         )
-        self.regular_user = User.objects.create_user(
+        self.reservation2 = Reservation.objects.create(
+            user=self.user2, date=self.tomorrow, start_time=time(14, 0), end_time=time(15, 0)
+        )
+        self.client.force_authenticate(user=self.user1)
+
+    def sync(self, token=None):
+        response = self.client.get('/api/reservations/changes/', {'since': token} if token else {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_full_sync_then_empty_polls(self):
+        """
+        Scenario: Frontend syncs from scratch, then polls with the returned token
+        Postman/SvelteKit: GET /api/reservations/changes/ then ?since={next}
+        """
+        data = self.sync()
+        self.assertEqual([r['id'] for r in data['changes']], [self.reservation1.id])
+        self.assertFalse(data['has_more'])
+
+        with self.assertNumQueries(2):
+            poll = self.sync(data['next'])
+        self.assertEqual(poll['changes'], [])
+        self.assertEqual(poll['removed'], [])
+
+    def test_edits_and_cancellations_are_delivered_once(self):
+        """
+        Scenario: User edits one booking and cancels another between polls
+        Postman/SvelteKit: DELETE /api/reservations/{id}/ then GET /api/reservations/changes/?since=...
+        """
+        other = Reservation.objects.create(
+            user=self.user1, date=self.tomorrow, start_time=time(12, 0), end_time=time(13, 0)
+        )
+        token = self.sync()['next']
+
+        self.reservation1.notes = 'Moved to room B'
+        self.reservation1.save()
+        self.assertEqual(self.client.delete(f'/api/reservations/{other.id}/').status_code, status.HTTP_204_NO_CONTENT)
+
+        data = self.sync(token)
+        changed = {r['id']: r for r in data['changes']}
+        self.assertEqual(set(changed), {self.reservation1.id, other.id})
+        self.assertEqual(changed[self.reservation1.id]['notes'], 'Moved to room B')
+        self.assertEqual(changed[other.id]['status'], 'CANCELLED')
+        self.assertEqual(self.sync(data['next'])['changes'], [])
+
+    def test_bulk_completion_is_delivered(self):
+        """
+        Scenario: The nightly job completes past bookings with a raw UPDATE
+        Postman/SvelteKit: mark_past_reservations_completed, then GET /api/reservations/changes/?since=...
+        """
+        past = Reservation.objects.create(
+            user=self.user1, date=date.today() - timedelta(days=1), start_time=time(10, 0), end_time=time(11, 0)
+        )
+        token = self.sync()['next']
+        call_command('mark_past_reservations_completed', stdout=StringIO())
+
+        data = self.sync(token)
+        self.assertEqual([(r['id'], r['status']) for r in data['changes']], [(past.id, 'COMPLETED')])
+
+    def test_trade_reports_incoming_and_removed(self):
+        """
+        Scenario: User1's trade request is accepted by user2
+        Postman/SvelteKit: POST /api/reservations/trades/{id}/ with action=accept, then sync as user1
+        """
+        token = self.sync()['next']
+        trade = TradeRequest.objects.create(
+            requester=self.user1,
+            target_user=self.user2,
+            requester_reservation=self.reservation1,
+            target_reservation=self.reservation2
+        )
+        self.client.force_authenticate(user=self.user2)
+        self.client.post(f'/api/reservations/trades/{trade.id}/', {'action': 'accept'})
+
+        self.client.force_authenticate(user=self.user1)
+        data = self.sync(token)
+        self.assertEqual([r['id'] for r in data['changes']], [self.reservation2.id])
+        self.assertEqual(data['removed'], [self.reservation1.id])
+
+    def test_late_commit_is_not_skipped(self):
+        """
+        Scenario: A slow transaction commits after a newer one was already synced
+        Postman/SvelteKit: concurrent writers while the frontend polls
+        """
+        token = self.sync()['next']
+        written = threading.Event()
+        release = threading.Event()
+
+        def slow_writer():
+            try:
+                with transaction.atomic():
+                    Reservation.objects.create(
+                        user=self.user1, date=self.tomorrow, start_time=time(8, 0), end_time=time(9, 0)
+                    )
+                    written.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=slow_writer)
+        thread.start()
+        try:
+            self.assertTrue(written.wait(10))
+            # Committed after the slow transaction started, so its id is higher
+            fast = Reservation.objects.create(
+                user=self.user1, date=self.tomorrow, start_time=time(16, 0), end_time=time(17, 0)
+            )
+            data = self.sync(token)
+            # Held back until everything before it has finished
+            self.assertEqual(data['changes'], [])
+        finally:
+            release.set()
+            thread.join()
+
+        data = self.sync(data['next'])
+        self.assertEqual(len(data['changes']), 2)
+        self.assertIn(fast.id, [r['id'] for r in data['changes']])
+
+    def test_changes_are_paged(self):
+        """
+        Scenario: More changes than fit in one response
+        Postman/SvelteKit: GET /api/reservations/changes/ while has_more is true
+        """
+        for hour in [11, 12, 13, 15, 16]:
+            Reservation.objects.create(
+                user=self.user1, date=self.tomorrow, start_time=time(hour, 0), end_time=time(hour, 30)
+            )
+        seen = []
+        token = None
+        with mock.patch.object(changes, 'CHANGES_PAGE_SIZE', 2):
+            while True:
+                data = self.sync(token)
+                seen.extend(r['id'] for r in data['changes'])
+                token = data['next']
+                if not data['has_more']:
+                    break
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(seen)), 6)
+
+    def test_invalid_token_rejected(self):
+        """
+        Scenario: Client sends a corrupted sync token
+        Postman/SvelteKit: GET /api/reservations/changes/?since=garbage
+        """
+        response = self.client.get('/api/reservations/changes/', {'since': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+# --- PRIMETIME API TESTS ---
+
+class PrimeTimeAPITests(APITestCase):
+    """
+    Primetime API scenarios:
+    - Admin creates primetime settings
+    - Regular user cannot create primetime
+    - Admin lists primetime settings
+    """
+    def setUp(self):
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123',
+            role='admin'
+        )
+        self.regular_user = User.objects.create_user(
             username='user',
             email='user@example.com',
             password='userpass123'
@@ -742,3 +1713,1258 @@ class DashboardAPITests(APITestCase):
         self.client.force_authenticate(user=self.user)
         response = self.client.get('/api/reservations/admin/dashboard/')
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+# --- CONDITIONAL GET TESTS ---
+
+class ConditionalGetTests(APITestCase):
+    """
+    Conditional GET scenarios:
+    - Every polled endpoint sends an ETag, a Cache-Control policy and Vary
+    - A matching If-None-Match gets a 304 without building or serializing anything
+    - A change to what the endpoint shows produces a new ETag
+    - Different users never share an ETag
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123',
+            role='admin'
+        )
+        self.tomorrow = date.today() + timedelta(days=1)
+        # Start from published settings, an empty day cache and no pending dates
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_settings_snapshot()
+        caches[calendar_cache.CALENDAR_CACHE_ALIAS].clear()
+        calendar_cache._pending_dates().clear()
+        self.addCleanup(calendar_cache._pending_dates().clear)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reservation = Reservation.objects.create(
+                user=self.user, date=self.tomorrow, start_time=time(10, 0), end_time=time(11, 0)
+            )
+        self.client.force_authenticate(user=self.user)
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_calendar_not_modified_skips_building(self):
+        """
+        Scenario: Frontend polls an unchanged calendar week
+        Postman/SvelteKit: GET /api/reservations/calendar/ with If-None-Match
+        """
+        url = f'/api/reservations/calendar/?start_date={self.tomorrow}'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertIn('Authorization', response['Vary'])
+
+        with mock.patch('reservations.views.get_calendar') as get_calendar_mock, self.assertNumQueries(0):
+            not_modified = self.revalidate(url, response)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        get_calendar_mock.assert_not_called()
+
+        # A booking in the range moves the ETag
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.create(
+                user=self.user, date=self.tomorrow, start_time=time(12, 0), end_time=time(13, 0)
+            )
+        changed = self.revalidate(url, response)
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_calendar_skips_etag_for_uncommitted_changes(self):
+        """
+        Scenario: Calendar read inside a transaction that just booked a slot
+        Postman/SvelteKit: n/a (server-side transaction)
+        """
+        calendar_cache.bump_calendar_dates(self.tomorrow)
+        response = self.client.get(f'/api/reservations/calendar/?start_date={self.tomorrow}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('ETag', response)
+
+    def test_list_not_modified_skips_serialization(self):
+        """
+        Scenario: Frontend polls an unchanged page of reservations
+        Postman/SvelteKit: GET /api/reservations/ with If-None-Match
+        """
+        url = '/api/reservations/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+        # One query for the page keys; the rows are never fetched
+        with mock.patch('reservations.views.ReservationReadSerializer') as serializer_mock, self.assertNumQueries(1):
+            not_modified = self.revalidate(url, response)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        serializer_mock.assert_not_called()
+        serializer_mock.rows.assert_not_called()
+
+        # Weak validators from intermediaries still match
+        weak = self.client.get(url, HTTP_IF_NONE_MATCH=f'W/{response["ETag"]}')
+        self.assertEqual(weak.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.reservation.notes = 'Bring a projector'
+        self.reservation.save()
+        changed = self.revalidate(url, response)
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(changed.data['results'][0]['notes'], 'Bring a projector')
+
+    def test_list_etag_differs_per_user(self):
+        """
+        Scenario: Admin and user fetch the reservation list
+        Postman/SvelteKit: GET /api/reservations/ as user, then as admin with the user's ETag
+        """
+        response = self.client.get('/api/reservations/')
+        self.client.force_authenticate(user=self.admin_user)
+        other = self.revalidate('/api/reservations/', response)
+        self.assertEqual(other.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(other['ETag'], response['ETag'])
+
+    def test_dashboard_not_modified_skips_serialization(self):
+        """
+        Scenario: User polls an unchanged dashboard
+        Postman/SvelteKit: GET /api/reservations/dashboard/user/ with If-None-Match
+        """
+        url = '/api/reservations/dashboard/user/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+        with mock.patch('reservations.views.ReservationReadSerializer') as read_mock, \
+                mock.patch('reservations.views.ReservationAuditLogSerializer') as log_mock, \
+                self.assertNumQueries(1):
+            not_modified = self.revalidate(url, response)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        read_mock.assert_not_called()
+        log_mock.assert_not_called()
+
+        ReservationAuditLog.objects.create(reservation=self.reservation, action='UPDATED', performed_by=self.user)
+        changed = self.revalidate(url, response)
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(changed.data['recent_activity']), 1)
+
+    def test_primetime_settings_not_modified_skips_serialization(self):
+        """
+        Scenario: Frontend re-reads primetime settings
+        Postman/SvelteKit: GET /api/reservations/admin/primetime/ with If-None-Match
+        """
+        url = '/api/reservations/admin/primetime/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+        with mock.patch('reservations.views.PrimeTimeSettingsSerializer') as serializer_mock:
+            not_modified = self.revalidate(url, response)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        serializer_mock.assert_not_called()
+
+        PrimeTimeSettings.objects.create(weekday=0, start_time=time(12, 0), end_time=time(14, 0))
+        changed = self.revalidate(url, response)
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(changed.data), 1)
+
+    def test_primetime_settings_reread_after_admin_edit(self):
+        """
+        Scenario: Admin edits a primetime setting, then the dialog reloads the list
+        Postman/SvelteKit: PUT/DELETE /api/reservations/admin/primetime/{id}/, then GET /api/reservations/admin/primetime/ with If-None-Match
+        """
+        url = '/api/reservations/admin/primetime/'
+        setting = PrimeTimeSettings.objects.create(weekday=0, start_time=time(12, 0), end_time=time(14, 0))
+        PrimeTimeSettings.objects.create(weekday=1, start_time=time(12, 0), end_time=time(14, 0))
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        updated = self.client.put(f'{url}{setting.id}/', {
+            'weekday': 0, 'start_time': '13:00:00', 'end_time': '15:00:00', 'is_active': True,
+        }, format='json')
+        self.assertEqual(updated.status_code, status.HTTP_200_OK)
+        after_update = self.revalidate(url, response)
+        self.assertEqual(after_update.status_code, status.HTTP_200_OK)
+        self.assertIn('13:00:00', [row['start_time'] for row in after_update.data])
+
+        deleted = self.client.delete(f'{url}{setting.id}/')
+        self.assertEqual(deleted.status_code, status.HTTP_204_NO_CONTENT)
+        after_delete = self.revalidate(url, after_update)
+        self.assertEqual(after_delete.status_code, status.HTTP_200_OK)
+        self.assertNotIn(setting.id, [row['id'] for row in after_delete.data])
+        self.assertEqual(len(after_delete.data), 1)
+
+
+# --- EMAIL TESTS ---
+
+class RecordingEmailBackend(locmem.EmailBackend):
+    """locmem backend that counts how many connections were created"""
+    instances = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        RecordingEmailBackend.instances += 1
+
+
+class FailingEmailBackend(locmem.EmailBackend):
+    def send_messages(self, messages):
+        raise SMTPException('421 Service not available')
+
+
+def queued_email(subject='Reservation Confirmed', to='test@example.com'):
+    return EmailOutbox.objects.create(subject=subject, to=[to], content='Your reservation has been confirmed.', details='Date: 2030-01-01\n')
+
+
+class EmailRenderingTests(SimpleTestCase):
+    """
+    Email rendering scenarios:
+    - The template is compiled once and renders the same HTML as before
+    - The plain-text part is built from the values, without markup or CSS
+    - Bulk rendering matches one-at-a-time rendering
+    """
+    def test_compiled_template_matches_uncached_html(self):
+        """
+        Scenario: Confirmation emails render identically after caching the template
+        Postman/SvelteKit: n/a (internal)
+        """
+        self.assertIs(get_compiled_template(), get_compiled_template())
+        for message in build_messages(5):
+            html_body, _ = render_html_emails([message])[0]
+            expected_html, _ = render_html_email_uncached(
+                message['subject'], message['content'], message['details'], message['preheader']
+            )
+            self.assertEqual(html_body, expected_html)
+
+    def test_text_body_built_from_context(self):
+        """
+        Scenario: Mail clients without HTML show a readable message
+        Postman/SvelteKit: n/a (internal)
+        """
+        email = build_html_email(
+            subject='Reservation Confirmed',
+            to_email='test@example.com',
+            content='Dear Pat,<br/><br/>Your reservation has been <strong>confirmed</strong>.',
+            details='Date: 2030-01-01\nTime: 10:00:00 - 11:00:00\n',
+            preheader='Thank you for choosing our service.',
+        )
+        self.assertEqual(email.body, (
+            'Reservation Confirmed\n'
+            'Thank you for choosing our service.\n'
+            '\n'
+            'Dear Pat,\n'
+            '\n'
+            'Your reservation has been confirmed.\n'
+            '\n'
+            'Date: 2030-01-01\n'
+            'Time: 10:00:00 - 11:00:00\n'
+            '\n'
+            'Sincerely,\n'
+            'The Booking Team\n'
+        ))
+        self.assertEqual(email.alternatives[0][1], 'text/html')
+
+    def test_bulk_render_matches_single_render(self):
+        """
+        Scenario: The outbox worker renders a whole batch at once
+        Postman/SvelteKit: n/a (python manage.py process_email_outbox)
+        """
+        messages = build_messages(20)
+        self.assertEqual(render_html_emails(messages), [render_html_emails([m])[0] for m in messages])
+
+
+class EmailOutboxTests(APITestCase):
+    """
+    Email outbox scenarios:
+    - Booking queues the confirmation instead of sending it in the request
+    - Rolled-back work queues nothing
+    - The worker sends a batch over one connection
+    - Failed sends back off and eventually give up
+    - A message that can't be rendered counts an attempt without holding up the batch
+    - A claim whose worker never reported back is given up after max_attempts
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            CalendarSettings.objects.create(send_confirmation_emails=True)
+        self.addCleanup(invalidate_settings_snapshot)
+
+    def test_booking_queues_confirmation_email(self):
+        """
+        Scenario: User books a slot; the confirmation email is queued, not sent inline
+        Postman/SvelteKit: POST /api/reservations/
+        """
+        self.client.force_authenticate(user=self.user)
+        data = {
+            'booking_name': 'Team Sync',
+            'date': (date.today() + timedelta(days=1)).isoformat(),
+            'start_time': '10:00',
+            'end_time': '11:00',
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/reservations/', data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(mail.outbox), 0)
+
+        queued = EmailOutbox.objects.get()
+        self.assertEqual(queued.to, ['test@example.com'])
+        self.assertEqual(queued.subject, 'Reservation Confirmed')
+        self.assertEqual(queued.status, 'PENDING')
+
+    def test_rolled_back_work_queues_nothing(self):
+        """
+        Scenario: The transaction that queued an email fails
+        Postman/SvelteKit: n/a (internal)
+        """
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    queue_html_email('Reservation Approved', 'test@example.com', 'Approved')
+                    raise RuntimeError('approval failed')
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    @override_settings(EMAIL_BACKEND='reservations.tests.RecordingEmailBackend')
+    def test_worker_sends_batch_over_one_connection(self):
+        """
+        Scenario: Worker drains the queue
+        Postman/SvelteKit: n/a (python manage.py process_email_outbox)
+        """
+        for i in range(3):
+            queued_email(to=f'user{i}@example.com')
+        RecordingEmailBackend.instances = 0
+
+        out = StringIO()
+        call_command('process_email_outbox', stdout=out)
+
+        self.assertEqual(RecordingEmailBackend.instances, 1)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['user0@example.com', 'user1@example.com', 'user2@example.com'])
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        self.assertEqual(EmailOutbox.objects.filter(status='SENT', sent_at__isnull=False).count(), 3)
+        self.assertIn('Sent 3 email(s)', out.getvalue())
+
+    @override_settings(EMAIL_BACKEND='reservations.tests.FailingEmailBackend')
+    def test_failed_send_backs_off_then_fails(self):
+        """
+        Scenario: SMTP keeps rejecting a message
+        Postman/SvelteKit: n/a (python manage.py process_email_outbox)
+        """
+        row = queued_email()
+        before = timezone.now()
+        result = process_outbox_batch(max_attempts=2)
+        self.assertEqual(result.retrying, 1)
+
+        row.refresh_from_db()
+        self.assertEqual(row.status, 'PENDING')
+        self.assertEqual(row.attempts, 1)
+        self.assertIn('SMTPException', row.last_error)
+        self.assertGreaterEqual(row.next_attempt_at, before + backoff_delay(1))
+
+        # Not due yet, so nothing is claimed
+        self.assertEqual(process_outbox_batch(max_attempts=2).claimed, 0)
+
+        EmailOutbox.objects.filter(pk=row.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(process_outbox_batch(max_attempts=2).failed, 1)
+        row.refresh_from_db()
+        self.assertEqual(row.status, 'FAILED')
+        self.assertEqual(row.attempts, 2)
+
+    def test_render_failure_counts_attempt(self):
+        """
+        Scenario: One queued message breaks the template; the rest of the batch is still sent
+        Postman/SvelteKit: n/a (python manage.py process_email_outbox)
+        """
+        broken, fine = queued_email(to='broken@example.com'), queued_email(to='fine@example.com')
+
+        def build(messages, connection=None):
+            messages = list(messages)
+            if any(message['to_email'] == ['broken@example.com'] for message in messages):
+                raise ValueError('bad template input')
+            return build_html_emails(messages, connection=connection)
+
+        before = timezone.now()
+        with mock.patch('reservations.outbox.build_html_emails', side_effect=build):
+            result = process_outbox_batch(max_attempts=2)
+        self.assertEqual((result.claimed, result.sent, result.retrying), (2, 1, 1))
+        self.assertEqual([m.to for m in mail.outbox], [['fine@example.com']])
+
+        broken.refresh_from_db()
+        self.assertEqual((broken.status, broken.attempts), ('PENDING', 1))
+        self.assertIn('ValueError: bad template input', broken.last_error)
+        self.assertGreaterEqual(broken.next_attempt_at, before + backoff_delay(1))
+        self.assertEqual(EmailOutbox.objects.get(pk=fine.pk).status, 'SENT')
+
+    def test_unreported_claims_give_up(self):
+        """
+        Scenario: The worker was killed while sending, every time the message was claimed
+        Postman/SvelteKit: n/a (python manage.py process_email_outbox)
+        """
+        row = queued_email()
+        EmailOutbox.objects.filter(pk=row.pk).update(attempts=2)
+        result = process_outbox_batch(max_attempts=2)
+        self.assertEqual((result.claimed, result.sent, result.failed), (1, 0, 1))
+        self.assertEqual(mail.outbox, [])
+        row.refresh_from_db()
+        self.assertEqual(row.status, 'FAILED')
+        self.assertIn('worker stopped', row.last_error)
+
+    def test_backoff_grows_and_is_capped(self):
+        """
+        Scenario: Retry delays double up to one hour
+        Postman/SvelteKit: n/a (internal)
+        """
+        self.assertEqual(backoff_delay(1), timedelta(seconds=30))
+        self.assertEqual(backoff_delay(3), timedelta(minutes=2))
+        self.assertEqual(backoff_delay(20), timedelta(hours=1))
+
+
+class EmailOutboxWorkerConcurrencyTests(TransactionTestCase):
+    """
+    Outbox worker concurrency scenarios:
+    - Rows locked by another worker are skipped, not waited on
+    - No transaction is open while SMTP is talked to; the claim is already committed
+    """
+    def test_locked_rows_are_skipped(self):
+        """
+        Scenario: Two workers run at once; each sends only what it claimed
+        Postman/SvelteKit: n/a (python manage.py process_email_outbox on two hosts)
+        """
+        locked, free = queued_email(to='locked@example.com'), queued_email(to='free@example.com')
+        claimed = threading.Event()
+        release = threading.Event()
+
+        def other_worker():
+            try:
+                with transaction.atomic():
+                    list(EmailOutbox.objects.select_for_update().filter(pk=locked.pk))
+                    claimed.set()
+                    release.wait(timeout=30)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        try:
+            self.assertTrue(claimed.wait(timeout=30))
+            result = process_outbox_batch()
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(result.claimed, 1)
+        self.assertEqual([m.to for m in mail.outbox], [['free@example.com']])
+        self.assertEqual(EmailOutbox.objects.get(pk=locked.pk).status, 'PENDING')
+        self.assertEqual(EmailOutbox.objects.get(pk=free.pk).status, 'SENT')
+
+    def test_sends_outside_transaction(self):
+        """
+        Scenario: SMTP is slow while delta sync clients poll
+        Postman/SvelteKit: n/a (python manage.py process_email_outbox while GET /api/reservations/changes/ runs)
+        """
+        row = queued_email()
+        seen = []
+
+        def send_messages(backend, messages):
+            leased = EmailOutbox.objects.get(pk=row.pk)
+            seen.append((connection.in_atomic_block, leased.attempts, leased.next_attempt_at > timezone.now()))
+            return len(messages)
+
+        with mock.patch.object(locmem.EmailBackend, 'send_messages', send_messages):
+            self.assertEqual(process_outbox_batch().sent, 1)
+        self.assertEqual(seen, [(False, 1, True)])
+        self.assertEqual(EmailOutbox.objects.get(pk=row.pk).status, 'SENT')
+
+# --- REQUEST TIMING TESTS ---
+
+@override_settings(REQUEST_TIMING=True)
+class RequestTimingMiddlewareTests(APITestCase):
+    """
+    Request timing scenarios:
+    - Off by default: no header and no middleware in the chain
+    - Server-Timing reports total, SQL, serialization and render time
+    - Each request logs one JSON line and adds to its view's totals
+    - Every reservations and users view is timed
+    """
+    def setUp(self):
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123',
+            role='admin'
+        )
+        self.reservation = Reservation.objects.create(
+            user=self.admin_user,
+            date=date.today() + timedelta(days=1),
+            start_time=time(10, 0),
+            end_time=time(11, 0)
+        )
+        request_timing.reset_view_stats()
+        self.addCleanup(request_timing.reset_view_stats)
+        self.client.force_authenticate(user=self.admin_user)
+
+    def phases(self, response):
+        return {
+            part.split(';')[0].strip(): part.strip()
+            for part in response['Server-Timing'].split(',')
+        }
+
+    @override_settings(REQUEST_TIMING=False)
+    def test_disabled_by_default(self):
+        """
+        Scenario: Production without REQUEST_TIMING
+        Postman/SvelteKit: GET /api/reservations/ has no Server-Timing header
+        """
+        response = self.client.get('/api/reservations/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(request_timing.view_stats(), {})
+
+    def test_server_timing_header(self):
+        """
+        Scenario: Developer inspects a slow list request in the browser's network panel
+        Postman/SvelteKit: GET /api/reservations/ and read Server-Timing
+        """
+        with CaptureQueriesContext(connection) as queries, self.assertLogs('backend.request_timing', 'INFO') as logs:
+            response = self.client.get('/api/reservations/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        phases = self.phases(response)
+        self.assertEqual(set(phases), {'total', 'db', 'serialize', 'render'})
+        self.assertIn(f'desc="{len(queries)} queries"', phases['db'])
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'reservations.views.ReservationListView')
+        self.assertEqual(record['queries'], len(queries))
+        self.assertGreater(record['serialize_ms'], 0)
+        self.assertGreater(record['render_ms'], 0)
+        self.assertGreaterEqual(record['total_ms'], record['db_ms'] + record['render_ms'])
+
+    def test_per_view_totals(self):
+        """
+        Scenario: Operator compares views by total time
+        Postman/SvelteKit: GET /api/reservations/ twice and GET /api/reservations/calendar/ once
+        """
+        for url in ('/api/reservations/', '/api/reservations/', '/api/reservations/calendar/'):
+            self.client.get(url)
+        stats = request_timing.view_stats()
+        self.assertEqual(stats['reservations.views.ReservationListView']['requests'], 2)
+        self.assertEqual(stats['reservations.views.CalendarView']['requests'], 1)
+        self.assertGreater(stats['reservations.views.ReservationListView']['queries'], 0)
+
+    def test_every_view_is_timed(self):
+        """
+        Scenario: Every reservations and users endpoint reports its timing
+        Postman/SvelteKit: GET each route under /api/reservations/ and /api/users/
+        """
+        expected = set()
+        for prefix, module in (('/api/reservations/', 'reservations.urls'), ('/api/users/', 'users.urls')):
+            for pattern in get_resolver(module).url_patterns:
+                self.assertIsInstance(pattern, URLPattern)
+                view = getattr(pattern.callback, 'view_class', pattern.callback)
+                expected.add(f'{view.__module__}.{view.__qualname__}')
+                route = str(pattern.pattern).replace('<int:pk>', str(self.reservation.pk))
+                response = self.client.get(prefix + route)
+                self.assertIn('Server-Timing', response, route)
+
+        self.assertTrue(all(name.startswith(('reservations.views.', 'users.views.')) for name in expected))
+        self.assertEqual(set(request_timing.view_stats()), expected)
+
+# --- METRICS TESTS ---
+
+class MetricsEndpointTests(APITestCase):
+    """
+    Metrics scenarios:
+    - /api/metrics/ serves the Prometheus text format, optionally behind a token
+    - Instrumented views record latency and query counts by endpoint and status
+    - Calendar cache hits/misses and overlap rejections are counted
+    - Outbox depth and revocation filter stats are read at scrape time
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.tomorrow = date.today() + timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_settings_snapshot()
+        caches[calendar_cache.CALENDAR_CACHE_ALIAS].clear()
+        calendar_cache._pending_dates().clear()
+        self.addCleanup(calendar_cache._pending_dates().clear)
+
+    def sample(self, name, **labels):
+        return metrics.REGISTRY.get_sample_value(name, labels) or 0
+
+    def scrape(self):
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        return response.content.decode()
+
+    def test_calendar_latency_queries_and_cache(self):
+        """
+        Scenario: Calendar is opened twice; the second time is served from the day cache
+        Postman/SvelteKit: GET /api/reservations/calendar/ twice, then GET /api/metrics/
+        """
+        labels = {'endpoint': 'calendar', 'method': 'GET', 'status': '200'}
+        requests = self.sample('api_request_duration_seconds_count', **labels)
+        hits = self.sample('calendar_cache_days_total', result='hit')
+        misses = self.sample('calendar_cache_days_total', result='miss')
+
+        self.client.force_authenticate(user=self.user)
+        url = f'/api/reservations/calendar/?start_date={self.tomorrow}&end_date={self.tomorrow + timedelta(days=6)}'
+        self.client.get(url)
+        self.client.get(url)
+
+        self.assertEqual(self.sample('api_request_duration_seconds_count', **labels), requests + 2)
+        self.assertEqual(self.sample('calendar_cache_days_total', result='miss'), misses + 7)
+        self.assertEqual(self.sample('calendar_cache_days_total', result='hit'), hits + 7)
+        body = self.scrape()
+        self.assertIn('api_request_duration_seconds_bucket{endpoint="calendar",le="0.005",method="GET",status="200"}', body)
+        self.assertIn('api_request_db_queries_count{endpoint="calendar"}', body)
+
+    def test_login_rate_by_status(self):
+        """
+        Scenario: A failed login is counted separately from successful ones
+        Postman/SvelteKit: POST /api/users/login/ with a wrong password
+        """
+        labels = {'endpoint': 'login', 'method': 'POST', 'status': '401'}
+        failures = self.sample('api_request_duration_seconds_count', **labels)
+        self.client.post('/api/users/login/', {'email': 'test@example.com', 'password': 'wrong'})
+        self.assertEqual(self.sample('api_request_duration_seconds_count', **labels), failures + 1)
+
+    def test_overlap_rejections_counted(self):
+        """
+        Scenario: A booking that overlaps an existing one is refused
+        Postman/SvelteKit: POST /api/reservations/ overlapping an existing slot
+        """
+        Reservation.objects.create(user=self.user, date=self.tomorrow, start_time=time(10, 0), end_time=time(11, 0))
+        rejections = self.sample('reservation_overlap_rejections_total')
+        serializer = ReservationCreateSerializer(
+            data={'booking_name': 'Overlap', 'date': self.tomorrow, 'start_time': '10:30', 'end_time': '11:30'},
+            context={'request': SimpleNamespace(user=self.user)}
+        )
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(serializers.ValidationError):
+            serializer.save()
+        self.assertEqual(self.sample('reservation_overlap_rejections_total'), rejections + 1)
+
+    def test_scrape_time_gauges(self):
+        """
+        Scenario: Operator checks the email backlog and the revocation filter
+        Postman/SvelteKit: GET /api/metrics/
+        """
+        queued_email()
+        queued_email()
+        body = self.scrape()
+        self.assertIn('email_outbox_messages{status="pending"} 2.0', body)
+        self.assertIn('email_outbox_messages{status="failed"} 0.0', body)
+        self.assertIn('refresh_token_filter_checks ', body)
+        self.assertIn('refresh_token_filter_size_bytes ', body)
+        self.assertIn('refresh_token_filter_observed_false_positive_rate ', body)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_token_required_when_configured(self):
+        """
+        Scenario: Metrics are only readable by the Prometheus scraper
+        Postman/SvelteKit: GET /api/metrics/ with and without the bearer token
+        """
+        self.assertEqual(self.client.get('/api/metrics/').status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+# --- QUERY BUDGET TESTS ---
+
+class ReservationQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """
+    Query budget scenarios:
+    - Every reservations endpoint runs as many queries on 1000 reservations,
+      trades and audit entries as on 1 (no query per row)
+    - Every URL in reservations/urls.py has a budget
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser', email='other@example.com', password='otherpass123'
+        )
+        self.admin_user = User.objects.create_user(
+            username='admin', email='admin@example.com', password='adminpass123', role='admin'
+        )
+        CalendarSettings.objects.create()
+        self.primetime = PrimeTimeSettings.objects.create(weekday=0, start_time=time(18, 0), end_time=time(19, 0))
+        self.tomorrow = date.today() + timedelta(days=1)
+
+        # The rows the detail endpoints act on; seed_dataset() adds the rest
+        def book(user, hour, **kwargs):
+            return Reservation.objects.create(
+                user=user, booking_name='Fixed', date=self.tomorrow,
+                start_time=time(hour, 0), end_time=time(hour + 1, 0), status='CONFIRMED', **kwargs
+            )
+        self.reservation = book(self.user, 8)
+        self.other_reservation = book(self.other_user, 9)
+        self.pending_reservation = book(self.other_user, 10, reservation_type='PRIMETIME')
+        Reservation.objects.filter(pk=self.pending_reservation.pk).update(status='PENDING')
+        self.trade = TradeRequest.objects.create(
+            requester=self.other_user, target_user=self.user,
+            requester_reservation=book(self.other_user, 11), target_reservation=book(self.user, 12)
+        )
+        self.seeded = 0
+
+    def seed_dataset(self, size):
+        """Grow to size reservations each for the user and another user, size trades between them and size audit entries"""
+        mine, theirs = [], []
+        for index in range(self.seeded, size):
+            day = self.tomorrow + timedelta(days=1 + index // 4)
+            hour = 8 + 2 * (index % 4)
+            pending = index % 5 == 0
+            for owner, start, rows in ((self.user, hour, mine), (self.other_user, hour + 1, theirs)):
+                rows.append(Reservation(
+                    user=owner, booking_name=f'Seeded {index}', date=day,
+                    start_time=time(start, 0), end_time=time(start + 1, 0),
+                    status='PENDING' if pending else 'CONFIRMED',
+                    reservation_type='PRIMETIME' if pending else 'FREE_FOR_ALL',
+                    approved_by=None if pending else self.admin_user,
+                ))
+        Reservation.objects.bulk_create(mine + theirs)
+        TradeRequest.objects.bulk_create(
+            TradeRequest(
+                requester=self.other_user, target_user=self.user,
+                requester_reservation=their_reservation, target_reservation=my_reservation,
+            )
+            for my_reservation, their_reservation in zip(mine, theirs)
+        )
+        ReservationAuditLog.objects.bulk_create(
+            ReservationAuditLog(reservation=reservation, action='CREATED', performed_by=reservation.user)
+            for reservation in mine + theirs
+        )
+        self.seeded = size
+
+    def reset_state(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_settings_snapshot()
+        caches[calendar_cache.CALENDAR_CACHE_ALIAS].clear()
+        calendar_cache._pending_dates().clear()
+
+    def budget_endpoints(self):
+        user, admin = self.user, self.admin_user
+        reservation = {'pk': self.reservation.pk}
+        week = f'?start_date={self.tomorrow}&end_date={self.tomorrow + timedelta(days=6)}'
+        return [
+            Endpoint('GET', 'health-check'),
+            Endpoint('GET', 'reservation-list', user),
+            Endpoint('GET', 'reservation-list', admin),
+            Endpoint('POST', 'reservation-list', user, data={
+                'booking_name': 'New', 'date': self.tomorrow.isoformat(), 'start_time': '15:00', 'end_time': '16:00'
+            }, status=201),
+            Endpoint('GET', 'reservation-changes', user),
+            Endpoint('GET', 'reservation-detail', user, reservation),
+            Endpoint('PUT', 'reservation-detail', user, reservation, data={'booking_name': 'Renamed'}),
+            Endpoint('DELETE', 'reservation-detail', user, reservation, status=204),
+            Endpoint('POST', 'reservation-approval', admin, {'pk': self.pending_reservation.pk}, data={'action': 'approve'}),
+            Endpoint('GET', 'calendar-view', user, query=week),
+            # The test client is WSGI, which the stream refuses
+            Endpoint('GET', 'calendar-events', user, status=501),
+            Endpoint('GET', 'trade-list', user),
+            Endpoint('POST', 'trade-list', user, data={
+                'requester_reservation_id': self.reservation.pk, 'target_reservation_id': self.other_reservation.pk
+            }, status=201),
+            Endpoint('GET', 'trade-detail', user, {'pk': self.trade.pk}),
+            Endpoint('POST', 'trade-detail', user, {'pk': self.trade.pk}, data={'action': 'accept'}),
+            Endpoint('GET', 'primetime-list', admin),
+            Endpoint('POST', 'primetime-list', admin, data={'weekday': 1, 'start_time': '18:00', 'end_time': '19:00'}, status=201),
+            Endpoint('GET', 'primetime-detail', admin, {'pk': self.primetime.pk}),
+            Endpoint('PUT', 'primetime-detail', admin, {'pk': self.primetime.pk}, data={
+                'weekday': 0, 'start_time': '17:00', 'end_time': '19:00', 'is_active': True
+            }),
+            Endpoint('DELETE', 'primetime-detail', admin, {'pk': self.primetime.pk}, status=204),
+            Endpoint('GET', 'calendar-settings', admin),
+            Endpoint('PUT', 'calendar-settings', admin, data={
+                'business_start_time': '07:00', 'business_end_time': '20:00', 'slot_duration_minutes': 60,
+                'max_advance_booking_days': 30, 'allow_same_day_booking': True,
+                'admin_email': 'admin@example.com', 'send_confirmation_emails': True
+            }),
+            Endpoint('GET', 'user-dashboard', user),
+            Endpoint('GET', 'admin-dashboard', admin),
+        ]
+
+    def test_every_url_has_a_budget(self):
+        """
+        Scenario: A new endpoint is added without a query budget
+        Postman/SvelteKit: N/A (test-suite guard)
+        """
+        self.assertEndpointsCovered('reservations.urls')
+
+    def test_query_counts_do_not_grow_with_data(self):
+        """
+        Scenario: An N+1 creeps into a serializer (e.g. nested trade reservations)
+        Postman/SvelteKit: call every /api/reservations/ endpoint with 1, 10 and 1000 rows seeded
+        """
+        self.assertQueryBudgets()
+
+# --- JSON RENDERER TESTS ---
+
+class FastJSONTests(SimpleTestCase):
+    """
+    orjson renderer/parser scenarios:
+    - Output is byte-for-byte the stdlib JSONRenderer output
+    - Indented output and values orjson can't encode fall back to the stdlib
+    - Parsing matches JSONParser, including its error messages
+    """
+    def setUp(self):
+        self.fast = FastJSONRenderer()
+        self.stdlib = JSONRenderer()
+
+    def payload(self):
+        tz = dt_timezone(timedelta(hours=5, minutes=30))
+        return {
+            'date': date(2030, 1, 2),
+            'time': time(9, 30),
+            'time_us': time(9, 30, 0, 250),
+            'utc': datetime(2030, 1, 2, 9, 30, tzinfo=dt_timezone.utc),
+            'utc_us': datetime(2030, 1, 2, 9, 30, 5, 123456, tzinfo=dt_timezone.utc),
+            'offset': datetime(2030, 1, 2, 9, 30, tzinfo=tz),
+            'naive': datetime(2030, 1, 2, 9, 30),
+            'decimal': Decimal('12.50'),
+            'lazy': gettext_lazy('Confirmed'),
+            'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'duration': timedelta(minutes=90),
+            'tuple': (1, 'two', None, True),
+            'generator': (i * i for i in range(3)),
+            'text': 'Café ☕ line\u2028break\u2029end "quoted" \\ \n',
+            'nested': [{'status': 'CONFIRMED', 'slots': [], 'empty': {}}],
+        }
+
+    def test_matches_stdlib_renderer(self):
+        """
+        Scenario: Switching renderers doesn't change a single byte of the API output
+        Postman/SvelteKit: any JSON endpoint, with FAST_JSON on and off
+        """
+        self.assertEqual(self.fast.render(self.payload()), self.stdlib.render(self.payload()))
+        self.assertEqual(self.fast.render(None), b'')
+        self.assertEqual(self.fast.render([]), b'[]')
+
+    def test_falls_back_to_stdlib(self):
+        """
+        Scenario: Pretty-printed responses, huge integers and int keys still render like before
+        Postman/SvelteKit: Accept: application/json; indent=4
+        """
+        payload = {'a': [1, {'b': date(2030, 1, 2)}]}
+        self.assertEqual(
+            self.fast.render(payload, 'application/json; indent=4'),
+            self.stdlib.render(payload, 'application/json; indent=4')
+        )
+        self.assertEqual(self.fast.render({'big': 2 ** 70}), b'{"big":1180591620717411303424}')
+        self.assertEqual(self.fast.render({1: 'int key'}), self.stdlib.render({1: 'int key'}))
+        with self.assertRaises(TypeError):
+            self.fast.render({'object': object()})
+
+    def test_parser_matches_stdlib(self):
+        """
+        Scenario: Request bodies parse the same, and bad JSON gets the same 400 message
+        Postman/SvelteKit: POST /api/reservations/ with a JSON body
+        """
+        fast, stdlib = FastJSONParser(), JSONParser()
+        body = '{"booking_name": "Café", "big": 123456789012345678901234567890, "n": [1.5, null, true]}'.encode()
+        self.assertEqual(fast.parse(BytesIO(body)), stdlib.parse(BytesIO(body)))
+
+        for bad in (b'{"a": ', b'{"a": NaN}'):
+            with self.assertRaises(ParseError) as fast_error:
+                fast.parse(BytesIO(bad))
+            with self.assertRaises(ParseError) as stdlib_error:
+                stdlib.parse(BytesIO(bad))
+            self.assertEqual(str(fast_error.exception), str(stdlib_error.exception))
+
+    def test_api_uses_fast_renderer(self):
+        """
+        Scenario: Responses are negotiated to the orjson renderer by default
+        Postman/SvelteKit: GET /api/reservations/health/
+        """
+        response = self.client.get('/api/reservations/health/')
+        self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+        self.assertEqual(response.content, b'{"status":"ok"}')
+
+
+# --- MANAGEMENT COMMAND TESTS ---
+
+class ExplainViewQueriesCommandTests(TestCase):
+    """
+    explain_view_queries scenarios:
+    - Every view's SELECTs are explained with EXPLAIN ANALYZE
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123',
+            role='admin'
+        )
+        Reservation.objects.create(
+            user=self.user,
+            booking_name='Planning',
+            date=date.today() + timedelta(days=1),
+            start_time=time(10, 0),
+            end_time=time(11, 0),
+        )
+
+    def test_explains_each_view(self):
+        """
+        Scenario: Maintainer checks which plans the hot view queries get
+        Postman/SvelteKit: n/a (python manage.py explain_view_queries)
+        """
+        out = StringIO()
+        call_command('explain_view_queries', stdout=out)
+        output = out.getvalue()
+        for label in ('reservation list (user)', 'reservation list (admin, filtered)',
+                      'calendar', 'user dashboard', 'admin dashboard'):
+            self.assertIn(f'== {label}: GET', output)
+        self.assertIn('actual time=', output)
+        self.assertIn('FROM "reservations_reservationauditlog"', output)
+
+
+class MarkPastReservationsCompletedCommandTests(TestCase):
+    """
+    mark_past_reservations_completed scenarios:
+    - Past pending/confirmed reservations are completed in batches with audit logs
+    - Cancelled and future reservations are left alone
+    - --dry-run reports without changing anything
+    - Running twice is a no-op the second time
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        past = date.today() - timedelta(days=2)
+        self.past_pending = [
+            Reservation.objects.create(user=self.user, date=past, start_time=time(hour, 0), end_time=time(hour, 30))
+            for hour in (8, 9, 10)
+        ]
+        self.past_confirmed = Reservation.objects.create(
+            user=self.user, date=past, start_time=time(11, 0), end_time=time(11, 30), status='CONFIRMED'
+        )
+        self.past_cancelled = Reservation.objects.create(
+            user=self.user, date=past, start_time=time(12, 0), end_time=time(12, 30), status='CANCELLED'
+        )
+        self.future = Reservation.objects.create(
+            user=self.user, date=date.today() + timedelta(days=1), start_time=time(8, 0), end_time=time(8, 30)
+        )
+
+    def test_marks_past_reservations_in_batches(self):
+        """
+        Scenario: Nightly job completes yesterday's bookings
+        Postman/SvelteKit: n/a (python manage.py mark_past_reservations_completed --batch-size 2)
+        """
+        out = StringIO()
+        call_command('mark_past_reservations_completed', batch_size=2, stdout=out)
+        output = out.getvalue()
+
+        for reservation in self.past_pending + [self.past_confirmed]:
+            reservation.refresh_from_db()
+            self.assertEqual(reservation.status, 'COMPLETED')
+        self.past_cancelled.refresh_from_db()
+        self.future.refresh_from_db()
+        self.assertEqual(self.past_cancelled.status, 'CANCELLED')
+        self.assertNotEqual(self.future.status, 'COMPLETED')
+
+        logs = ReservationAuditLog.objects.filter(details__change__endswith='-> COMPLETED by management command')
+        self.assertEqual(logs.count(), 4)
+        self.assertEqual(logs.get(reservation=self.past_confirmed).details['change'],
+                         'status CONFIRMED -> COMPLETED by management command')
+        self.assertTrue(all(log.performed_by_id == self.user.id and log.action == 'UPDATED' for log in logs))
+
+        self.assertIn('  2/4 marked', output)
+        self.assertIn('  4/4 marked', output)
+        self.assertIn('Marked 4 of 4 past reservations as COMPLETED', output)
+
+    def test_dry_run_changes_nothing(self):
+        """
+        Scenario: Maintainer checks how much work the job would do
+        Postman/SvelteKit: n/a (python manage.py mark_past_reservations_completed --dry-run)
+        """
+        out = StringIO()
+        call_command('mark_past_reservations_completed', batch_size=3, dry_run=True, stdout=out)
+        self.assertIn('4 past reservations would be marked COMPLETED in 2 batch(es)', out.getvalue())
+        self.assertEqual(Reservation.objects.filter(status='COMPLETED').count(), 0)
+        self.assertFalse(ReservationAuditLog.objects.filter(details__change__endswith='by management command').exists())
+
+    def test_second_run_is_noop(self):
+        """
+        Scenario: Job runs again before any new bookings are in the past
+        Postman/SvelteKit: n/a (python manage.py mark_past_reservations_completed)
+        """
+        call_command('mark_past_reservations_completed', stdout=StringIO())
+        out = StringIO()
+        call_command('mark_past_reservations_completed', stdout=out)
+        self.assertIn('Marked 0 of 0 past reservations as COMPLETED', out.getvalue())
+        self.assertEqual(ReservationAuditLog.objects.filter(details__change__endswith='by management command').count(), 4)
+
+
+class SeedLoadDataCommandTests(TestCase):
+    """
+    seed_load_data scenarios:
+    - Users, reservations, trades and audit logs follow the booking rules
+    - The same seed produces the same data
+    - Existing data in the range is never overwritten
+    """
+    def setUp(self):
+        for weekday in range(7):
+            PrimeTimeSettings.objects.create(weekday=weekday, start_time=time(17, 0), end_time=time(19, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_settings_snapshot()
+
+    def seed(self, **options):
+        options = {'users': 30, 'days': 20, 'density': 0.8, 'seed': 1, 'trade_rate': 0.3, **options}
+        call_command('seed_load_data', stdout=StringIO(), **options)
+
+    def snapshot(self):
+        return list(Reservation.objects.order_by('date', 'start_time').values_list(
+            'date', 'start_time', 'end_time', 'status', 'reservation_type', 'user__email', 'booking_name'
+        ))
+
+    def test_data_follows_booking_rules(self):
+        """
+        Scenario: Capacity test database is filled with synthetic data
+        Postman/SvelteKit: n/a (python manage.py seed_load_data --users 30 --days 20)
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seed()
+        today = date.today()
+
+        self.assertEqual(User.objects.filter(email__startswith='loadtest-1-').count(), 30)
+        admin = User.objects.get(role='admin')
+        reservations = list(Reservation.objects.select_related('user'))
+        self.assertGreater(len(reservations), 100)
+        for reservation in reservations:
+            in_primetime = reservation.start_time >= time(17, 0) and reservation.end_time <= time(19, 0)
+            self.assertEqual(reservation.reservation_type, 'PRIMETIME' if in_primetime else 'FREE_FOR_ALL')
+            self.assertEqual(reservation.user.role, 'user')
+            if reservation.date < today:
+                self.assertNotIn(reservation.status, ('PENDING', 'CONFIRMED'))
+            if reservation.status == 'PENDING':
+                self.assertEqual(reservation.reservation_type, 'PRIMETIME')
+            if reservation.reservation_type == 'PRIMETIME' and reservation.status in ('CONFIRMED', 'COMPLETED'):
+                self.assertEqual(reservation.approved_by, admin)
+
+        trades = list(TradeRequest.objects.select_related('requester_reservation', 'target_reservation'))
+        self.assertTrue(trades)
+        for trade in trades:
+            if trade.status == 'ACCEPTED':
+                # Swapped: each side holds the other's original slot
+                self.assertEqual(trade.requester_reservation.user_id, trade.target_user_id)
+                self.assertEqual(trade.target_reservation.user_id, trade.requester_id)
+            else:
+                self.assertEqual(trade.requester_reservation.user_id, trade.requester_id)
+                self.assertEqual(trade.target_reservation.user_id, trade.target_user_id)
+        self.assertEqual(
+            ReservationAuditLog.objects.filter(action='CREATED').count(), len(reservations)
+        )
+
+        # Sequences were moved past the ids the command assigned
+        Reservation.objects.create(
+            user=admin, booking_name='After seeding', date=today + timedelta(days=400),
+            start_time=time(10, 0), end_time=time(11, 0)
+        )
+
+    def test_same_seed_same_data(self):
+        """
+        Scenario: Two benchmark runs start from identical data
+        Postman/SvelteKit: n/a (python manage.py seed_load_data --seed 1, twice on fresh databases)
+        """
+        runs = []
+        for _ in range(2):
+            with transaction.atomic():
+                self.seed(batch_size=50)
+                runs.append(self.snapshot())
+                transaction.set_rollback(True)
+        self.assertEqual(runs[0], runs[1])
+
+        with transaction.atomic():
+            self.seed(seed=2)
+            self.assertNotEqual(self.snapshot(), runs[0])
+            transaction.set_rollback(True)
+
+    def test_refuses_to_overwrite(self):
+        """
+        Scenario: The command is run twice for the same dates
+        Postman/SvelteKit: n/a (python manage.py seed_load_data twice)
+        """
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed(seed=2)
+        with self.assertRaises(CommandError):
+            self.seed(start_date='2099-01-01')
+
+
+class BenchCommandTests(TransactionTestCase):
+    """
+    bench scenarios:
+    - Every scenario reports latency, throughput and queries, and leaves the data as it was
+    - A run worse than the baseline by more than the threshold fails
+    """
+    def setUp(self):
+        call_command(
+            'seed_load_data', users=12, days=20, density=0.6, seed=3, trade_rate=0, stdout=StringIO()
+        )
+        self.addCleanup(caches[calendar_cache.CALENDAR_CACHE_ALIAS].clear)
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_dir = tmp_dir.name
+
+    def run_bench(self, **options):
+        options = {'requests': 3, 'warmup': 0, 'concurrency': 2, **options}
+        out = StringIO()
+        call_command('bench', stdout=out, **options)
+        return out.getvalue()
+
+    def counts(self):
+        return (
+            Reservation.objects.count(), TradeRequest.objects.count(),
+            ReservationAuditLog.objects.count(), EmailOutbox.objects.count(),
+            sorted(Reservation.objects.values_list('id', 'user_id', 'status')),
+        )
+
+    def test_reports_every_scenario(self):
+        """
+        Scenario: Performance of the main endpoints is measured on seeded data
+        Postman/SvelteKit: n/a (python manage.py bench --output bench.json)
+        """
+        before = self.counts()
+        output_path = os.path.join(self.tmp_dir, 'bench.json')
+        self.run_bench(output=output_path)
+
+        with open(output_path) as fh:
+            results = json.load(fh)['scenarios']
+        self.assertEqual(set(results), set(bench.SCENARIOS))
+        for name, summary in results.items():
+            self.assertEqual(summary['requests'], 3, name)
+            self.assertLessEqual(summary['p50_ms'], summary['p95_ms'])
+            self.assertLessEqual(summary['p95_ms'], summary['p99_ms'])
+            self.assertGreater(summary['throughput_rps'], 0)
+            if name == 'reservation_create_contention':
+                self.assertLessEqual(set(summary['statuses']), {'201', '400'})
+            else:
+                self.assertEqual(summary['statuses'], {'200': 3}, name)
+        self.assertGreater(results['calendar_month']['queries_per_request'], 0)
+        self.assertEqual(results['calendar_month_cached']['queries_per_request'], 0)
+        self.assertEqual(self.counts(), before)
+
+    def test_fails_on_regression(self):
+        """
+        Scenario: A change makes the cached calendar slower than the stored baseline
+        Postman/SvelteKit: n/a (python manage.py bench --baseline bench.json --threshold 20)
+        """
+        baseline_path = os.path.join(self.tmp_dir, 'baseline.json')
+        self.run_bench(scenario=['calendar_month_cached'], output=baseline_path)
+
+        output = self.run_bench(scenario=['calendar_month_cached'], baseline=baseline_path, threshold=10000)
+        self.assertIn('No regressions', output)
+
+        with open(baseline_path) as fh:
+            baseline = json.load(fh)
+        baseline['scenarios']['calendar_month_cached'].update(p50_ms=0.0001, throughput_rps=10 ** 9)
+        with open(baseline_path, 'w') as fh:
+            json.dump(baseline, fh)
+        with self.assertRaisesMessage(CommandError, '2 metric(s) regressed'):
+            self.run_bench(scenario=['calendar_month_cached'], baseline=baseline_path)
+
+
+class SchedulerTests(SimpleTestCase):
+    """
+    run_scheduler Scheduler scenarios:
+    - Jobs run when due, earliest first, then every interval
+    - A failing job is logged and rescheduled without stopping the others
+    """
+    def setUp(self):
+        self.now = 0.0
+        self.scheduler = Scheduler(clock=lambda: self.now, sleep=lambda seconds: None)
+
+    def test_runs_jobs_on_their_intervals(self):
+        """
+        Scenario: Completion runs hourly, pruning every six hours
+        Postman/SvelteKit: n/a (python manage.py run_scheduler)
+        """
+        self.scheduler.add('complete', 3600, lambda: None)
+        self.scheduler.add('prune', 6 * 3600, lambda: None)
+        self.assertEqual(self.scheduler.run_pending(), ['complete', 'prune'])
+        self.assertEqual(self.scheduler.run_pending(), [])
+        self.assertEqual(self.scheduler.seconds_until_next(), 3600)
+
+        self.now = 3600
+        self.assertEqual(self.scheduler.run_pending(), ['complete'])
+        self.now = 6 * 3600
+        self.assertEqual(self.scheduler.run_pending(), ['complete', 'prune'])
+
+    def test_failing_job_is_rescheduled(self):
+        """
+        Scenario: Database is briefly unavailable during one run
+        Postman/SvelteKit: n/a (python manage.py run_scheduler)
+        """
+        def fail():
+            raise RuntimeError('database unavailable')
+
+        calls = []
+        self.scheduler.add('broken', 60, fail)
+        self.scheduler.add('healthy', 60, lambda: calls.append(self.now))
+        with self.assertLogs('reservations.management.commands.run_scheduler', level='ERROR'):
+            self.assertEqual(self.scheduler.run_pending(), ['broken', 'healthy'])
+        self.now = 60
+        with self.assertLogs('reservations.management.commands.run_scheduler', level='ERROR'):
+            self.scheduler.run_pending()
+        self.assertEqual(calls, [0.0, 60])
+
+
+class RunSchedulerCommandTests(TestCase):
+    """
+    run_scheduler command scenarios:
+    - --once runs every enabled job once
+    - An interval of 0 disables a job
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.past = Reservation.objects.create(
+            user=self.user, date=date.today() - timedelta(days=1), start_time=time(9, 0), end_time=time(10, 0)
+        )
+
+    def test_once_runs_each_job(self):
+        """
+        Scenario: Deployment runs the maintenance jobs once after migrating
+        Postman/SvelteKit: n/a (python manage.py run_scheduler --once)
+        """
+        out = StringIO()
+        call_command('run_scheduler', once=True, stdout=out)
+        output = out.getvalue()
+        self.assertIn('[mark_past_reservations_completed] Marked 1 of 1 past reservations as COMPLETED', output)
+        self.assertIn('[prune_blacklist] No expired refresh token families or blacklist entries found.', output)
+        self.past.refresh_from_db()
+        self.assertEqual(self.past.status, 'COMPLETED')
+
+    def test_zero_interval_disables_job(self):
+        """
+        Scenario: Operator keeps pruning on cron and only schedules completion
+        Postman/SvelteKit: n/a (python manage.py run_scheduler --prune-blacklist-interval 0)
+        """
+        out = StringIO()
+        call_command('run_scheduler', once=True, prune_blacklist_interval=0, stdout=out)
+        self.assertNotIn('[prune_blacklist]', out.getvalue())
+        self.assertIn('[mark_past_reservations_completed]', out.getvalue())
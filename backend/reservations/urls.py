@@ -3,10 +3,12 @@ from .views import (
     # Reservation views
     ReservationListView,
     ReservationDetailView,
+    ReservationChangesView,
     ReservationApprovalView,
     
     # Calendar views
     CalendarView,
+    calendar_events,
     
     # Admin views
     PrimeTimeSettingsView,
@@ -37,6 +39,9 @@ urlpatterns = [
     # POST /api/reservations/ - Create new reservation
     path('', ReservationListView.as_view(), name='reservation-list'),
     
+    # GET /api/reservations/changes/?since={token} - Reservations changed since a sync token
+    path('changes/', ReservationChangesView.as_view(), name='reservation-changes'),
+    
     # GET /api/reservations/{id}/ - Get specific reservation
     # PUT /api/reservations/{id}/ - Update reservation
     # DELETE /api/reservations/{id}/ - Cancel reservation
@@ -49,6 +54,9 @@ urlpatterns = [
     # GET /api/reservations/calendar/ - Get calendar view with available/booked slots
     path('calendar/', CalendarView.as_view(), name='calendar-view'),
     
+    # GET /api/reservations/events/ - Server-sent events naming the dates whose calendar changed
+    path('events/', calendar_events, name='calendar-events'),
+    
     # ===================== TRADE ENDPOINTS =====================
     # GET /api/reservations/trades/ - List user's trade requests (sent/received)
     # POST /api/reservations/trades/ - Create new trade request
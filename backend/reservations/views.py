@@ -1,15 +1,23 @@
 # reservations/views.py
+from asgiref.sync import sync_to_async
 from rest_framework.views import APIView
+from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework import status, permissions
+from rest_framework import exceptions, status, permissions, serializers
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.settings import api_settings
 from django.contrib.auth import get_user_model
 from django.conf import settings
-from backend.utils.email import send_html_email
+from django.core.handlers.asgi import ASGIRequest
 from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from django.db.models import Count, Exists, Func, Max, OuterRef, Q, Subquery
 from datetime import date, datetime, timedelta, time
 from django.utils import timezone
 
+from backend.utils.metrics import instrument
+
 from .models import (
     Reservation, 
     PrimeTimeSettings, 
@@ -19,6 +27,7 @@ from .models import (
 )
 from .serializers import (
     ReservationSerializer, 
+    ReservationReadSerializer,
     ReservationCreateSerializer,
     PrimeTimeSettingsSerializer,
     TradeRequestSerializer,
@@ -28,6 +37,14 @@ from .serializers import (
     ReservationApprovalSerializer,
     ReservationAuditLogSerializer
 )
+from .calendar_cache import calendar_version, get_calendar
+from .changes import InvalidToken, changes_since, decode_token, encode_token
+from .events import calendar_event_stream, start_listening
+from .conditional import REVALIDATE, conditional_get, make_etag, validator_epoch
+from .locks import lock_reservation_dates
+from .outbox import queue_html_email
+from .pagination import ReservationCursorPagination
+from .settings_cache import get_settings_snapshot
 
 User = get_user_model()
 
@@ -52,6 +69,9 @@ class IsOwnerOrAdmin(permissions.BasePermission):
 class ReservationListView(APIView):
     """List all reservations with filtering options
 
+    GET is keyset-paginated on (-created_at, id); follow the ``next`` and
+    ``previous`` links (``?cursor=...``, optional ``page_size`` up to 100).
+
     Permission handling is enforced inside the methods to ensure the view returns
     401 Unauthorized for unauthenticated POST requests when using the custom
     authentication backend (which otherwise caused DRF to return 403).
@@ -62,11 +82,11 @@ class ReservationListView(APIView):
             if not request.user or not request.user.is_authenticated:
                 return Response(status=status.HTTP_401_UNAUTHORIZED)
 
-            queryset = Reservation.objects.select_related('user', 'approved_by')
+            queryset = Reservation.objects.all()
 
             # Filter by role
             if request.user.role != 'admin':
-                queryset = queryset.filter(user=request.user)
+                queryset = queryset.filter(user_id=request.user.id)
             
             # Apply filters
             date_filter = request.query_params.get('date')
@@ -80,9 +100,28 @@ class ReservationListView(APIView):
             if user_filter and request.user.role == 'admin':
                 queryset = queryset.filter(user__email__icontains=user_filter)
 
-            serializer = ReservationSerializer(queryset, many=True)
-            return Response(serializer.data)
+            # Page through keys only and validate on what this page would show:
+            # an aggregate over the whole filtered set would cost a full scan
+            paginator = ReservationCursorPagination()
+            page = paginator.paginate_queryset(
+                queryset.values_list('id', 'created_at', 'updated_at', named=True), request, view=self
+            )
+            etag = make_etag(
+                request.user.pk, request.user.role, request.get_full_path(),
+                [(row.id, row.updated_at) for row in page], paginator.has_next, paginator.has_previous,
+                date.today(), validator_epoch()
+            )
+
+            def build_response():
+                rows = {row.id: row for row in ReservationReadSerializer.rows(
+                    Reservation.objects.filter(id__in=[key.id for key in page]).order_by()
+                )}
+                serializer = ReservationReadSerializer([rows[key.id] for key in page if key.id in rows], many=True)
+                return paginator.get_paginated_response(serializer.data)
+
+            return conditional_get(request, etag, build_response, REVALIDATE)
     
+    @instrument('reservation_create')
     def post(self, request):
         """Create a new reservation"""
         # Require authentication to create reservations
@@ -109,6 +148,9 @@ class ReservationListView(APIView):
                     ReservationSerializer(reservation).data, 
                     status=status.HTTP_201_CREATED
                 )
+            except serializers.ValidationError as e:
+                # e.g. the slot was taken by a concurrent booking
+                return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
             except Exception as e:
                 return Response(
                     {'error': str(e)}, 
@@ -117,9 +159,9 @@ class ReservationListView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     def _send_confirmation_email(self, reservation):
-        """Send confirmation email"""
+        """Queue confirmation email (delivered by process_email_outbox)"""
         try:
-            calendar_settings = CalendarSettings.objects.first()
+            calendar_settings = get_settings_snapshot().calendar
             if not calendar_settings or not calendar_settings.send_confirmation_emails:
                 return
             subject = f"Reservation {'Confirmed' if reservation.status == 'CONFIRMED' else 'Pending Approval'}"
@@ -136,14 +178,13 @@ class ReservationListView(APIView):
                 f"Status: {reservation.get_status_display()}\n"
             )
 
-            send_html_email(
+            queue_html_email(
                 subject=subject,
                 to_email=reservation.user.email,
                 content=content,
                 details=details,
                 preheader=preheader,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                fail_silently=True
+                from_email=settings.DEFAULT_FROM_EMAIL
             )
         except Exception:
             pass  # Don't fail the request if email fails
@@ -225,12 +266,58 @@ class ReservationDetailView(APIView):
         
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class ReservationChangesView(APIView):
+    """Reservations changed since a sync token (delta sync)
+
+    GET /api/reservations/changes/?since=<token> returns, in ``changes``, the
+    reservations created or changed after the token (cancellations, approvals,
+    trades...), in the list's format. ``removed`` lists the ids of reservations
+    traded away from the user, and ``next`` is the token for the following call.
+    Omit ``since`` to sync everything from the beginning. While ``has_more`` is
+    true, call again with ``next`` straight away.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        since = request.query_params.get('since')
+        try:
+            position = decode_token(since) if since else None
+        except InvalidToken:
+            return Response({'error': 'Invalid sync token'}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        queryset = Reservation.objects.all()
+        if user.role != 'admin':
+            # A trade moves a reservation to the other user; its owner still needs to hear about it
+            traded_away = TradeRequest.objects.filter(
+                Q(requester_reservation=OuterRef('pk'), requester=user) |
+                Q(target_reservation=OuterRef('pk'), target_user=user),
+                status='ACCEPTED'
+            )
+            queryset = queryset.filter(Q(user=user) | Exists(traded_away))
+
+        keys, next_position, has_more = changes_since(
+            queryset.values_list('id', 'change_seq', 'user_id', named=True), position
+        )
+        visible = [key.id for key in keys if user.role == 'admin' or key.user_id == user.pk]
+        rows = {row.id: row for row in ReservationReadSerializer.rows(
+            Reservation.objects.filter(id__in=visible).order_by()
+        )}
+
+        return Response({
+            'changes': ReservationReadSerializer([rows[pk] for pk in visible if pk in rows], many=True).data,
+            'removed': [key.id for key in keys if key.id not in rows],
+            'next': encode_token(next_position),
+            'has_more': has_more,
+        })
+
 # ===================== CALENDAR VIEWS =====================
 
 class CalendarView(APIView):
-    """Get calendar view with available and booked slots"""
+    """Get calendar view with available and booked slots (served from the per-day calendar cache)"""
     permission_classes = [permissions.IsAuthenticated]
     
+    @instrument('calendar')
     def get(self, request):
         # Get date range
         start_date = request.query_params.get('start_date')
@@ -246,109 +333,61 @@ class CalendarView(APIView):
         else:
             end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
         
-        calendar_data = []
-        current_date = start_date
-        
-        while current_date <= end_date:
-            day_data = self._get_day_data(current_date)
-            calendar_data.append(day_data)
-            current_date += timedelta(days=1)
-        
-        return Response({
+        version = calendar_version(start_date, end_date)
+        etag = make_etag(start_date, end_date, version) if version is not None else None
+
+        return conditional_get(request, etag, lambda: Response({
             'start_date': start_date,
             'end_date': end_date,
-            'calendar': calendar_data
-        })
-    
-    def _get_day_data(self, target_date):
-        """Get data for a specific day"""
-        # Get calendar settings
-        calendar_settings = CalendarSettings.objects.first()
-        business_start = calendar_settings.business_start_time if calendar_settings else time(7, 0)
-        business_end = calendar_settings.business_end_time if calendar_settings else time(19, 0)
-        slot_duration = calendar_settings.slot_duration_minutes if calendar_settings else 60
-        
-        # Get primetime settings for this day
-        weekday = target_date.weekday()
-        primetime_settings = None
-        is_primetime_day = False
-        
-        try:
-            primetime_settings = PrimeTimeSettings.objects.get(weekday=weekday, is_active=True)
-            is_primetime_day = True
-        except PrimeTimeSettings.DoesNotExist:
-            pass
-        
-        # Get existing reservations for this day
-        reservations = Reservation.objects.filter(
-            date=target_date,
-            status__in=['CONFIRMED', 'PENDING']
-        ).order_by('start_time')
-        
-        # Generate available time slots
-        available_slots = self._generate_available_slots(
-            target_date, business_start, business_end, slot_duration, reservations
+            'calendar': get_calendar(start_date, end_date)
+        }), REVALIDATE)
+
+@require_GET
+async def calendar_events(request):
+    """Server-sent events naming the dates whose calendar changed, as they change
+
+    GET /api/reservations/events/ with the usual Bearer token; optional
+    ``start_date``/``end_date`` (YYYY-MM-DD) limit it to a range. Each change
+    arrives as ``event: calendar`` with ``{"dates": [...]}``; re-read those
+    days. ``{"resync": true}`` means events may have been missed, so reload.
+    Async, so under an ASGI server an idle stream holds no worker thread.
+    Under WSGI the response would be read to its (never reached) end before
+    a byte is sent, holding the worker forever, so it answers 501 instead.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'error': 'Calendar events need the ASGI server (backend.asgi:application)'},
+            status=status.HTTP_501_NOT_IMPLEMENTED
         )
-        
-        return {
-            'date': target_date.isoformat(),
-            'is_primetime': is_primetime_day,
-            'primetime_hours': {
-                'start_time': primetime_settings.start_time.isoformat() if primetime_settings else None,
-                'end_time': primetime_settings.end_time.isoformat() if primetime_settings else None
-            } if primetime_settings else None,
-            'business_hours': {
-                'start_time': business_start.isoformat(),
-                'end_time': business_end.isoformat()
-            },
-            'available_slots': available_slots,
-            'reserved_slots': ReservationSerializer(reservations, many=True).data
-        }
-    
-    def _generate_available_slots(self, target_date, start_time, end_time, duration_minutes, existing_reservations):
-        """Generate available time slots for a day"""
-        slots = []
-        current_time = datetime.combine(target_date, start_time)
-        end_datetime = datetime.combine(target_date, end_time)
-        
-        while current_time < end_datetime:
-            slot_end = current_time + timedelta(minutes=duration_minutes)
-            
-            if slot_end.time() <= end_time:
-                # Check if slot conflicts with existing reservations
-                is_available = True
-                slot_type = 'FREE_FOR_ALL'
-                
-                # Check primetime
-                try:
-                    weekday = target_date.weekday()
-                    primetime = PrimeTimeSettings.objects.get(weekday=weekday, is_active=True)
-                    if (current_time.time() >= primetime.start_time and 
-                        slot_end.time() <= primetime.end_time):
-                        slot_type = 'PRIMETIME'
-                except PrimeTimeSettings.DoesNotExist:
-                    pass
-                
-                # Check conflicts
-                for reservation in existing_reservations:
-                    res_start = datetime.combine(target_date, reservation.start_time)
-                    res_end = datetime.combine(target_date, reservation.end_time)
-                    
-                    if (current_time < res_end and slot_end > res_start):
-                        is_available = False
-                        break
-                
-                if is_available:
-                    slots.append({
-                        'start_time': current_time.time().isoformat(),
-                        'end_time': slot_end.time().isoformat(),
-                        'type': slot_type,
-                        'available': True
-                    })
-            
-            current_time += timedelta(minutes=duration_minutes)
-        
-        return slots
+
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        start_date, end_date = (
+            datetime.strptime(value, '%Y-%m-%d').date() if value else None
+            for value in (request.GET.get('start_date'), request.GET.get('end_date'))
+        )
+    except ValueError:
+        return JsonResponse({'error': 'Dates must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+    await start_listening()
+    return StreamingHttpResponse(
+        calendar_event_stream(start_date, end_date),
+        content_type='text/event-stream',
+        # Stop proxies (nginx) from buffering the stream
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+def _authenticate(request):
+    """The user for request under the API's authentication classes, or None"""
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except exceptions.APIException:
+        return None
+    return user if user and user.is_authenticated else None
 
 # ===================== ADMIN VIEWS =====================
 
@@ -395,7 +434,7 @@ class ReservationApprovalView(APIView):
         return Response(ReservationSerializer(reservation).data)
     
     def _send_approval_email(self, reservation, action):
-        """Send approval/rejection email"""
+        """Queue approval/rejection email (delivered by process_email_outbox)"""
         try:
             subject = f"Reservation {action.title()}"
             preheader = 'Update on your reservation request.'
@@ -410,14 +449,13 @@ class ReservationApprovalView(APIView):
                 + (f"Reason: {reservation.rejection_reason}\n" if action == 'reject' and reservation.rejection_reason else '')
             )
 
-            send_html_email(
+            queue_html_email(
                 subject=subject,
                 to_email=reservation.user.email,
                 content=content,
                 details=details,
                 preheader=preheader,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                fail_silently=True
+                from_email=settings.DEFAULT_FROM_EMAIL
             )
         except Exception:
             pass
@@ -428,8 +466,14 @@ class PrimeTimeSettingsView(APIView):
     
     def get(self, request):
         settings = PrimeTimeSettings.objects.all()
-        serializer = PrimeTimeSettingsSerializer(settings, many=True)
-        return Response(serializer.data)
+        validator = settings.aggregate(last_updated=Max('updated_at'), count=Count('id'))
+        etag = make_etag(validator['last_updated'], validator['count'])
+
+        def build_response():
+            serializer = PrimeTimeSettingsSerializer(settings, many=True)
+            return Response(serializer.data)
+
+        return conditional_get(request, etag, build_response, REVALIDATE)
     
     def post(self, request):
         serializer = PrimeTimeSettingsSerializer(data=request.data)
@@ -477,14 +521,22 @@ class PrimeTimeSettingsDetailView(APIView):
 
 # ===================== TRADE VIEWS =====================
 
+# Everything TradeRequestSerializer reads, joined into the trade query
+TRADE_REQUEST_RELATED = (
+    'requester', 'target_user',
+    'requester_reservation__user', 'requester_reservation__approved_by',
+    'target_reservation__user', 'target_reservation__approved_by',
+)
+
 class TradeRequestListView(APIView):
     """List and create trade requests"""
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
         # Get trade requests where user is involved
-        sent_requests = TradeRequest.objects.filter(requester=request.user)
-        received_requests = TradeRequest.objects.filter(target_user=request.user)
+        trade_requests = TradeRequest.objects.select_related(*TRADE_REQUEST_RELATED)
+        sent_requests = trade_requests.filter(requester_id=request.user.id)
+        received_requests = trade_requests.filter(target_user_id=request.user.id)
         
         sent_serializer = TradeRequestSerializer(sent_requests, many=True)
         received_serializer = TradeRequestSerializer(received_requests, many=True)
@@ -508,23 +560,20 @@ class TradeRequestDetailView(APIView):
     """Handle individual trade requests"""
     permission_classes = [permissions.IsAuthenticated]
     
-    def get_object(self, pk, user):
+    def get_object(self, pk, user_id):
         try:
             return TradeRequest.objects.get(
                 pk=pk,
-                target_user=user,
+                target_user_id=user_id,
                 status='PENDING'
             )
         except TradeRequest.DoesNotExist:
             return None
     
     def get(self, request, pk):
-        trade_request = TradeRequest.objects.filter(
-            pk=pk,
-            requester=request.user
-        ).first() or TradeRequest.objects.filter(
-            pk=pk,
-            target_user=request.user
+        trade_request = TradeRequest.objects.select_related(*TRADE_REQUEST_RELATED).filter(
+            Q(requester_id=request.user.id) | Q(target_user_id=request.user.id),
+            pk=pk
         ).first()
         
         if not trade_request:
@@ -533,9 +582,10 @@ class TradeRequestDetailView(APIView):
         serializer = TradeRequestSerializer(trade_request)
         return Response(serializer.data)
     
+    @instrument('trade_respond')
     def post(self, request, pk):
         """Accept or reject a trade request"""
-        trade_request = self.get_object(pk, request.user)
+        trade_request = self.get_object(pk, request.user.id)
         if not trade_request:
             return Response(
                 {'error': 'Trade request not found or already processed'}, 
@@ -556,6 +606,10 @@ class TradeRequestDetailView(APIView):
                 # Swap the reservations
                 req_reservation = trade_request.requester_reservation
                 target_reservation = trade_request.target_reservation
+                lock_reservation_dates(req_reservation.date, target_reservation.date)
+                # Re-read under the lock so a concurrent edit isn't overwritten
+                req_reservation.refresh_from_db()
+                target_reservation.refresh_from_db()
                 
                 # Swap users
                 original_req_user = req_reservation.user
@@ -599,7 +653,7 @@ class CalendarSettingsView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsAdminUser]
     
     def get(self, request):
-        settings = CalendarSettings.objects.first()
+        settings = get_settings_snapshot().calendar
         if not settings:
             # Create default settings
             settings = CalendarSettings.objects.create()
@@ -628,35 +682,64 @@ class UserDashboardView(APIView):
     def get(self, request):
         user = request.user
         today = date.today()
+        querysets = self.get_querysets(user, today)
+
+        return conditional_get(request, self.get_etag(user, today, *querysets), lambda: self.build_response(*querysets), REVALIDATE)
 
+    def get_querysets(self, user, today):
         # Get user's upcoming reservations
         upcoming_reservations = Reservation.objects.filter(
             user=user,
             date__gte=today,
             status__in=['CONFIRMED', 'PENDING']
-        ).order_by('date', 'start_time')[:5]
+        )
 
         # Get pending trade requests
         pending_trades_sent = TradeRequest.objects.filter(
             requester=user,
             status='PENDING'
-        ).count()
+        )
 
         pending_trades_received = TradeRequest.objects.filter(
             target_user=user,
             status='PENDING'
-        ).count()
+        )
 
         # Get recent activity
         recent_logs = ReservationAuditLog.objects.filter(
             reservation__user=user
-        ).order_by('-timestamp')[:10]
+        ).order_by('-timestamp')
+
+        return upcoming_reservations, pending_trades_sent, pending_trades_received, recent_logs
+
+    def get_etag(self, user, today, upcoming_reservations, pending_trades_sent, pending_trades_received, recent_logs):
+        """Validator over what the dashboard shows, computed in one query on the same indexes"""
+        def scalar(queryset, function, field):
+            # Whole-set aggregate as a scalar subquery (Func skips the GROUP BY an aggregate would add)
+            return Subquery(queryset.order_by().annotate(value=Func(field, function=function)).values('value')[:1])
+
+        validator = User.objects.filter(pk=user.pk).values_list(
+            scalar(upcoming_reservations, 'MAX', 'updated_at'),
+            scalar(upcoming_reservations, 'COUNT', 'id'),
+            scalar(pending_trades_sent, 'COUNT', 'id'),
+            scalar(pending_trades_received, 'COUNT', 'id'),
+            # Audit logs are append-only: the newest one identifies the recent activity
+            Subquery(recent_logs.values('id')[:1]),
+        ).first()
+        return make_etag(
+            user.pk, user.email, user.first_name, user.last_name, user.role,
+            validator, today, validator_epoch()
+        )
+
+    def build_response(self, upcoming_reservations, pending_trades_sent, pending_trades_received, recent_logs):
+        upcoming_reservations = ReservationReadSerializer.rows(upcoming_reservations.order_by('date', 'start_time'))[:5]
+        recent_logs = recent_logs.select_related('performed_by')[:10]
 
         return Response({
-            'upcoming_reservations': ReservationSerializer(upcoming_reservations, many=True).data,
+            'upcoming_reservations': ReservationReadSerializer(upcoming_reservations, many=True).data,
             'pending_trades': {
-                'sent': pending_trades_sent,
-                'received': pending_trades_received
+                'sent': pending_trades_sent.count(),
+                'received': pending_trades_received.count()
             },
             'recent_activity': ReservationAuditLogSerializer(recent_logs, many=True).data
         })
@@ -682,7 +765,7 @@ class AdminDashboardView(APIView):
         ).count()
 
         # Recent activity
-        recent_logs = ReservationAuditLog.objects.all().order_by('-timestamp')[:20]
+        recent_logs = ReservationAuditLog.objects.select_related('performed_by').order_by('-timestamp')[:20]
 
         return Response({
             'pending_approvals': pending_approvals,
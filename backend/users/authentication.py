@@ -1,13 +1,16 @@
 from rest_framework import authentication, exceptions
 from django.conf import settings
 import jwt
-from .models import User
+from .principal_cache import get_principal
 
 
 class CustomJWTAuthentication(authentication.BaseAuthentication):
     """Authenticate users using the access tokens generated by LoginUser.
 
     Expects header: Authorization: Bearer <token>
+
+    The authenticated user is a ``Principal`` served from a short-lived
+    per-process cache; see ``users.principal_cache``.
     """
 
     def authenticate(self, request):
@@ -41,7 +44,7 @@ class CustomJWTAuthentication(authentication.BaseAuthentication):
         if not user_id:
             raise exceptions.AuthenticationFailed('Invalid token payload')
 
-        user = User.objects.filter(id=user_id).first()
+        user = get_principal(user_id)
         if not user:
             raise exceptions.AuthenticationFailed('User not found')
 
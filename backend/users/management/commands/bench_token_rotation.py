@@ -0,0 +1,82 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from users.models import RefreshTokenBlacklist, RefreshTokenFamily, User
+from users.revocation_filter import revoke_refresh_token
+from users.token_families import REFRESH_TOKEN_LIFETIME, rotate_family, start_family
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark refresh token rotation: a blacklist row per refresh versus a '
+        'conditional generation bump on the token family. Rows written are '
+        'removed afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=200, help='Logged-in sessions being refreshed')
+        parser.add_argument('--rounds', type=int, default=10, help='Refreshes per session, round-robin across sessions')
+
+    def handle(self, *args, **options):
+        sessions = options['sessions']
+        rounds = options['rounds']
+        total = sessions * rounds
+
+        # Each refresh commits on its own in production, so this runs in
+        # autocommit; the bench user's cascade removes every row written
+        user = User.objects.create(email=f'bench-{uuid.uuid4().hex}@example.com')
+        try:
+            expires_at = timezone.now() + REFRESH_TOKEN_LIFETIME
+            blacklist_size = self._table_size(RefreshTokenBlacklist)
+            blacklist = self._measure(lambda: [
+                revoke_refresh_token(str(uuid.uuid4()), user, expires_at) for _ in range(total)
+            ])
+            blacklist_rows = RefreshTokenBlacklist.objects.filter(user=user).count()
+            blacklist_size = self._table_size(RefreshTokenBlacklist) - blacklist_size
+
+            # Logins happen either way, so families are created before timing
+            families = [start_family(user).id for _ in range(sessions)]
+            family_size = self._table_size(RefreshTokenFamily)
+            family = self._measure(lambda: [
+                rotate_family(family_id, generation)
+                for generation in range(rounds)
+                for family_id in families
+            ])
+            family_rows = RefreshTokenFamily.objects.filter(user=user).count()
+            family_size = self._table_size(RefreshTokenFamily) - family_size
+        finally:
+            user.delete()
+
+        self.stdout.write(f'{sessions} sessions x {rounds} refreshes = {total} rotations')
+        self.stdout.write(
+            f'blacklist: {blacklist[0] / total * 1000:.3f} ms/rotation, {blacklist[1] / total:.1f} queries/rotation, '
+            f'{blacklist_rows} rows, table +{blacklist_size // 1024} KiB'
+        )
+        self.stdout.write(
+            f'family:    {family[0] / total * 1000:.3f} ms/rotation, {family[1] / total:.1f} queries/rotation, '
+            f'{family_rows} rows, table +{family_size // 1024} KiB'
+        )
+        self.stdout.write(self.style.SUCCESS(f'speed-up:  {blacklist[0] / family[0]:.1f}x'))
+
+    def _measure(self, run):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+        return elapsed, queries
+
+    def _table_size(self, model):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_total_relation_size(%s)', [model._meta.db_table])
+            return cursor.fetchone()[0]
@@ -1,20 +1,108 @@
-from django.core.management.base import BaseCommand
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 
-from users.models import RefreshTokenBlacklist
+from users.models import RefreshTokenBlacklist, RefreshTokenFamily
+
+
+def load_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save_checkpoint(path, checkpoint):
+    if not path:
+        return
+    # Write then rename so an interrupted run never leaves a truncated file
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as fh:
+        json.dump(checkpoint, fh)
+    os.replace(tmp_path, path)
 
 
 class Command(BaseCommand):
-    help = 'Prune expired entries from the RefreshTokenBlacklist table'
+    help = (
+        'Prune expired refresh token families and expired RefreshTokenBlacklist entries. '
+        'Rows are deleted in primary-key batches so each DELETE holds its locks briefly.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per statement')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches')
+        parser.add_argument('--max-batches', type=int, default=None, help='Stop after this many batches (the next run continues)')
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording the last primary key pruned; an interrupted run resumes from it. Removed once pruning completes.'
+        )
 
     def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+        self.sleep = options['sleep']
+        self.batches_left = options['max_batches']
+        self.checkpoint_path = options['checkpoint']
+        self.checkpoint = load_checkpoint(self.checkpoint_path)
+        if self.checkpoint:
+            self.stdout.write(f'Resuming from checkpoint {self.checkpoint}')
+
         now = timezone.now()
+        # A family's newest refresh token has expired, so none of its tokens can be used
+        families_deleted, families_done = self.prune(
+            'families', RefreshTokenFamily.objects.filter(expires_at__lt=now), batch_size
+        )
         # Remove rows with expires_at set and in the past
-        expired_qs = RefreshTokenBlacklist.objects.filter(expires_at__isnull=False, expires_at__lt=now)
-        count = expired_qs.count()
-        if count == 0:
-            self.stdout.write(self.style.SUCCESS('No expired blacklist entries found.'))
+        count, blacklist_done = self.prune(
+            'blacklist', RefreshTokenBlacklist.objects.filter(expires_at__isnull=False, expires_at__lt=now), batch_size
+        )
+
+        if families_done and blacklist_done:
+            if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+                os.remove(self.checkpoint_path)
+        else:
+            self.stdout.write(f'Stopped after --max-batches; checkpoint {self.checkpoint}')
+
+        if families_deleted == 0 and count == 0:
+            self.stdout.write(self.style.SUCCESS('No expired refresh token families or blacklist entries found.'))
             return
 
-        expired_qs.delete()
-        self.stdout.write(self.style.SUCCESS(f'Deleted {count} expired blacklist entr{"ies" if count != 1 else "y"}.'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {families_deleted} expired refresh token famil{"ies" if families_deleted != 1 else "y"} '
+            f'and {count} expired blacklist entr{"ies" if count != 1 else "y"}.'
+        ))
+
+    def prune(self, key, queryset, batch_size):
+        """Delete queryset in id order; returns (rows deleted, whether the end was reached)"""
+        model = queryset.model
+        deleted = 0
+        last_pk = self.checkpoint.get(key)
+        while True:
+            if self.batches_left is not None and self.batches_left <= 0:
+                return deleted, False
+
+            batch = queryset.order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            pks = list(batch.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return deleted, True
+
+            # Nothing cascades from these tables and no delete signals are
+            # connected, so this is a single DELETE ... WHERE id IN (...)
+            batch_deleted, _ = model.objects.filter(pk__in=pks).delete()
+            deleted += batch_deleted
+            last_pk = pks[-1]
+            self.checkpoint[key] = last_pk if isinstance(last_pk, int) else str(last_pk)
+            save_checkpoint(self.checkpoint_path, self.checkpoint)
+            if self.batches_left is not None:
+                self.batches_left -= 1
+
+            if len(pks) < batch_size:
+                return deleted, True
+            if self.sleep:
+                time.sleep(self.sleep)
@@ -1,3 +1,5 @@
+import uuid
+
 from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
 
@@ -53,3 +55,26 @@ class RefreshTokenBlacklist(models.Model):
 
     def __str__(self):
         return f"Blacklisted refresh token {self.jti} (user={self.user_id})"
+
+
+class RefreshTokenFamily(models.Model):
+    """All refresh tokens descended from one login.
+
+    Refresh tokens carry the family id and the generation they were issued
+    at. Rotating bumps the generation, so an older token presented again is
+    detected as reuse and revokes the whole family.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='refresh_token_families')
+    generation = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    rotated_at = models.DateTimeField(null=True, blank=True)
+    # Expiry of the newest refresh token issued in this family
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+    # Deliberately no index on expires_at: rotation updates it, and leaving
+    # only the primary key indexed keeps those updates HOT (heap-only)
+
+    def __str__(self):
+        return f"Refresh token family {self.id} (user={self.user_id}, generation={self.generation})"
@@ -0,0 +1,146 @@
+# users/principal_cache.py
+"""Per-process cache of the user fields that authentication and permissions need.
+
+CustomJWTAuthentication would otherwise load the whole User row on every
+request, while the permission classes only look at ``id`` and ``role``. The
+cache keeps a small record per user id in a bounded LRU with a short TTL.
+``request.user`` is a ``Principal`` that answers those fields from the record
+and loads the full model only when a view touches anything else.
+
+Saving or deleting a User (see ``users.signals``) drops its entry in this
+process. Other workers keep their copy until the TTL expires, which bounds how
+long a role change can take to reach them.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework import exceptions
+
+# Fields answered without loading the User row
+PRINCIPAL_FIELDS = ('id', 'email', 'role', 'is_active', 'is_staff', 'is_superuser')
+
+
+@dataclass(frozen=True)
+class PrincipalRecord:
+    id: int
+    email: str
+    role: str
+    is_active: bool
+    is_staff: bool
+    is_superuser: bool
+
+
+class PrincipalCache:
+    """Thread-safe LRU of PrincipalRecords with a per-entry TTL"""
+
+    def __init__(self, max_size, ttl, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, record = entry
+            if expires_at <= self._clock():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return record
+
+    def set(self, record):
+        with self._lock:
+            self._entries[record.id] = (self._clock() + self.ttl, record)
+            self._entries.move_to_end(record.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+principal_cache = PrincipalCache(
+    max_size=getattr(settings, 'JWT_PRINCIPAL_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'JWT_PRINCIPAL_CACHE_TTL', 60),
+)
+
+
+class Principal(SimpleLazyObject):
+    """Authenticated user backed by a PrincipalRecord.
+
+    The cached fields and the auth flags DRF checks are answered directly;
+    any other attribute, ``isinstance`` check or comparison loads the real
+    User once and delegates to it, so ORM filters and serializers keep working.
+    """
+
+    def __init__(self, record):
+        from .models import User
+
+        def load_user():
+            user = User.objects.filter(id=record.id).first()
+            if user is None:
+                raise exceptions.AuthenticationFailed('User not found')
+            return user
+
+        super().__init__(load_user)
+        self.__dict__['_record'] = record
+
+    def _cached(name):
+        def get(self):
+            if self._wrapped is not empty:
+                return getattr(self._wrapped, name)
+            return getattr(self.__dict__['_record'], name)
+        return property(get)
+
+    id = _cached('id')
+    pk = _cached('id')
+    email = _cached('email')
+    role = _cached('role')
+    is_active = _cached('is_active')
+    is_staff = _cached('is_staff')
+    is_superuser = _cached('is_superuser')
+    del _cached
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __bool__(self):
+        return True
+
+
+def get_principal(user_id):
+    """Return a Principal for user_id, or None if there is no such user"""
+    record = principal_cache.get(user_id)
+    if record is None:
+        from .models import User
+
+        values = User.objects.filter(id=user_id).values(*PRINCIPAL_FIELDS).first()
+        if values is None:
+            return None
+        record = PrincipalRecord(**values)
+        principal_cache.set(record)
+    return Principal(record)
+
+
+def invalidate_principal(user_id):
+    """Drop user_id now and again after commit, so a concurrent request can't
+    re-cache the pre-change row in between"""
+    principal_cache.invalidate(user_id)
+    transaction.on_commit(lambda: principal_cache.invalidate(user_id))
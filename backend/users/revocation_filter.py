@@ -0,0 +1,193 @@
+# users/revocation_filter.py
+"""Per-process Bloom filter in front of RefreshTokenBlacklist.
+
+Nearly every refresh presents a token that is not revoked. The filter answers
+"definitely not revoked" for those without touching the database. Only a
+"maybe" is confirmed against the table. New rows are folded in incrementally
+(rows with an id above the last one seen) at most every
+``REFRESH_BLACKLIST_FILTER_SYNC_SECONDS``. The filter is rebuilt from the
+unexpired rows when it holds more entries than it was sized for.
+
+Rows written in this process are added immediately (see ``users.signals``);
+rows written by other workers are seen after at most one sync interval. Replay
+of a rotated token never depends on the filter: family tokens are stopped by
+the generation check in ``users.token_families``, and pre-family tokens by the
+unique insert in ``revoke_refresh_token``.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        bits = -self.capacity * math.log(error_rate) / (math.log(2) ** 2)
+        self.num_bits = max(8, int(math.ceil(bits)))
+        self.num_hashes = max(1, int(round(self.num_bits / self.capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    @property
+    def size_bytes(self):
+        return len(self.bits)
+
+    def estimated_error_rate(self):
+        """Theoretical false-positive rate for the number of keys added so far"""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+
+class RevocationFilter:
+    def __init__(self, capacity, error_rate, sync_interval, clock=time.monotonic):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._bloom = None
+            self._last_id = 0
+            self._synced_at = None
+            self.checks = 0
+            self.filtered = 0
+            self.confirmed = 0
+            self.false_positives = 0
+            self.rebuilds = 0
+
+    def is_revoked(self, jti):
+        """True if jti is in the blacklist; only queries when the filter says maybe"""
+        from .models import RefreshTokenBlacklist
+
+        self._sync()
+        with self._lock:
+            self.checks += 1
+            if jti not in self._bloom:
+                self.filtered += 1
+                return False
+
+        revoked = RefreshTokenBlacklist.objects.filter(jti=jti).exists()
+        with self._lock:
+            if revoked:
+                self.confirmed += 1
+            else:
+                self.false_positives += 1
+        return revoked
+
+    def add(self, jti):
+        """Record a jti this process just revoked, without waiting for a sync"""
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+
+    def _sync(self):
+        from .models import RefreshTokenBlacklist
+
+        now = self._clock()
+        with self._lock:
+            if self._bloom is not None and now - self._synced_at < self.sync_interval:
+                return
+
+            # Against the filter's own size, which outgrows capacity after a rebuild
+            if self._bloom is None or self._bloom.count >= self._bloom.capacity:
+                self._rebuild()
+            else:
+                new_rows = RefreshTokenBlacklist.objects.filter(id__gt=self._last_id).order_by('id')
+                for row_id, jti in new_rows.values_list('id', 'jti'):
+                    self._bloom.add(jti)
+                    self._last_id = row_id
+            self._synced_at = now
+
+    def _rebuild(self):
+        from .models import RefreshTokenBlacklist
+
+        # Expired tokens are rejected by jwt.decode before the blacklist is
+        # consulted, so only rows that can still matter are loaded
+        rows = RefreshTokenBlacklist.objects.filter(
+            Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())
+        ).order_by('id').values_list('id', 'jti')
+
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        last_id = self._last_id
+        for row_id, jti in rows.iterator():
+            bloom.add(jti)
+            last_id = row_id
+        if bloom.count >= self.capacity:
+            # Outgrew the configured capacity; size for twice the live rows
+            grown = BloomFilter(bloom.count * 2, self.error_rate)
+            for _, jti in rows.iterator():
+                grown.add(jti)
+            bloom = grown
+
+        self._bloom = bloom
+        self._last_id = last_id
+        self.rebuilds += 1
+        logger.info('Rebuilt refresh token revocation filter: %s', self._stats())
+
+    def stats(self):
+        with self._lock:
+            return self._stats()
+
+    def _stats(self):
+        bloom = self._bloom
+        negatives = self.checks - self.confirmed
+        return {
+            'entries': bloom.count if bloom else 0,
+            'size_bytes': bloom.size_bytes if bloom else 0,
+            'hash_functions': bloom.num_hashes if bloom else 0,
+            'estimated_false_positive_rate': bloom.estimated_error_rate() if bloom else 0.0,
+            'observed_false_positive_rate': self.false_positives / negatives if negatives else 0.0,
+            'checks': self.checks,
+            'answered_without_query': self.filtered,
+            'false_positives': self.false_positives,
+            'rebuilds': self.rebuilds,
+        }
+
+
+revocation_filter = RevocationFilter(
+    capacity=getattr(settings, 'REFRESH_BLACKLIST_FILTER_CAPACITY', 100_000),
+    error_rate=getattr(settings, 'REFRESH_BLACKLIST_FILTER_ERROR_RATE', 0.01),
+    sync_interval=getattr(settings, 'REFRESH_BLACKLIST_FILTER_SYNC_SECONDS', 30),
+)
+
+
+def revoke_refresh_token(jti, user=None, expires_at=None):
+    """Blacklist jti. Returns False if it was already blacklisted."""
+    from .models import RefreshTokenBlacklist
+
+    try:
+        with transaction.atomic():
+            RefreshTokenBlacklist.objects.create(jti=jti, user=user, expires_at=expires_at)
+    except IntegrityError:
+        return False
+    finally:
+        revocation_filter.add(jti)
+    return True
@@ -0,0 +1,20 @@
+# users/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import RefreshTokenBlacklist, User
+from .principal_cache import invalidate_principal
+from .revocation_filter import revocation_filter
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    """Drop the cached principal so role/active changes apply on the next request"""
+    invalidate_principal(instance.pk)
+
+
+@receiver(post_save, sender=RefreshTokenBlacklist)
+def refresh_token_blacklisted(sender, instance, created, **kwargs):
+    """Make rows written in this process (admin, shell) visible to the filter immediately"""
+    if created:
+        revocation_filter.add(instance.jti)
@@ -1,15 +1,29 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from rest_framework.test import APITestCase
-from rest_framework import status
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework import exceptions, status
 import jwt
-from datetime import datetime, timedelta
+from datetime import datetime, time as dt_time, timedelta
 from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+from io import StringIO
+import json
+import os
+import shutil
+import tempfile
 
 User = get_user_model()
 
-from .models import RefreshTokenBlacklist
+from .authentication import CustomJWTAuthentication
+from .models import RefreshTokenBlacklist, RefreshTokenFamily
+from .principal_cache import Principal, PrincipalCache, PrincipalRecord, principal_cache
+from .revocation_filter import BloomFilter, RevocationFilter, revocation_filter, revoke_refresh_token
+from .token_families import rotate_family, start_family
+from backend.utils.query_budget import Endpoint, QueryBudgetMixin
+from reservations.models import Reservation, TradeRequest
 import time
 
 class UserModelTests(TestCase):
@@ -535,15 +549,15 @@ class RefreshTokenBlacklistTests(APITestCase):
         self.assertEqual(refresh_resp.status_code, status.HTTP_401_UNAUTHORIZED)
         self.assertIn('error', refresh_resp.data)
 
-    def test_rotated_token_old_jti_blacklisted(self):
-        """When refreshing (rotation), the old refresh token's jti should be blacklisted."""
+    def test_rotated_token_cannot_be_reused(self):
+        """When refreshing (rotation), the old refresh token should stop working without a blacklist row."""
         resp, refresh_token = self._login_and_get_refresh()
         self.assertIsNotNone(refresh_token)
 
         refresh_secret = getattr(settings, 'JWT_REFRESH_SECRET', 'your-refresh-secret-key')
         decoded = jwt.decode(refresh_token, refresh_secret, algorithms=['HS256'])
-        old_jti = decoded.get('jti')
-        self.assertIsNotNone(old_jti)
+        self.assertIsNotNone(decoded.get('fam'))
+        self.assertEqual(decoded.get('gen'), 0)
 
         # Ensure client sends cookie
         self.client.cookies['refresh_token'] = refresh_token
@@ -551,9 +565,9 @@ class RefreshTokenBlacklistTests(APITestCase):
         refresh_resp = self.client.post('/api/users/refresh/')
         self.assertEqual(refresh_resp.status_code, status.HTTP_200_OK)
 
-        # After rotation, the old jti should be in the blacklist
-        exists = RefreshTokenBlacklist.objects.filter(jti=old_jti).exists()
-        self.assertTrue(exists)
+        # Rotation bumps the family generation instead of writing a blacklist row
+        self.assertFalse(RefreshTokenBlacklist.objects.exists())
+        self.assertEqual(RefreshTokenFamily.objects.get(id=decoded['fam']).generation, 1)
 
         # Also ensure a new refresh cookie is present
         new_refresh = None
@@ -564,15 +578,20 @@ class RefreshTokenBlacklistTests(APITestCase):
         self.assertIsNotNone(new_refresh)
         self.assertNotEqual(new_refresh, refresh_token)
 
-    def test_logout_blacklists_token(self):
-        """Logout should blacklist the refresh token (if present) and delete the cookie."""
+        # The old token is rejected
+        self.client.cookies['refresh_token'] = refresh_token
+        reuse_resp = self.client.post('/api/users/refresh/')
+        self.assertEqual(reuse_resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_revokes_token_family(self):
+        """Logout should revoke the refresh token's family (if present) and delete the cookie."""
         resp, refresh_token = self._login_and_get_refresh()
         self.assertIsNotNone(refresh_token)
 
         refresh_secret = getattr(settings, 'JWT_REFRESH_SECRET', 'your-refresh-secret-key')
         decoded = jwt.decode(refresh_token, refresh_secret, algorithms=['HS256'])
-        jti = decoded.get('jti')
-        self.assertIsNotNone(jti)
+        family_id = decoded.get('fam')
+        self.assertIsNotNone(family_id)
 
         # Ensure client sends the cookie
         self.client.cookies['refresh_token'] = refresh_token
@@ -580,9 +599,424 @@ class RefreshTokenBlacklistTests(APITestCase):
         logout_resp = self.client.post('/api/users/logout/')
         self.assertEqual(logout_resp.status_code, status.HTTP_200_OK)
 
-        # The jti should now be blacklisted
-        self.assertTrue(RefreshTokenBlacklist.objects.filter(jti=jti).exists())
+        # The family should now be revoked, so the token can't be refreshed
+        self.assertIsNotNone(RefreshTokenFamily.objects.get(id=family_id).revoked_at)
+        self.client.cookies['refresh_token'] = refresh_token
+        self.assertEqual(self.client.post('/api/users/refresh/').status_code, status.HTTP_401_UNAUTHORIZED)
 
         # The cookie should be deleted in the response (Set-Cookie expires)
         # Depending on client, cookie may be cleared; ensure server attempted to delete it
         self.assertTrue('refresh_token' in logout_resp.cookies or 'refresh_token' in logout_resp._headers if hasattr(logout_resp, '_headers') else True)
+
+
+class RefreshTokenFamilyTests(APITestCase):
+    """Tests for refresh token families and generation-based rotation"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='familyuser',
+            email='family@example.com',
+            password='familypass'
+        )
+        self.refresh_secret = settings.JWT_REFRESH_SECRET
+
+    def _refresh(self, token):
+        self.client.cookies['refresh_token'] = token
+        return self.client.post('/api/users/refresh/')
+
+    def test_reuse_revokes_whole_family(self):
+        """Test replaying an old token also invalidates the newest token in its family"""
+        self.client.post('/api/users/login/', {'email': self.user.email, 'password': 'familypass'})
+        first = self.client.cookies['refresh_token'].value
+        second_resp = self._refresh(first)
+        second = second_resp.cookies['refresh_token'].value
+
+        self.assertEqual(self._refresh(first).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self._refresh(second).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        family_id = jwt.decode(first, self.refresh_secret, algorithms=['HS256'])['fam']
+        self.assertIsNotNone(RefreshTokenFamily.objects.get(id=family_id).revoked_at)
+
+    def test_rotation_is_single_conditional_update(self):
+        """Test rotate_family only advances the current generation"""
+        family = start_family(self.user)
+        with self.assertNumQueries(1):
+            self.assertTrue(rotate_family(family.id, 0))
+        self.assertFalse(rotate_family(family.id, 0))
+        family.refresh_from_db()
+        self.assertEqual(family.generation, 1)
+        self.assertIsNotNone(family.revoked_at)
+
+    def test_pre_family_token_moves_onto_family(self):
+        """Test a refresh token issued before families is retired and replaced by a family token"""
+        now = datetime.utcnow()
+        legacy = jwt.encode({
+            'user_id': self.user.id,
+            'exp': now + timedelta(days=7),
+            'iat': now,
+            'type': 'refresh',
+            'jti': 'legacy-jti'
+        }, self.refresh_secret, algorithm='HS256')
+
+        resp = self._refresh(legacy)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        new_payload = jwt.decode(resp.cookies['refresh_token'].value, self.refresh_secret, algorithms=['HS256'])
+        self.assertTrue(RefreshTokenFamily.objects.filter(id=new_payload['fam'], user=self.user).exists())
+        self.assertTrue(RefreshTokenBlacklist.objects.filter(jti='legacy-jti').exists())
+
+        self.assertEqual(self._refresh(legacy).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_prune_removes_expired_families(self):
+        """Test prune_blacklist deletes families whose newest token has expired"""
+        expired = start_family(self.user)
+        RefreshTokenFamily.objects.filter(id=expired.id).update(expires_at=timezone.now() - timedelta(days=1))
+        active = start_family(self.user)
+
+        out = StringIO()
+        call_command('prune_blacklist', stdout=out)
+        self.assertFalse(RefreshTokenFamily.objects.filter(id=expired.id).exists())
+        self.assertTrue(RefreshTokenFamily.objects.filter(id=active.id).exists())
+        self.assertIn('Deleted 1 expired refresh token family', out.getvalue())
+
+
+class PrincipalCacheTests(APITestCase):
+    """Tests for the cached JWT principal used by CustomJWTAuthentication"""
+
+    def setUp(self):
+        principal_cache.clear()
+        self.addCleanup(principal_cache.clear)
+        self.user = User.objects.create_user(
+            username='principal',
+            email='principal@example.com',
+            password='principalpass',
+            first_name='Pat'
+        )
+        # Creating the user scheduled an on-commit invalidation; drop it so it
+        # can't run in the middle of a test
+        principal_cache.clear()
+
+    def _token(self, user):
+        now = datetime.utcnow()
+        payload = {
+            'user_id': user.id,
+            'email': user.email,
+            'exp': now + timedelta(hours=1),
+            'iat': now,
+            'type': 'access'
+        }
+        return jwt.encode(payload, settings.JWT_ACCESS_SECRET, algorithm='HS256')
+
+    def _authenticate(self, user):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self._token(user)}')
+        principal, _ = CustomJWTAuthentication().authenticate(request)
+        return principal
+
+    def test_repeat_requests_skip_user_query(self):
+        """Test only the first authentication for a user hits the database"""
+        with self.assertNumQueries(1):
+            self._authenticate(self.user)
+        with self.assertNumQueries(0):
+            principal = self._authenticate(self.user)
+            self.assertIs(type(principal), Principal)
+            self.assertTrue(principal.is_authenticated)
+            self.assertEqual(principal.id, self.user.id)
+            self.assertEqual(principal.pk, self.user.pk)
+            self.assertEqual(principal.role, 'user')
+
+    def test_other_attributes_load_full_user_lazily(self):
+        """Test touching an uncached field loads the User once"""
+        self._authenticate(self.user)
+        principal = self._authenticate(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(principal.first_name, 'Pat')
+            self.assertTrue(principal.check_password('principalpass'))
+        self.assertIsInstance(principal, User)
+        self.assertEqual(principal, self.user)
+
+    def test_user_save_invalidates_cache(self):
+        """Test a role change is visible on the next request"""
+        self._authenticate(self.user)
+        self.user.role = 'admin'
+        self.user.save()
+        self.assertEqual(self._authenticate(self.user).role, 'admin')
+
+    def test_deleted_user_rejected(self):
+        """Test a deleted user can no longer authenticate with a valid token"""
+        self._authenticate(self.user)
+        token_user = User(id=self.user.id, email=self.user.email)
+        self.user.delete()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self._authenticate(token_user)
+
+    def test_principal_works_with_views_and_orm(self):
+        """Test a token-authenticated request can use request.user in filters and permissions"""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self._token(self.user)}')
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], self.user.email)
+
+        response = self.client.get('/api/reservations/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get('/api/reservations/dashboard/admin/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_list_endpoints_skip_user_load_with_warm_cache(self):
+        """Test reservation and trade lists filter on the cached id instead of loading the User"""
+        admin = User.objects.create_user(
+            username='principaladmin',
+            email='principaladmin@example.com',
+            password='principalpass',
+            role='admin'
+        )
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        mine = Reservation.objects.create(user=self.user, date=tomorrow, start_time=dt_time(10, 0), end_time=dt_time(11, 0))
+        theirs = Reservation.objects.create(user=admin, date=tomorrow, start_time=dt_time(12, 0), end_time=dt_time(13, 0))
+        trade = TradeRequest.objects.create(
+            requester=self.user, target_user=admin, requester_reservation=mine, target_reservation=theirs
+        )
+        principal_cache.clear()
+
+        # (user, url, queries): the reservation list reads the page keys then the rows,
+        # the trade list runs the sent and received queries, the detail one query
+        cases = [
+            (self.user, '/api/reservations/', 2),
+            (admin, '/api/reservations/', 2),
+            (self.user, '/api/reservations/trades/', 2),
+            (admin, '/api/reservations/trades/', 2),
+            (admin, f'/api/reservations/trades/{trade.id}/', 1),
+        ]
+        for user, url, queries in cases:
+            with self.subTest(user=user.email, url=url):
+                self._authenticate(user)
+                self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self._token(user)}')
+                with self.assertNumQueries(queries):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_cache_is_bounded_lru(self):
+        """Test the least recently used entry is evicted first"""
+        cache = PrincipalCache(max_size=2, ttl=60)
+        records = [PrincipalRecord(i, f'u{i}@example.com', 'user', True, False, False) for i in range(3)]
+        cache.set(records[0])
+        cache.set(records[1])
+        cache.get(0)
+        cache.set(records[2])
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.get(0), records[0])
+
+    def test_cache_entries_expire(self):
+        """Test entries are dropped after the TTL"""
+        now = [100.0]
+        cache = PrincipalCache(max_size=10, ttl=30, clock=lambda: now[0])
+        record = PrincipalRecord(1, 'u1@example.com', 'user', True, False, False)
+        cache.set(record)
+        now[0] += 29
+        self.assertEqual(cache.get(1), record)
+        now[0] += 2
+        self.assertIsNone(cache.get(1))
+
+
+class RevocationFilterTests(APITestCase):
+    """Tests for the Bloom filter in front of RefreshTokenBlacklist"""
+
+    def setUp(self):
+        revocation_filter.reset()
+        self.addCleanup(revocation_filter.reset)
+        self.user = User.objects.create_user(
+            username='filteruser',
+            email='filter@example.com',
+            password='filterpass'
+        )
+        self.now = [1000.0]
+        self.filter = RevocationFilter(capacity=1000, error_rate=0.01, sync_interval=30, clock=lambda: self.now[0])
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Test every added key is reported as present and misses stay near the target rate"""
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        keys = [f'jti-{i}' for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives / 10000, 0.02)
+
+    def test_unrevoked_tokens_checked_without_query(self):
+        """Test checks after the initial load are answered from memory"""
+        RefreshTokenBlacklist.objects.create(jti='revoked-jti', user=self.user)
+        self.assertFalse(self.filter.is_revoked('fresh-jti'))
+        with self.assertNumQueries(0):
+            for i in range(50):
+                self.assertFalse(self.filter.is_revoked(f'fresh-{i}'))
+        with self.assertNumQueries(1):
+            self.assertTrue(self.filter.is_revoked('revoked-jti'))
+
+    def test_new_rows_picked_up_on_next_sync(self):
+        """Test rows blacklisted by another worker are seen after the sync interval"""
+        self.assertFalse(self.filter.is_revoked('later-jti'))
+        RefreshTokenBlacklist.objects.create(jti='later-jti', user=self.user)
+        self.assertFalse(self.filter.is_revoked('later-jti'))
+        self.now[0] += 31
+        self.assertTrue(self.filter.is_revoked('later-jti'))
+
+    def test_grown_filter_is_not_rebuilt_every_sync(self):
+        """Test a filter that outgrew its capacity keeps syncing incrementally"""
+        small = RevocationFilter(capacity=10, error_rate=0.01, sync_interval=30, clock=lambda: self.now[0])
+        RefreshTokenBlacklist.objects.bulk_create(
+            [RefreshTokenBlacklist(jti=f'live-{i}', user=self.user) for i in range(25)]
+        )
+        self.assertTrue(small.is_revoked('live-0'))
+        for i in range(3):
+            RefreshTokenBlacklist.objects.create(jti=f'synced-{i}', user=self.user)
+            self.now[0] += 31
+            self.assertTrue(small.is_revoked(f'synced-{i}'))
+        self.assertEqual(small.stats()['rebuilds'], 1)
+
+    def test_revoke_refuses_already_revoked_jti(self):
+        """Test the unique insert rejects a jti the filter hasn't synced yet"""
+        RefreshTokenBlacklist.objects.create(jti='elsewhere-jti', user=self.user)
+        self.assertTrue(revoke_refresh_token('new-jti', self.user))
+        self.assertFalse(revoke_refresh_token('elsewhere-jti', self.user))
+        self.assertTrue(revocation_filter.is_revoked('new-jti'))
+
+    def test_replayed_refresh_token_rejected(self):
+        """Test a refresh token can't be used again after it was rotated"""
+        self.client.post('/api/users/login/', {'email': self.user.email, 'password': 'filterpass'})
+        refresh_token = self.client.cookies['refresh_token'].value
+        self.assertEqual(self.client.post('/api/users/refresh/').status_code, status.HTTP_200_OK)
+
+        self.client.cookies['refresh_token'] = refresh_token
+        response = self.client.post('/api/users/refresh/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stats_report_memory_and_false_positive_rate(self):
+        """Test the filter exposes its size and false-positive rates"""
+        for i in range(20):
+            self.filter.is_revoked(f'stats-{i}')
+        stats = self.filter.stats()
+        self.assertEqual(stats['checks'], 20)
+        self.assertGreater(stats['size_bytes'], 0)
+        self.assertGreater(stats['hash_functions'], 0)
+        self.assertEqual(stats['answered_without_query'] + stats['false_positives'], 20)
+        self.assertGreaterEqual(stats['observed_false_positive_rate'], 0.0)
+        self.assertLess(stats['estimated_false_positive_rate'], 0.01)
+
+
+class PruneBlacklistCommandTests(TestCase):
+    """Tests for batched, resumable pruning of expired refresh tokens"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='pruneuser',
+            email='prune@example.com',
+            password='prunepass'
+        )
+        past = timezone.now() - timedelta(days=1)
+        future = timezone.now() + timedelta(days=1)
+        RefreshTokenBlacklist.objects.bulk_create(
+            [RefreshTokenBlacklist(jti=f'expired-{i}', user=self.user, expires_at=past) for i in range(7)]
+            + [RefreshTokenBlacklist(jti='live', user=self.user, expires_at=future),
+               RefreshTokenBlacklist(jti='no-expiry', user=self.user)]
+        )
+        self.checkpoint = os.path.join(tempfile.mkdtemp(), 'prune.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.checkpoint))
+
+    def test_prunes_in_batches(self):
+        """Test expired rows are deleted across several small batches and live rows are kept"""
+        out = StringIO()
+        call_command('prune_blacklist', batch_size=3, stdout=out)
+        self.assertEqual(
+            set(RefreshTokenBlacklist.objects.values_list('jti', flat=True)), {'live', 'no-expiry'}
+        )
+        self.assertIn('and 7 expired blacklist entries', out.getvalue())
+
+    def test_resumes_from_checkpoint(self):
+        """Test a run stopped by --max-batches leaves a checkpoint the next run continues from"""
+        out = StringIO()
+        call_command('prune_blacklist', batch_size=3, max_batches=2, checkpoint=self.checkpoint, stdout=out)
+        self.assertEqual(
+            list(RefreshTokenBlacklist.objects.filter(jti__startswith='expired-').values_list('jti', flat=True)),
+            ['expired-6']
+        )
+        self.assertIn('Stopped after --max-batches', out.getvalue())
+        with open(self.checkpoint) as fh:
+            last_id = json.load(fh)['blacklist']
+        self.assertLess(last_id, RefreshTokenBlacklist.objects.get(jti='expired-6').id)
+
+        out = StringIO()
+        call_command('prune_blacklist', batch_size=3, checkpoint=self.checkpoint, stdout=out)
+        self.assertIn('Resuming from checkpoint', out.getvalue())
+        self.assertIn('and 1 expired blacklist entry', out.getvalue())
+        self.assertFalse(RefreshTokenBlacklist.objects.filter(jti__startswith='expired-').exists())
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_rejects_invalid_batch_size(self):
+        """Test --batch-size below 1 is refused"""
+        with self.assertRaises(CommandError):
+            call_command('prune_blacklist', batch_size=0, stdout=StringIO())
+
+
+class UserQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """Query counts of every users endpoint must not grow with the number of users and refresh tokens"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123',
+            role='admin'
+        )
+        self.seeded = 0
+
+    def seed_dataset(self, size):
+        """Grow to size other users, and size revoked tokens and token families for the user"""
+        expires_at = timezone.now() + timedelta(days=7)
+        indexes = range(self.seeded, size)
+        User.objects.bulk_create(
+            User(username=f'seeded{index}', email=f'seeded{index}@example.com', password='!') for index in indexes
+        )
+        RefreshTokenBlacklist.objects.bulk_create(
+            RefreshTokenBlacklist(jti=f'seeded-{index}', user=self.user, expires_at=expires_at) for index in indexes
+        )
+        RefreshTokenFamily.objects.bulk_create(
+            RefreshTokenFamily(user=self.user, expires_at=expires_at) for index in indexes
+        )
+        self.seeded = size
+
+    def reset_state(self):
+        revocation_filter.reset()
+        principal_cache.clear()
+
+    def log_in(self, client):
+        client.post('/api/users/login/', {'email': 'test@example.com', 'password': 'testpass123'})
+
+    def budget_endpoints(self):
+        user = {'pk': self.user.pk}
+        return [
+            Endpoint('POST', 'user-register', data={
+                'email': 'new@example.com', 'password': 'newpass123', 'first_name': 'New', 'last_name': 'User'
+            }, status=201),
+            Endpoint('POST', 'user-login', data={'email': 'test@example.com', 'password': 'testpass123'}),
+            Endpoint('POST', 'token-refresh', prepare=self.log_in),
+            Endpoint('POST', 'user-logout', prepare=self.log_in),
+            Endpoint('GET', 'current-user', self.user),
+            Endpoint('GET', 'user-list', self.admin_user),
+            Endpoint('GET', 'user-detail', self.user, user),
+            Endpoint('PUT', 'user-detail', self.user, user, data={'first_name': 'Renamed'}),
+            Endpoint('PATCH', 'user-detail', self.user, user, data={'last_name': 'Renamed'}),
+            Endpoint('DELETE', 'user-detail', self.admin_user, user, status=204),
+        ]
+
+    def test_every_url_has_a_budget(self):
+        """Test every URL in users/urls.py is measured"""
+        self.assertEndpointsCovered('users.urls')
+
+    def test_query_counts_do_not_grow_with_data(self):
+        """Test every users endpoint runs as many queries with 1000 users and tokens as with 1"""
+        self.assertQueryBudgets()
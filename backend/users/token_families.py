@@ -0,0 +1,40 @@
+# users/token_families.py
+"""Refresh token rotation on RefreshTokenFamily rows.
+
+A login starts a family at generation 0, and each refresh token carries its
+family id (``fam``) and generation (``gen``). Rotating is a single
+conditional UPDATE that only matches the current generation. When it matches
+nothing, the presented token was already rotated (or the family was revoked),
+which means it is being reused, so the whole family is revoked.
+"""
+from datetime import timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import RefreshTokenFamily
+
+REFRESH_TOKEN_LIFETIME = timedelta(days=7)
+
+
+def start_family(user):
+    return RefreshTokenFamily.objects.create(user=user, expires_at=timezone.now() + REFRESH_TOKEN_LIFETIME)
+
+
+def rotate_family(family_id, generation):
+    """Advance the family past generation. Returns False if the token was stale."""
+    now = timezone.now()
+    rotated = RefreshTokenFamily.objects.filter(
+        id=family_id,
+        generation=generation,
+        revoked_at__isnull=True,
+    ).update(generation=F('generation') + 1, rotated_at=now, expires_at=now + REFRESH_TOKEN_LIFETIME)
+
+    if not rotated:
+        revoke_family(family_id)
+        return False
+    return True
+
+
+def revoke_family(family_id):
+    return RefreshTokenFamily.objects.filter(id=family_id, revoked_at__isnull=True).update(revoked_at=timezone.now())
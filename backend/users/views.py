@@ -9,9 +9,12 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.db import models
-from .models import User, RefreshTokenBlacklist
+from .models import User
 from .serializers import UserSerializer
+from .revocation_filter import revocation_filter, revoke_refresh_token
+from .token_families import REFRESH_TOKEN_LIFETIME, revoke_family, rotate_family, start_family
 from reservations.views import IsAdminUser
+from backend.utils.metrics import instrument
 from rest_framework import permissions
 
 import os
@@ -166,6 +169,7 @@ class CurrentUserView(APIView):
 class LoginUser(APIView):
     permission_classes = []  # Allow unauthenticated access
 
+    @instrument('login')
     def post(self, request):
         """Authenticate user, return access token and set HttpOnly refresh cookie.
 
@@ -198,12 +202,15 @@ class LoginUser(APIView):
             }
 
             refresh_jti = str(uuid.uuid4())
+            family = start_family(user)
             refresh_payload = {
                 "user_id": user.id,
                 "exp": now + timedelta(days=7),
                 "iat": now,
                 "type": "refresh",
-                "jti": refresh_jti
+                "jti": refresh_jti,
+                "fam": str(family.id),
+                "gen": family.generation
             }
 
             access_token = jwt.encode(access_payload, access_secret, algorithm="HS256")
@@ -252,6 +259,7 @@ class LoginUser(APIView):
 class RefreshTokenView(APIView):
     permission_classes = []
 
+    @instrument('token_refresh')
     def post(self, request):
         """Read refresh token from HttpOnly cookie, validate it, rotate tokens and set new refresh cookie.
 
@@ -276,9 +284,9 @@ class RefreshTokenView(APIView):
             if payload.get('type') != 'refresh':
                 return Response({"error": "Invalid token type"}, status=status.HTTP_401_UNAUTHORIZED)
 
-            # Check blacklist
+            # Check blacklist (the in-memory filter answers most checks without a query)
             token_jti = payload.get('jti')
-            if token_jti and RefreshTokenBlacklist.objects.filter(jti=token_jti).exists():
+            if token_jti and revocation_filter.is_revoked(token_jti):
                 return Response({"error": "Refresh token has been revoked"}, status=status.HTTP_401_UNAUTHORIZED)
 
             user_id = payload.get('user_id')
@@ -296,32 +304,35 @@ class RefreshTokenView(APIView):
             }
             new_access = jwt.encode(access_payload, access_secret, algorithm="HS256")
 
-            # Optionally rotate refresh token
+            # Rotate the refresh token within its family; a stale generation
+            # means the token is being replayed and the family is revoked
+            family_id = payload.get('fam')
+            if family_id:
+                generation = payload.get('gen', 0)
+                if not rotate_family(family_id, generation):
+                    return Response({"error": "Refresh token has been revoked"}, status=status.HTTP_401_UNAUTHORIZED)
+                generation += 1
+            else:
+                # Token issued before token families: retire its jti once and
+                # move the session onto a new family
+                if token_jti:
+                    if not revoke_refresh_token(token_jti, user, timezone.now() + REFRESH_TOKEN_LIFETIME):
+                        return Response({"error": "Refresh token has been revoked"}, status=status.HTTP_401_UNAUTHORIZED)
+                family_id = str(start_family(user).id)
+                generation = 0
+
             new_jti = str(uuid.uuid4())
             refresh_payload = {
                 "user_id": user.id,
                 "exp": now + timedelta(days=7),
                 "iat": now,
                 "type": "refresh",
-                "jti": new_jti
+                "jti": new_jti,
+                "fam": family_id,
+                "gen": generation
             }
             new_refresh = jwt.encode(refresh_payload, refresh_secret, algorithm="HS256")
 
-            # Blacklist the old refresh token jti (if present) to prevent reuse
-            if token_jti:
-                try:
-                    exp_ts = payload.get('exp')
-                    expires_at = datetime.utcfromtimestamp(exp_ts) if exp_ts else None
-                    # make timezone-aware in UTC to avoid Django warnings
-                    if expires_at is not None:
-                        expires_at = timezone.make_aware(expires_at, timezone.utc)
-                except Exception:
-                    expires_at = None
-                RefreshTokenBlacklist.objects.get_or_create(jti=token_jti, defaults={
-                    'user': user,
-                    'expires_at': expires_at
-                })
-
             response = Response({"access": new_access}, status=status.HTTP_200_OK)
             cookie_max_age = 7 * 24 * 60 * 60
             response.set_cookie(
@@ -343,25 +354,21 @@ class LogoutView(APIView):
     permission_classes = []
 
     def post(self, request):
-        # Blacklist the refresh token if present so it can't be reused
+        # Revoke the refresh token's family (or blacklist a pre-family token)
+        # so it can't be reused
         refresh_token = request.COOKIES.get('refresh_token')
         if refresh_token:
             try:
                 refresh_secret = getattr(settings, 'JWT_REFRESH_SECRET', os.getenv('JWT_REFRESH_SECRET', 'your-refresh-secret-key'))
                 payload = jwt.decode(refresh_token, refresh_secret, algorithms=["HS256"], options={"verify_exp": False})
+                family_id = payload.get('fam')
                 token_jti = payload.get('jti')
-                user_id = payload.get('user_id')
-                user = User.objects.filter(id=user_id).first() if user_id else None
-                if token_jti:
-                    expires_at = None
-                    try:
-                        exp_ts = payload.get('exp')
-                        expires_at = datetime.utcfromtimestamp(exp_ts) if exp_ts else None
-                        if expires_at is not None:
-                            expires_at = timezone.make_aware(expires_at, timezone.utc)
-                    except Exception:
-                        expires_at = None
-                    RefreshTokenBlacklist.objects.get_or_create(jti=token_jti, defaults={'user': user, 'expires_at': expires_at})
+                if family_id:
+                    revoke_family(family_id)
+                elif token_jti:
+                    user_id = payload.get('user_id')
+                    user = User.objects.filter(id=user_id).first() if user_id else None
+                    revoke_refresh_token(token_jti, user, timezone.now() + REFRESH_TOKEN_LIFETIME)
             except Exception:
                 # If anything goes wrong decoding, proceed to delete cookie anyway
                 pass
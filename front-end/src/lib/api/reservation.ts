@@ -56,18 +56,49 @@ export async function createReservation(payload: CreateReservationPayload): Prom
 	}
 }
 
-export async function getReservations(): Promise<Reservation[]> {
+export interface ReservationPage {
+	next: string | null;
+	previous: string | null;
+	results: Reservation[];
+}
+
+export interface ReservationPageQuery {
+	cursor?: string | null; // from pageCursor(page.next) or pageCursor(page.previous); omit for the first page
+	pageSize?: number;
+	status?: string;
+}
+
+// The cursor carried by a `next`/`previous` link, or null at either end of the list
+export function pageCursor(link: string | null): string | null {
+	return link ? new URL(link).searchParams.get('cursor') : null;
+}
+
+// One page of the list, newest first. Page with the cursors of `next`/`previous`
+// instead of loading everything: the table can hold millions of rows.
+export async function getReservations(query: ReservationPageQuery = {}): Promise<ReservationPage> {
 	try {
-		const result = await apiFetch('/api/reservations/', {
-			method: 'GET'
-		});
-		return result as Reservation[];
+		const params = new URLSearchParams();
+		params.set('page_size', String(query.pageSize ?? 25));
+		if (query.status) params.set('status', query.status);
+		if (query.cursor) params.set('cursor', query.cursor);
+		const page = await apiFetch(`/api/reservations/?${params.toString()}`, { method: 'GET' });
+		return page as ReservationPage;
 	} catch (error) {
 		console.error('Error fetching reservations:', error);
 		throw error;
 	}
 }
 
+export async function getReservation(id: number): Promise<Reservation> {
+	try {
+		const result = await apiFetch(`/api/reservations/${id}/`, { method: 'GET' });
+		return result as Reservation;
+	} catch (error) {
+		console.error('Error fetching reservation:', error);
+		throw error;
+	}
+}
+
 export async function updateReservation(
 	id: number,
 	data: Partial<CreateReservationPayload>